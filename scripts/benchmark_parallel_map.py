@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Benchmark the idle CPU usage and per-item round-trip latency of
+``parallel_map`` in thread and process modes.
+
+Idle CPU usage is measured while workers wait for input that arrives only
+after a delay, reporting the CPU time consumed by this process and its worker
+processes as a percentage of one core over that time.
+
+Per-item latency is measured by feeding one item at a time, only yielding the
+next input after the result of the previous one has been received, reporting
+the median and 95th percentile time from an input being yielded to its result
+being received.
+
+Example::
+
+    python scripts/benchmark_parallel_map.py --cores 4 --idle-seconds 2
+"""
+import argparse
+import resource
+import statistics
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from smqtk_descriptors.utils.parallel import parallel_map
+
+
+def _identity(x: int) -> int:
+    return x
+
+
+def _cpu_seconds() -> float:
+    """
+    :return: User and system CPU time of this process and its reaped children.
+    """
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (self_usage.ru_utime + self_usage.ru_stime +
+            child_usage.ru_utime + child_usage.ru_stime)
+
+
+def idle_cpu_percent(use_mp: bool, cores: int, idle_seconds: float) -> float:
+    """
+    :return: CPU usage, in percent of one core, of a parallel map whose input
+        is delayed for ``idle_seconds``.
+    """
+    def delayed_input() -> Iterator[int]:
+        time.sleep(idle_seconds)
+        yield 0
+
+    it = parallel_map(_identity, delayed_input(), cores=cores,
+                      use_multiprocessing=use_mp)
+    # Start workers before measuring to exclude their start-up.
+    it.start_workers()
+    start_cpu = _cpu_seconds()
+    start = time.perf_counter()
+    list(it)
+    # Worker processes have been joined by now, so their usage is included.
+    elapsed = time.perf_counter() - start
+    return 100. * (_cpu_seconds() - start_cpu) / elapsed
+
+
+def item_latency(use_mp: bool, cores: int, n_items: int) -> Dict[str, float]:
+    """
+    :return: Median and 95th percentile round-trip latency, in milliseconds,
+        of items fed one at a time.
+    """
+    result_received = threading.Event()
+    yield_times: List[float] = []
+
+    def ping_pong_input() -> Iterator[int]:
+        for i in range(n_items):
+            if i:
+                result_received.wait()
+                result_received.clear()
+            yield_times.append(time.perf_counter())
+            yield i
+
+    latencies = []
+    for i in parallel_map(_identity, ping_pong_input(), cores=cores,
+                          use_multiprocessing=use_mp):
+        latencies.append(time.perf_counter() - yield_times[i])
+        result_received.set()
+    # Skip the first item, which includes worker start-up.
+    latencies = sorted(latencies[1:])
+    return {
+        'median_ms': 1e3 * statistics.median(latencies),
+        'p95_ms': 1e3 * latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cores', type=int, default=4,
+                        help="Number of workers to use.")
+    parser.add_argument('--idle-seconds', type=float, default=2.,
+                        help="Time workers are kept idle for the idle CPU "
+                             "measurement.")
+    parser.add_argument('--items', type=int, default=500,
+                        help="Number of items for the latency measurement.")
+    args = parser.parse_args()
+
+    print("{:<8} {:>12} {:>14} {:>11}".format(
+        "mode", "idle CPU %", "median ms", "p95 ms"))
+    for mode, use_mp in (("thread", False), ("process", True)):
+        cpu = idle_cpu_percent(use_mp, args.cores, args.idle_seconds)
+        lat = item_latency(use_mp, args.cores, args.items)
+        print("{:<8} {:>12.1f} {:>14.3f} {:>11.3f}".format(
+            mode, cpu, lat['median_ms'], lat['p95_ms']))
+
+
+if __name__ == '__main__':
+    main()
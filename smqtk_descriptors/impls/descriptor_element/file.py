@@ -1,5 +1,7 @@
+import os
 import os.path as osp
 from typing import Any, Dict, Hashable, Mapping, Optional
+from uuid import uuid4
 
 import numpy
 
@@ -20,8 +22,15 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
     lower for large number of elements that would otherwise exceed RAM storage
     space.
 
+    Vectors may optionally be loaded as read-only memory maps (see the
+    ``mmap_mode`` parameter) so that the operating system's page cache may
+    share descriptor data between processes instead of each access allocating
+    and reading a new array.
+
     """
 
+    VALID_MMAP_MODES = (None, 'r', 'c')
+
     @classmethod
     def is_usable(cls) -> bool:
         return True
@@ -30,7 +39,8 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
         self,
         uuid: Hashable,
         save_dir: str,
-        subdir_split: Optional[int] = None
+        subdir_split: Optional[int] = None,
+        mmap_mode: Optional[str] = None
     ):
         """
         Initialize a file-base descriptor element.
@@ -48,11 +58,22 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
 
             Dashes are stripped from this string (as would happen if given an
             uuid.UUID instance as the uuid element).
+        :param mmap_mode: If not None, vectors are returned as memory-mapped
+            arrays in the given ``numpy.load`` mode instead of being read
+            into memory. Only the read-only ("r") and copy-on-write ("c")
+            modes are allowed as stored vectors should be effectively
+            immutable.
+
+        :raises ValueError: An invalid ``mmap_mode`` was given.
 
         """
         super(DescriptorFileElement, self).__init__(uuid)
+        if mmap_mode not in self.VALID_MMAP_MODES:
+            raise ValueError("Invalid mmap_mode '{}'. Must be one of {}."
+                             .format(mmap_mode, self.VALID_MMAP_MODES))
         self._save_dir = osp.abspath(osp.expanduser(save_dir))
         self._subdir_split = subdir_split
+        self._mmap_mode = mmap_mode
 
         # Generate filepath from parameters
         if self._subdir_split and int(self._subdir_split) > 1:
@@ -74,6 +95,7 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
             '_save_dir': self._save_dir,
             '_subdir_split': self._subdir_split,
             '_vec_filepath': self._vec_filepath,
+            '_mmap_mode': self._mmap_mode,
         })
         return state
 
@@ -82,11 +104,14 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
         self._save_dir = state['_save_dir']
         self._subdir_split = state['_subdir_split']
         self._vec_filepath = state['_vec_filepath']
+        # Older serializations will not have this key.
+        self._mmap_mode = state.get('_mmap_mode', None)
 
     def get_config(self) -> Dict[str, Any]:
         return {
             "save_dir": self._save_dir,
-            'subdir_split': self._subdir_split
+            'subdir_split': self._subdir_split,
+            'mmap_mode': self._mmap_mode,
         }
 
     def has_vector(self) -> bool:
@@ -99,14 +124,15 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
 
     def vector(self) -> Optional[numpy.ndarray]:
         """
+        When configured with an ``mmap_mode``, the returned array is a
+        ``numpy.memmap`` backed by the vector file.
+
         :return: Get the stored descriptor vector as a numpy array. This returns
             None of there is no vector stored in this container.
         :rtype: numpy.core.multiarray.ndarray or None
         """
-        # TODO: Load as memmap?
-        #       i.e. modifications by user to vector will be reflected on disk.
         if self.has_vector():
-            return numpy.load(self._vec_filepath)
+            return numpy.load(self._vec_filepath, mmap_mode=self._mmap_mode)
         else:
             return None
 
@@ -115,7 +141,9 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
         Set the contained vector.
 
         If this container already stores a descriptor vector, this will
-        overwrite it.
+        overwrite it. The new vector is written to a temporary file that then
+        replaces the vector file, so that memory maps of the previous vector
+        remain valid.
 
         :param new_vec: New vector to contain.
         :type new_vec: numpy.core.multiarray.ndarray
@@ -125,5 +153,15 @@ class DescriptorFileElement (DescriptorElement):  # lgtm [py/missing-equals]
 
         """
         safe_create_dir(osp.dirname(self._vec_filepath))
-        numpy.save(self._vec_filepath, new_vec)
+        # Rewriting the vector file in place would truncate it under any open
+        # memory maps of it, which then fault when accessed.
+        tmp_fp = "{}.{}.tmp".format(self._vec_filepath, uuid4().hex)
+        try:
+            with open(tmp_fp, 'xb') as f:
+                numpy.save(f, new_vec)
+            os.replace(tmp_fp, self._vec_filepath)
+        except BaseException:
+            if osp.exists(tmp_fp):
+                os.remove(tmp_fp)
+            raise
         return self
@@ -1,7 +1,7 @@
 import logging
 from collections import defaultdict
 import multiprocessing
-from typing import cast, Any, Dict, Generator, Hashable, Iterable, Mapping, Optional, Tuple
+from typing import cast, Any, Dict, Generator, Hashable, Iterable, List, Mapping, Optional, Tuple
 
 import numpy
 
@@ -15,6 +15,7 @@ LOG = logging.getLogger(__name__)
 # Try to import required modules
 try:
     import psycopg2  # type: ignore
+    import psycopg2.extras  # type: ignore
 except ImportError as ex:
     LOG.warning("Failed to import psycopg2: %s", str(ex))
     psycopg2 = None
@@ -38,6 +39,10 @@ class PostgresDescriptorElement (DescriptorElement):  # lgtm [py/missing-equals]
 
     ARRAY_DTYPE = numpy.float64
 
+    # Number of upsert statements sent to the server at a time by
+    # ``set_many_vectors``.
+    SET_MANY_PAGE_SIZE = 100
+
     UPSERT_TABLE_TMPL = norm_psql_cmd_string("""
         CREATE TABLE IF NOT EXISTS {table_name:s} (
           {uuid_col:s} TEXT NOT NULL,
@@ -436,6 +441,128 @@ class PostgresDescriptorElement (DescriptorElement):  # lgtm [py/missing-equals]
             for uuid, vector_buffer in sql_return:
                 yield uuid, numpy.frombuffer(vector_buffer, cls.ARRAY_DTYPE)
 
+    @classmethod
+    def _has_many_vectors(
+        cls,
+        descriptors: Iterable["DescriptorElement"]
+    ) -> Generator[Tuple[Hashable, bool], None, None]:
+        """
+        Check for the existence of vectors for many descriptors with a single
+        query per unique set of connection options.
+
+        :param descriptors: Iterable of descriptors to query for.
+
+        :return: Iterator of tuples containing the descriptor uuid and whether
+            that descriptor has an associated vector.
+        """
+        batch_dictionary: Dict[Tuple, Dict[str, Hashable]] = defaultdict(dict)
+        for descriptor_ in cast(Iterable[PostgresDescriptorElement], descriptors):
+            # Also grouping on table creation since, unlike vector retrieval,
+            # existence checks are commonly performed before anything has been
+            # stored.
+            batch_dictionary[
+                cls._sql_vector_query_options(descriptor_)
+                + (descriptor_.create_table,)
+            ][str(descriptor_.uuid())] = descriptor_.uuid()
+
+        for query_options, str_to_uuid in batch_dictionary.items():
+            helper_kwargs: Dict[str, Any] = dict(zip(
+                ['db_name', 'db_host', 'db_port', 'db_user', 'db_pass',
+                 'table_name', 'uuid_col', 'binary_col', 'create_table'],
+                query_options
+            ))
+            psql_helper = cls._create_psql_helper(**helper_kwargs)
+
+            # Using static value 'true' for binary "column" to reduce data
+            # return volume.
+            sql_query = cls.SELECT_MANY_TMPL.format(
+                table_name=query_options[5],
+                uuid_col=query_options[6],
+                binary_col='true',
+            )
+            sql_values = {
+                "uuids_tuple": tuple(str_to_uuid)
+            }
+
+            # noinspection PyProtectedMember,PyUnresolvedReferences
+            def query_callback(cursor: psycopg2._psycopg.cursor) -> None:
+                cursor.execute(sql_query, sql_values)
+
+            found = set(r[0] for r in psql_helper.single_execute(
+                query_callback, yield_result_rows=True
+            ))
+            for str_uuid, uuid in str_to_uuid.items():
+                yield uuid, str_uuid in found
+
+    @classmethod
+    def _as_array_dtype(cls, new_vec: numpy.ndarray) -> numpy.ndarray:
+        """
+        Convert the given vector into an array of our storage data type.
+
+        :raises ValueError: ``new_vec`` could not be converted.
+        """
+        if not isinstance(new_vec, numpy.ndarray):
+            new_vec = numpy.copy(new_vec)
+
+        if new_vec.dtype != cls.ARRAY_DTYPE:
+            try:
+                new_vec = new_vec.astype(cls.ARRAY_DTYPE)
+            except TypeError:
+                raise ValueError("Could not convert input to a vector of type "
+                                 "%s." % cls.ARRAY_DTYPE)
+        return new_vec
+
+    @classmethod
+    def _set_many_vectors(
+        cls,
+        descr_vec_pairs: Iterable[Tuple["DescriptorElement", numpy.ndarray]]
+    ) -> None:
+        """
+        Upsert many vectors in a single transaction per unique set of
+        connection options, sending statements to the server in pages of
+        ``SET_MANY_PAGE_SIZE``.
+
+        :param descr_vec_pairs: Iterable of descriptor and new vector pairs.
+
+        :raises ValueError: A vector could not be converted to our storage
+            data type.
+        """
+        batch_dictionary: Dict[Tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for descriptor_, new_vec in cast(
+                Iterable[Tuple[PostgresDescriptorElement, numpy.ndarray]],
+                descr_vec_pairs):
+            batch_dictionary[
+                cls._sql_vector_query_options(descriptor_)
+                + (descriptor_.create_table,)
+            ].append({
+                "binary_val": psycopg2.Binary(cls._as_array_dtype(new_vec)),
+                "uuid_val": str(descriptor_.uuid()),
+            })
+
+        for query_options, upsert_values in batch_dictionary.items():
+            helper_kwargs: Dict[str, Any] = dict(zip(
+                ['db_name', 'db_host', 'db_port', 'db_user', 'db_pass',
+                 'table_name', 'uuid_col', 'binary_col', 'create_table'],
+                query_options
+            ))
+            psql_helper = cls._create_psql_helper(**helper_kwargs)
+
+            q_upsert = cls.UPSERT_TMPL.strip().format(
+                table_name=query_options[5],
+                uuid_col=query_options[6],
+                binary_col=query_options[7],
+            )
+
+            # ``executemany`` would still round-trip once per row, while
+            # ``execute_batch`` sends pages of statements at a time.
+            # noinspection PyProtectedMember,PyUnresolvedReferences
+            def cb(cursor: psycopg2._psycopg.cursor) -> None:
+                psycopg2.extras.execute_batch(cursor, q_upsert, upsert_values,
+                                              page_size=cls.SET_MANY_PAGE_SIZE)
+
+            # No return but need to force iteration.
+            list(psql_helper.single_execute(cb, yield_result_rows=False))
+
     def set_vector(self, new_vec: numpy.ndarray) -> "PostgresDescriptorElement":
         """
         Set the contained vector.
@@ -460,15 +587,7 @@ class PostgresDescriptorElement (DescriptorElement):  # lgtm [py/missing-equals]
         :rtype: PostgresDescriptorElement
 
         """
-        if not isinstance(new_vec, numpy.ndarray):
-            new_vec = numpy.copy(new_vec)
-
-        if new_vec.dtype != self.ARRAY_DTYPE:
-            try:
-                new_vec = new_vec.astype(self.ARRAY_DTYPE)
-            except TypeError:
-                raise ValueError("Could not convert input to a vector of type "
-                                 "%s." % self.ARRAY_DTYPE)
+        new_vec = self._as_array_dtype(new_vec)
 
         q_upsert = self.UPSERT_TMPL.strip().format(**{
             "table_name": self.table_name,
@@ -0,0 +1,480 @@
+from collections import defaultdict
+import json
+import logging
+import os
+import os.path as osp
+import pickle
+import threading
+from typing import (
+    Any, cast, Dict, Generator, Hashable, Iterable, List, Mapping, Optional,
+    Sequence, Tuple
+)
+
+import numpy
+
+from smqtk_dataprovider.utils.file import safe_create_dir
+from smqtk_descriptors import DescriptorElement
+
+
+LOG = logging.getLogger(__name__)
+
+# Lock guarding the process-local registry of shard stores.
+_STORE_REGISTRY_LOCK = threading.Lock()
+# Process-local registry of shard stores, keyed by absolute root directory.
+_STORE_REGISTRY: Dict[str, "ShardFileStore"] = {}
+
+
+class ShardFileStore (object):
+    """
+    Storage of many fixed-dimension vectors packed into a few large shard
+    files under a root directory, with a sidecar index mapping UUIDs to a
+    (shard, row) location.
+
+    Directory layout:
+        - ``meta.json``: Vector data type, dimensionality and the number of
+          records per shard.
+        - ``shard_NNNNNN.bin``: Raw, C-ordered vector records of
+          ``dim * dtype.itemsize`` bytes each.
+        - ``index.log``: Append-only sequence of pickled lists of
+          ``(uuid, shard, row)`` tuples. Later entries for the same UUID take
+          precedence.
+
+    Vectors are written before their index entries so that an interrupted
+    write never yields an index entry pointing to missing data.
+    Over-writing the vector of an already stored UUID is done in place.
+
+    This store supports one writer with any number of readers. Readers pick up
+    index entries appended by a writer in another process when they look up a
+    UUID they have not yet seen.
+
+    :param root_dir: Directory in which to store shard files.
+    :param dtype: Data type of stored vectors.
+    :param records_per_shard: Maximum number of vector records per shard file.
+    :param use_mmap: Read vectors through read-only memory maps of shard files.
+        If false, vectors are read with a seek and read per record.
+
+    :raises ValueError: Parameters conflict with those of an existing store in
+        ``root_dir``.
+    """
+
+    META_FILENAME = "meta.json"
+    INDEX_FILENAME = "index.log"
+    SHARD_FILENAME_TMPL = "shard_{:06d}.bin"
+
+    def __init__(
+        self,
+        root_dir: str,
+        dtype: str = "float64",
+        records_per_shard: int = 65536,
+        use_mmap: bool = True
+    ):
+        if int(records_per_shard) < 1:
+            raise ValueError("Records per shard must be a positive integer "
+                             "(given {}).".format(records_per_shard))
+        self.root_dir = osp.abspath(osp.expanduser(root_dir))
+        self.dtype = numpy.dtype(dtype)
+        self.records_per_shard = int(records_per_shard)
+        self.use_mmap = use_mmap
+
+        self._lock = threading.RLock()
+        # Vector dimensionality, None until known from meta or first write.
+        self._dim: Optional[int] = None
+        # Mapping of UUID to (shard, row) location.
+        self._index: Dict[Hashable, Tuple[int, int]] = {}
+        # Number of bytes of the index file consumed so far.
+        self._index_offset = 0
+        # Cached read-only memory maps per shard index.
+        self._mmaps: Dict[int, numpy.memmap] = {}
+
+        self._load_meta()
+
+    @property
+    def _meta_path(self) -> str:
+        return osp.join(self.root_dir, self.META_FILENAME)
+
+    @property
+    def _index_path(self) -> str:
+        return osp.join(self.root_dir, self.INDEX_FILENAME)
+
+    def _shard_path(self, shard: int) -> str:
+        return osp.join(self.root_dir, self.SHARD_FILENAME_TMPL.format(shard))
+
+    @property
+    def record_bytes(self) -> int:
+        """
+        :return: Number of bytes per record. Zero if dimensionality is not yet
+            known.
+        """
+        return (self._dim or 0) * self.dtype.itemsize
+
+    def _load_meta(self) -> None:
+        """
+        Load and check the meta-data file, if there is one.
+
+        :raises ValueError: Stored meta-data does not match our parameters.
+        """
+        if not osp.isfile(self._meta_path):
+            return
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        if numpy.dtype(meta['dtype']) != self.dtype \
+                or meta['records_per_shard'] != self.records_per_shard:
+            raise ValueError(
+                "Shard store at '{}' was created with dtype={} and "
+                "records_per_shard={}, which conflicts with the requested "
+                "dtype={} and records_per_shard={}."
+                .format(self.root_dir, meta['dtype'],
+                        meta['records_per_shard'], self.dtype.name,
+                        self.records_per_shard)
+            )
+        self._dim = meta['dim']
+
+    def _write_meta(self) -> None:
+        safe_create_dir(self.root_dir)
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'dtype': self.dtype.name,
+                'dim': self._dim,
+                'records_per_shard': self.records_per_shard,
+            }, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _refresh_index(self) -> None:
+        """
+        Read any index entries appended since our last read.
+        """
+        try:
+            size = os.path.getsize(self._index_path)
+        except OSError:
+            return
+        if size <= self._index_offset:
+            return
+        if self._dim is None:
+            self._load_meta()
+        with open(self._index_path, 'rb') as f:
+            f.seek(self._index_offset)
+            while True:
+                try:
+                    entries = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    # Either the end or a record that is not fully written
+                    # yet. Try again from the last good position next time.
+                    break
+                for uid, shard, row in entries:
+                    self._index[uid] = (shard, row)
+                self._index_offset = f.tell()
+
+    def locate(self, uuid: Hashable) -> Optional[Tuple[int, int]]:
+        """
+        :param uuid: UUID to look up.
+
+        :return: The (shard, row) location of the vector for the UUID, or
+            None if there is no vector stored for it.
+        """
+        with self._lock:
+            loc = self._index.get(uuid)
+            if loc is None:
+                self._refresh_index()
+                loc = self._index.get(uuid)
+            return loc
+
+    def locate_many(
+        self,
+        uuids: Iterable[Hashable]
+    ) -> List[Optional[Tuple[int, int]]]:
+        """
+        Look up many UUIDs, reading newly appended index entries at most once.
+
+        :param uuids: UUIDs to look up.
+
+        :return: List of (shard, row) locations, or None for UUIDs without a
+            stored vector, in the order of the given UUIDs.
+        """
+        with self._lock:
+            uuids = list(uuids)
+            if any(uid not in self._index for uid in uuids):
+                self._refresh_index()
+            return [self._index.get(uid) for uid in uuids]
+
+    def _shard_mmap(self, shard: int, min_rows: int) -> numpy.memmap:
+        """
+        Get a read-only memory map of a shard file that covers at least
+        ``min_rows`` records, re-mapping if the shard has grown.
+        """
+        mm = self._mmaps.get(shard)
+        if mm is None or mm.shape[0] < min_rows:
+            n_rows = os.path.getsize(self._shard_path(shard)) // self.record_bytes
+            mm = numpy.memmap(self._shard_path(shard), dtype=self.dtype,
+                              mode='r', shape=(n_rows, self._dim))
+            self._mmaps[shard] = mm
+        return mm
+
+    def read_rows(self, shard: int, rows: Sequence[int]) -> numpy.ndarray:
+        """
+        Read the vectors at the given rows of one shard.
+
+        :param shard: Shard index.
+        :param rows: Row indices within the shard. Sorted input results in
+            sequential reads.
+
+        :return: ``len(rows) x dim`` matrix of vectors.
+        """
+        with self._lock:
+            if self.use_mmap:
+                mm = self._shard_mmap(shard, max(rows) + 1)
+                return mm[numpy.asarray(rows, dtype=numpy.intp)]
+            out = numpy.empty((len(rows), self._dim), dtype=self.dtype)
+            rb = self.record_bytes
+            with open(self._shard_path(shard), 'rb') as f:
+                for i, r in enumerate(rows):
+                    f.seek(r * rb)
+                    out[i] = numpy.frombuffer(f.read(rb), dtype=self.dtype)
+            return out
+
+    def read(self, uuid: Hashable) -> Optional[numpy.ndarray]:
+        """
+        :param uuid: UUID of the vector to read.
+
+        :return: The vector stored for the UUID, or None if there is none.
+            When using memory maps, this is a read-only view into the shard
+            file.
+        """
+        loc = self.locate(uuid)
+        if loc is None:
+            return None
+        shard, row = loc
+        with self._lock:
+            if self.use_mmap:
+                return self._shard_mmap(shard, row + 1)[row]
+        return self.read_rows(shard, [row])[0]
+
+    def write(self, uuid_vectors: Iterable[Tuple[Hashable, numpy.ndarray]]) -> None:
+        """
+        Store vectors for the given UUIDs, over-writing the vector for UUIDs
+        already stored.
+
+        :param uuid_vectors: Iterable of UUID and vector pairs.
+
+        :raises ValueError: A vector's size does not match the store's vector
+            dimensionality.
+        """
+        with self._lock:
+            self._refresh_index()
+            # Group writes by shard so each shard file is opened once.
+            shard_writes: Dict[int, List[Tuple[int, numpy.ndarray]]] = defaultdict(list)
+            new_entries: List[Tuple[Hashable, int, int]] = []
+            n_records = len(self._index)
+            pending: Dict[Hashable, Tuple[int, int]] = {}
+            for uid, v in uuid_vectors:
+                v = numpy.ascontiguousarray(v, dtype=self.dtype).ravel()
+                if self._dim is None:
+                    self._dim = v.size
+                    self._write_meta()
+                elif v.size != self._dim:
+                    raise ValueError("Vector size ({}) does not match the "
+                                     "dimensionality of the shard store ({})."
+                                     .format(v.size, self._dim))
+                loc = self._index.get(uid) or pending.get(uid)
+                if loc is None:
+                    loc = divmod(n_records, self.records_per_shard)
+                    n_records += 1
+                    pending[uid] = loc
+                    new_entries.append((uid, loc[0], loc[1]))
+                shard_writes[loc[0]].append((loc[1], v))
+
+            rb = self.record_bytes
+            for shard, row_vecs in sorted(shard_writes.items()):
+                safe_create_dir(self.root_dir)
+                path = self._shard_path(shard)
+                with open(path, 'r+b' if osp.isfile(path) else 'w+b') as f:
+                    for row, v in sorted(row_vecs, key=lambda rv: rv[0]):
+                        f.seek(row * rb)
+                        f.write(v.tobytes())
+
+            if new_entries:
+                with open(self._index_path, 'ab') as f:
+                    pickle.dump(new_entries, f, -1)
+                    self._index_offset = f.tell()
+                self._index.update(pending)
+
+
+def get_shard_store(
+    root_dir: str,
+    dtype: str = "float64",
+    records_per_shard: int = 65536,
+    use_mmap: bool = True
+) -> ShardFileStore:
+    """
+    Get the process-local shard store for the given root directory, creating
+    it if necessary.
+
+    See :class:`ShardFileStore` for parameter documentation.
+
+    :raises ValueError: Parameters conflict with those of the store already
+        open for the given root directory.
+
+    :return: Shared shard store instance.
+    """
+    key = osp.abspath(osp.expanduser(root_dir))
+    with _STORE_REGISTRY_LOCK:
+        store = _STORE_REGISTRY.get(key)
+        if store is None:
+            store = ShardFileStore(key, dtype, records_per_shard, use_mmap)
+            _STORE_REGISTRY[key] = store
+        elif (store.dtype != numpy.dtype(dtype)
+              or store.records_per_shard != records_per_shard
+              or store.use_mmap != use_mmap):
+            raise ValueError("Shard store at '{}' is already open with "
+                             "different parameters.".format(key))
+        return store
+
+
+class DescriptorShardFileElement (DescriptorElement):  # lgtm [py/missing-equals]
+    """
+    Descriptor element whose vector is stored as a fixed-size record in one
+    of a few large shard files shared with other elements under the same
+    root directory.
+
+    Compared to the :class:`.DescriptorFileElement`, this avoids creating one
+    file per descriptor, and checking for a vector is an in-memory index
+    lookup instead of a file-system stat. Retrieving many vectors at once via
+    ``get_many_vectors`` reads records grouped by shard in sorted order.
+
+    Elements configured with the same root directory within a process share
+    one :class:`ShardFileStore` instance. Only one process should write to a
+    given root directory at a time.
+
+    :param uuid: Unique ID reference of the descriptor.
+    :param root_dir: Directory in which shard files are stored. If this path
+        is relative, we interpret as relative to the current working
+        directory.
+    :param dtype: Data type vectors are stored as.
+    :param records_per_shard: Maximum number of vectors stored in one shard
+        file.
+    :param use_mmap: Read vectors through read-only memory maps of the shard
+        files. In this mode, ``vector()`` returns a read-only view into the
+        shard file without copying.
+    """
+
+    @classmethod
+    def is_usable(cls) -> bool:
+        return True
+
+    def __init__(
+        self,
+        uuid: Hashable,
+        root_dir: str,
+        dtype: str = "float64",
+        records_per_shard: int = 65536,
+        use_mmap: bool = True
+    ):
+        super(DescriptorShardFileElement, self).__init__(uuid)
+        self._root_dir = osp.abspath(osp.expanduser(root_dir))
+        self._dtype = numpy.dtype(dtype).name
+        self._records_per_shard = int(records_per_shard)
+        self._use_mmap = use_mmap
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super(DescriptorShardFileElement, self).__getstate__()
+        state.update({
+            '_root_dir': self._root_dir,
+            '_dtype': self._dtype,
+            '_records_per_shard': self._records_per_shard,
+            '_use_mmap': self._use_mmap,
+        })
+        return state
+
+    def __setstate__(self, state: Mapping[str, Any]) -> None:
+        super(DescriptorShardFileElement, self).__setstate__(state)
+        self._root_dir = state['_root_dir']
+        self._dtype = state['_dtype']
+        self._records_per_shard = state['_records_per_shard']
+        self._use_mmap = state['_use_mmap']
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            'root_dir': self._root_dir,
+            'dtype': self._dtype,
+            'records_per_shard': self._records_per_shard,
+            'use_mmap': self._use_mmap,
+        }
+
+    def _store(self) -> ShardFileStore:
+        return get_shard_store(self._root_dir, self._dtype,
+                               self._records_per_shard, self._use_mmap)
+
+    @classmethod
+    def _get_many_vectors(
+        cls,
+        descriptors: Iterable["DescriptorElement"]
+    ) -> Generator[Tuple[Hashable, Optional[numpy.ndarray]], None, None]:
+        # Group descriptors by store and then by shard, reading each shard's
+        # rows in sorted order.
+        by_store: Dict[str, List[DescriptorShardFileElement]] = defaultdict(list)
+        for d in cast(Iterable[DescriptorShardFileElement], descriptors):
+            by_store[d._root_dir].append(d)
+        for d_list in by_store.values():
+            store = d_list[0]._store()
+            by_shard: Dict[int, List[Tuple[int, Hashable]]] = defaultdict(list)
+            uids = [d.uuid() for d in d_list]
+            for uid, loc in zip(uids, store.locate_many(uids)):
+                if loc is None:
+                    yield uid, None
+                else:
+                    by_shard[loc[0]].append((loc[1], uid))
+            for shard, row_uids in sorted(by_shard.items()):
+                row_uids.sort(key=lambda ru: ru[0])
+                mat = store.read_rows(shard, [r for r, _ in row_uids])
+                for (_, uid), v in zip(row_uids, mat):
+                    yield uid, v
+
+    @classmethod
+    def _has_many_vectors(
+        cls,
+        descriptors: Iterable["DescriptorElement"]
+    ) -> Generator[Tuple[Hashable, bool], None, None]:
+        by_store: Dict[str, List[DescriptorShardFileElement]] = defaultdict(list)
+        for d in cast(Iterable[DescriptorShardFileElement], descriptors):
+            by_store[d._root_dir].append(d)
+        for d_list in by_store.values():
+            uids = [d.uuid() for d in d_list]
+            for uid, loc in zip(uids, d_list[0]._store().locate_many(uids)):
+                yield uid, loc is not None
+
+    @classmethod
+    def _set_many_vectors(
+        cls,
+        descr_vec_pairs: Iterable[Tuple["DescriptorElement", numpy.ndarray]]
+    ) -> None:
+        # One write per store opens each shard file and appends to the index
+        # only once.
+        by_store: Dict[str, List[Tuple[DescriptorShardFileElement, numpy.ndarray]]] = defaultdict(list)
+        for d, v in cast(Iterable[Tuple[DescriptorShardFileElement, numpy.ndarray]], descr_vec_pairs):
+            by_store[d._root_dir].append((d, v))
+        for pairs in by_store.values():
+            pairs[0][0]._store().write((d.uuid(), v) for d, v in pairs)
+
+    def has_vector(self) -> bool:
+        return self._store().locate(self.uuid()) is not None
+
+    def vector(self) -> Optional[numpy.ndarray]:
+        return self._store().read(self.uuid())
+
+    def set_vector(self, new_vec: numpy.ndarray) -> "DescriptorShardFileElement":
+        """
+        Set the contained vector.
+
+        If this container already stores a descriptor vector, this will
+        overwrite it in place.
+
+        :param new_vec: New vector to contain. This is cast to the configured
+            data type.
+
+        :raises ValueError: The vector's size does not match the
+            dimensionality of vectors already in the store.
+
+        :returns: Self.
+        """
+        self._store().write([(self.uuid(), new_vec)])
+        return self
@@ -1,5 +1,6 @@
+from collections import defaultdict
 import time
-from typing import Any, Dict, Hashable, Mapping, Optional
+from typing import cast, Any, Dict, Generator, Hashable, Iterable, List, Mapping, Optional, Tuple
 
 import numpy
 
@@ -142,14 +143,80 @@ class SolrDescriptorElement (DescriptorElement):  # lgtm [py/missing-equals]
             "commit_on_set": self.solr_commit_on_set,
         }
 
+    @staticmethod
+    def _quote_term(value: str) -> str:
+        """
+        :return: Given string as a quoted Solr query term.
+        """
+        return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+    @classmethod
+    def _has_many_vectors(
+        cls,
+        descriptors: Iterable["DescriptorElement"]
+    ) -> Generator[Tuple[Hashable, bool], None, None]:
+        """
+        Check for the existence of vectors for many descriptors with a single
+        select per Solr index and UUID field.
+
+        :note: The number of descriptors checked at once should stay below the
+            index's ``maxBooleanClauses`` setting (1024 by default).
+
+        :param descriptors: Iterable of descriptors to query for.
+
+        :return: Iterator of tuples containing the descriptor uuid and whether
+            that descriptor has an associated vector.
+        """
+        batch_dictionary: Dict[Tuple[str, str], List[SolrDescriptorElement]] = defaultdict(list)
+        for d in cast(Iterable[SolrDescriptorElement], descriptors):
+            batch_dictionary[(d.solr_conn_addr, d.uuid_field)].append(d)
+
+        for (_, uuid_field), d_list in batch_dictionary.items():
+            str_to_uuid = dict((str(d.uuid()), d.uuid()) for d in d_list)
+            q = "id:({})".format(
+                ' OR '.join(cls._quote_term(u) for u in str_to_uuid)
+            )
+            r = d_list[0].solr.select(q, fields=[uuid_field],
+                                      rows=len(str_to_uuid))
+            found = set(doc[uuid_field] for doc in r.results)
+            for str_uuid, uuid in str_to_uuid.items():
+                yield uuid, str_uuid in found
+
     def has_vector(self) -> bool:
         return bool(self._get_existing_doc())
 
-    def set_vector(self, new_vec: numpy.ndarray) -> "SolrDescriptorElement":
+    @classmethod
+    def _set_many_vectors(
+        cls,
+        descr_vec_pairs: Iterable[Tuple["DescriptorElement", numpy.ndarray]]
+    ) -> None:
+        """
+        Add documents for many vectors with a single request per Solr index,
+        committing at most once per index.
+
+        :param descr_vec_pairs: Iterable of descriptor and new vector pairs.
+        """
+        batch_dictionary: Dict[str, List[Tuple[SolrDescriptorElement, Dict[str, Any]]]] = defaultdict(list)
+        for d, v in cast(Iterable[Tuple[SolrDescriptorElement, numpy.ndarray]], descr_vec_pairs):
+            batch_dictionary[d.solr_conn_addr].append((d, d._vector_doc(v)))
+
+        for d_doc_list in batch_dictionary.values():
+            commit = any(d.solr_commit_on_set for d, _ in d_doc_list)
+            d_doc_list[0][0].solr.add_many([doc for _, doc in d_doc_list],
+                                           commit=commit)
+
+    def _vector_doc(self, new_vec: numpy.ndarray) -> Dict[str, Any]:
+        """
+        :returns: A new document dictionary storing the given vector for our
+            UUID.
+        """
         doc = self._base_doc()
         doc[self.vector_field] = new_vec.tolist()
         doc[self.timestamp_field] = time.time()
-        self.solr.add(doc, commit=self.solr_commit_on_set)
+        return doc
+
+    def set_vector(self, new_vec: numpy.ndarray) -> "SolrDescriptorElement":
+        self.solr.add(self._vector_doc(new_vec), commit=self.solr_commit_on_set)
         return self
 
     def vector(self) -> Optional[numpy.ndarray]:
@@ -0,0 +1,270 @@
+from collections import deque
+import hashlib
+import itertools
+import json
+import logging
+from typing import (
+    Any, Deque, Dict, Generator, Hashable, Iterable, List, Optional,
+    Sequence, Set, Tuple, Type, TypeVar
+)
+
+import numpy as np
+
+from smqtk_core.configuration import (
+    from_config_dict,
+    make_default_config,
+    to_config_dict,
+)
+from smqtk_dataprovider import DataElement
+from smqtk_descriptors import DescriptorGenerator, DescriptorSet
+from smqtk_descriptors.impls.descriptor_element.memory import (
+    DescriptorMemoryElement
+)
+
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "CachingDescriptorGenerator",
+]
+T = TypeVar("T", bound="CachingDescriptorGenerator")
+
+# Valid ``hash_algorithm`` values, being ``DataElement`` checksum methods.
+HASH_ALGORITHMS = ("md5", "sha1", "sha512")
+
+
+class CachingDescriptorGenerator (DescriptorGenerator):
+    """
+    Wrapper around some descriptor generator caching its descriptors in a
+    descriptor set, keyed by a hash of the input data content and of the
+    wrapped generator's configuration.
+
+    Unlike the check of ``generate_elements``, which is keyed by data element
+    UUID, this short-circuits the computation of byte-identical content under
+    different UUIDs, within a call as well as across calls and, with a
+    persistent descriptor set, processes. Content repeated within a call is
+    computed once.
+
+    Cache lookups are performed for windows of ``batch_size`` input elements
+    and computed descriptors are added to the descriptor set in batches of up
+    to ``batch_size``, while input only needing computation is streamed to a
+    single ``generate_arrays`` call of the wrapped generator. The numbers of
+    cache hits and misses are counted in the ``hits`` and ``misses``
+    attributes, and logged after each call.
+
+    The configuration hash covers all parameters of the wrapped generator,
+    including ones not affecting descriptor values like thread counts, so
+    changing any of them starts a new cache.
+
+    Multi-layer generation is forwarded to the wrapped generator without
+    caching.
+
+    :param generator: Descriptor generator to compute descriptors not cached
+        yet with.
+    :param descriptor_set: Descriptor set storing cached descriptors, keyed by
+        ``"<configuration hash>:<content hash>"`` strings.
+    :param hash_algorithm: Checksum method of input data elements to key
+        content by, one of ``"md5"``, ``"sha1"`` or ``"sha512"``.
+    :param batch_size: Number of input data elements looked up in the cache
+        at a time, and the maximum number of computed descriptors added to
+        the cache at a time.
+    """
+
+    @classmethod
+    def _generator_impls(cls) -> Set[Type[DescriptorGenerator]]:
+        """
+        :return: Descriptor generator implementations that may be wrapped,
+            excluding caching ones, whose default configurations would
+            otherwise recurse.
+        """
+        return {impl for impl in DescriptorGenerator.get_impls()
+                if not issubclass(impl, CachingDescriptorGenerator)}
+
+    @classmethod
+    def get_default_config(cls) -> Dict[str, Any]:
+        c = super().get_default_config()
+        c['generator'] = make_default_config(cls._generator_impls())
+        c['descriptor_set'] = make_default_config(DescriptorSet.get_impls())
+        return c
+
+    @classmethod
+    def from_config(
+        cls: Type[T],
+        config_dict: Dict,
+        merge_default: bool = True
+    ) -> T:
+        config_dict = dict(config_dict)  # shallow copy for modifying
+        config_dict['generator'] = from_config_dict(
+            config_dict['generator'],
+            cls._generator_impls()
+        )
+        config_dict['descriptor_set'] = from_config_dict(
+            config_dict['descriptor_set'],
+            DescriptorSet.get_impls()
+        )
+        return super().from_config(config_dict, merge_default=merge_default)
+
+    def __init__(
+        self,
+        generator: DescriptorGenerator,
+        descriptor_set: DescriptorSet,
+        hash_algorithm: str = "sha1",
+        batch_size: int = 128
+    ):
+        super().__init__()
+        if hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError("Invalid hash algorithm {!r}, expected one of {}."
+                             .format(hash_algorithm, HASH_ALGORITHMS))
+        if batch_size < 1:
+            raise ValueError("Batch size must be a positive integer (given "
+                             "{}).".format(batch_size))
+        self.generator = generator
+        self.descriptor_set = descriptor_set
+        self.hash_algorithm = hash_algorithm
+        self.batch_size = batch_size
+        # Hash identifying the wrapped generator's configuration.
+        self.generator_hash = hashlib.sha1(
+            json.dumps(to_config_dict(generator), sort_keys=True).encode()
+        ).hexdigest()
+        # Numbers of input data elements whose descriptors were taken from
+        # the cache, or were computed, over the lifetime of this instance.
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        :return: Fraction of input data elements whose descriptors were taken
+            from the cache, or 0 if there was no input yet.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "generator": to_config_dict(self.generator),
+            "descriptor_set": to_config_dict(self.descriptor_set),
+            "hash_algorithm": self.hash_algorithm,
+            "batch_size": self.batch_size,
+        }
+
+    def valid_content_types(self) -> Set[str]:
+        return self.generator.valid_content_types()
+
+    def is_valid_element(self, data_element: DataElement) -> bool:
+        return self.generator.is_valid_element(data_element)
+
+    def cache_key(self, data_element: DataElement) -> str:
+        """
+        :param data_element: Data element to get the cache key of.
+
+        :return: Key of the cached descriptor of the given data element's
+            content in the descriptor set.
+        """
+        return "{}:{}".format(
+            self.generator_hash,
+            getattr(data_element, self.hash_algorithm)()
+        )
+
+    def _generate_arrays(self, data_iter: Iterable[DataElement]) -> Iterable[np.ndarray]:
+        # Cache keys of input elements, with a slot holding their descriptor
+        # once known and whether it is to be computed for this element, in
+        # input order. Elements with the same content share the slot.
+        key_slot_q: Deque[Tuple[Hashable, List[Optional[np.ndarray]], bool]] = \
+            deque()
+        # Slots of content fed for computation whose descriptor has not been
+        # added to the cache yet, by key.
+        in_flight: Dict[Hashable, List[Optional[np.ndarray]]] = {}
+        hits_misses = [0, 0]
+
+        def tocompute_data() -> Generator[DataElement, None, None]:
+            """ Yield data elements whose content is neither cached nor
+            already fed for computation. """
+            data_iter_ = iter(data_iter)
+            while True:
+                data_window = list(itertools.islice(data_iter_,
+                                                    self.batch_size))
+                if not data_window:
+                    break
+                keys = [self.cache_key(d) for d in data_window]
+                # Slots of the content of this window, resolved here rather
+                # than against ``in_flight`` when reached, as computed content
+                # leaves ``in_flight`` when added to the cache while this
+                # window is being iterated.
+                window_slots = {k: in_flight[k] for k in keys
+                                if k in in_flight}
+                lookup_keys = [k for k in dict.fromkeys(keys)
+                               if k not in window_slots]
+                hit_keys = list(itertools.compress(
+                    lookup_keys,
+                    self.descriptor_set.has_many_descriptors(lookup_keys)
+                ))
+                window_slots.update(
+                    (k, [v]) for k, v in
+                    zip(hit_keys, self.descriptor_set.get_many_vectors(hit_keys))
+                )
+                for data, key in zip(data_window, keys):
+                    slot = window_slots.get(key)
+                    if slot is not None:
+                        key_slot_q.append((key, slot, False))
+                        hits_misses[0] += 1
+                    else:
+                        slot = window_slots[key] = in_flight[key] = [None]
+                        key_slot_q.append((key, slot, True))
+                        hits_misses[1] += 1
+                        yield data
+
+        # Keys of computed descriptors waiting to be added to the cache.
+        to_add: List[Hashable] = []
+
+        def flush_add_descriptors() -> None:
+            if to_add:
+                LOG.debug("Caching {} computed descriptors"
+                          .format(len(to_add)))
+                descriptors = []
+                for key in to_add:
+                    d = DescriptorMemoryElement(key)
+                    d.set_vector(in_flight.pop(key)[0])
+                    descriptors.append(d)
+                self.descriptor_set.add_many_descriptors(descriptors)
+                del to_add[:]
+
+        try:
+            for v in self.generator.generate_arrays(tocompute_data()):
+                # Pops fail with an IndexError if the wrapped generator
+                # produces more vectors than there is content to compute.
+                key, slot, to_compute = key_slot_q.popleft()
+                while not to_compute:
+                    yield slot[0]
+                    key, slot, to_compute = key_slot_q.popleft()
+                slot[0] = v
+                to_add.append(key)
+                if len(to_add) >= self.batch_size:
+                    flush_add_descriptors()
+                yield v
+            flush_add_descriptors()
+
+            for key, slot, to_compute in key_slot_q:
+                if to_compute:
+                    raise IndexError(
+                        "Wrapped generator under-produced vectors for content "
+                        "in need of computation (key `{}` not filled)."
+                        .format(key)
+                    )
+                yield slot[0]
+        finally:
+            self.hits += hits_misses[0]
+            self.misses += hits_misses[1]
+            total = sum(hits_misses)
+            if total:
+                LOG.info("Descriptor cache hits: {} / {} ({:.1%}), "
+                         "lifetime hit rate: {:.1%}"
+                         .format(hits_misses[0], total,
+                                 hits_misses[0] / total, self.hit_rate))
+
+    def _generate_layer_arrays(
+        self,
+        data_iter: Iterable[DataElement],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, np.ndarray]]:
+        return self.generator.generate_layer_arrays(data_iter, layers)
@@ -1,7 +1,12 @@
 from io import BytesIO
 import itertools
 import logging
-from typing import Any, Dict, Hashable, Iterable, Mapping, Optional, Set, Tuple, Type, TypeVar
+from types import TracebackType
+from typing import (
+    Any, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Set,
+    Tuple, Type, TypeVar
+)
+import weakref
 
 import numpy
 
@@ -13,7 +18,8 @@ from smqtk_core.configuration import (
 from smqtk_core.dict import merge_dict
 from smqtk_dataprovider import DataElement
 from smqtk_descriptors import DescriptorGenerator
-from smqtk_descriptors.utils import parallel_map
+from smqtk_descriptors.utils import parallel_map, ParallelWorkerPool
+from smqtk_descriptors.utils.parallel import close_worker_pools
 
 
 LOG = logging.getLogger(__name__)
@@ -77,6 +83,12 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
         Optional specific number of threads to use for data loading and
         pre-processing. If this is None or 0, we introspect the current
         system thread capacity and use that.
+    :param persistent_workers:
+        Keep the image loading worker threads alive between
+        ``generate_arrays`` calls, in a ``ParallelWorkerPool``, instead of
+        starting new ones for every call. This reduces the latency of small
+        requests. The pool is stopped by ``close``, when exiting a ``with``
+        block of the generator, or when the generator is garbage collected.
 
     :raises AssertionError: Optionally provided image mean protobuf
         consisted of more than one image, or its shape was neither 1 nor 3
@@ -150,7 +162,8 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
         load_truncated_images: bool = False,
         pixel_rescale: Optional[Tuple[float, float]] = None,
         input_scale: Optional[float] = None,
-        threads: Optional[int] = None
+        threads: Optional[int] = None,
+        persistent_workers: bool = False
     ):
         """
         Create a Caffe CNN descriptor generator
@@ -175,6 +188,12 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
         self.input_scale = input_scale
 
         self.threads = threads
+        self.persistent_workers = persistent_workers
+        # Persistent worker pools by pipeline stage name, closed by ``close``
+        # or, at the latest, when this instance is garbage collected or the
+        # interpreter exits.
+        self._worker_pools: Dict[str, ParallelWorkerPool] = {}
+        weakref.finalize(self, close_worker_pools, self._worker_pools)
 
         assert self.batch_size > 0, \
             "Batch size must be greater than 0 (got %d)" \
@@ -197,6 +216,8 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
         # This ``__dict__.update`` works because configuration parameters
         # exactly match up with instance attributes currently.
         self.__dict__.update(state)
+        self._worker_pools = {}
+        weakref.finalize(self, close_worker_pools, self._worker_pools)
         # Translate nested Configurable instance configurations into actual
         # object instances.
         self.network_prototxt = from_config_dict(
@@ -328,8 +349,28 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
             "pixel_rescale": self.pixel_rescale,
             "input_scale": self.input_scale,
             "threads": self.threads,
+            "persistent_workers": self.persistent_workers,
         }
 
+    def __enter__(self: T) -> T:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the workers of the persistent worker pool of this generator, if
+        any. The pool is started again on demand should this generator be
+        used after this. This is also called when exiting a ``with`` block.
+        """
+        close_worker_pools(self._worker_pools)
+
     def valid_content_types(self) -> Set[str]:
         """
         :return: A set valid MIME type content types that this descriptor can
@@ -360,6 +401,27 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
             input data elements.
         :rtype: collections.abc.Iterable[numpy.ndarray]
         """
+        for layer_descrs in self._generate_layer_arrays(data_iter,
+                                                        [self.return_layer]):
+            yield layer_descrs[self.return_layer]
+
+    def _generate_layer_arrays(
+        self,
+        data_iter: Iterable[DataElement],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, numpy.ndarray]]:
+        """
+        Generate descriptors from the data of several named blobs of the
+        network, like ``fc7`` and ``pool5``, from one forward pass per batch.
+
+        :param data_iter: Iterable of data element instances to be described.
+        :param layers: Labels of the network blobs to take descriptors from.
+
+        :raises RuntimeError: Descriptor extraction failure of some kind.
+
+        :return: Iterable of dictionaries of numpy arrays by blob label, in
+            parallel association with the input data elements.
+        """
         assert self.network is not None, (
             "A network should be initialized by now."
         )
@@ -370,15 +432,23 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
         # Start parallel operation to pre-process imagery before aggregating
         # for network execution.
         # TODO: update ``buffer_factor`` param to account for batch size?
-        img_array_iter = \
-            parallel_map(_process_load_img_array,
-                         zip(
-                             data_iter, itertools.repeat(self.transformer),
-                             itertools.repeat(self.data_layer),
-                             itertools.repeat(self.load_truncated_images),
-                             itertools.repeat(self.pixel_rescale),
-                         ),
-                         ordered=True, cores=self.threads)
+        load_args = zip(
+            data_iter, itertools.repeat(self.transformer),
+            itertools.repeat(self.data_layer),
+            itertools.repeat(self.load_truncated_images),
+            itertools.repeat(self.pixel_rescale),
+        )
+        if self.persistent_workers:
+            pool = self._worker_pools.get('load_img')
+            if pool is None or pool.closed:
+                pool = self._worker_pools['load_img'] = ParallelWorkerPool(
+                    cores=self.threads, name='load_img'
+                )
+            img_array_iter = parallel_map(_process_load_img_array, load_args,
+                                          ordered=True, pool=pool)
+        else:
+            img_array_iter = parallel_map(_process_load_img_array, load_args,
+                                          ordered=True, cores=self.threads)
 
         # Aggregate and process batches of input data elements
         #: :type: list[numpy.ndarray]
@@ -399,18 +469,19 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
             self.network.blobs[self.data_layer].data[...] = batch_img_arrays
             log_debug("Moving network forward")
             self.network.forward()
-            descriptor_list = self.network.blobs[self.return_layer].data
-            log_debug("extracting return layer '{:s}' into vectors"
-                      .format(self.return_layer))
-            for v in descriptor_list:
-                if v.ndim > 1:
-                    # In case caffe generates multidimensional array
-                    # like (rows, 1, 1)
-                    log_debug("- Raveling output array of shape {}"
-                              .format(v.shape))
-                    yield numpy.ravel(v)
-                else:
-                    yield v
+            layer_descr_lists: Dict[str, List[numpy.ndarray]] = {}
+            for layer in layers:
+                log_debug("extracting layer '{:s}' into vectors"
+                          .format(layer))
+                layer_descr_lists[layer] = [
+                    _ravel_descriptor(v)
+                    for v in self.network.blobs[layer].data
+                ]
+            for i in range(cur_batch_size):
+                # Copy vectors out of the blobs, which are overwritten by the
+                # next forward pass.
+                yield {layer: numpy.array(descr_list[i])
+                       for layer, descr_list in layer_descr_lists.items()}
 
             # Slice out the next batch
             #: :type: list[(collections.abc.Hashable, numpy.ndarray)]
@@ -419,6 +490,18 @@ class CaffeDescriptorGenerator (DescriptorGenerator):
             batch_i += 1
 
 
+def _ravel_descriptor(v: numpy.ndarray) -> numpy.ndarray:
+    """
+    :return: Descriptor vector of a blob's data for one input.
+    """
+    if v.ndim > 1:
+        # In case caffe generates multidimensional array
+        # like (rows, 1, 1)
+        LOG.debug("- Raveling output array of shape {}".format(v.shape))
+        return numpy.ravel(v)
+    return v
+
+
 def _process_load_img_array(
     input_tuple: Tuple[DataElement, "caffe.io.Transformer", str, bool, Optional[Tuple[float, float]]]
 ) -> Tuple[Hashable, numpy.ndarray]:
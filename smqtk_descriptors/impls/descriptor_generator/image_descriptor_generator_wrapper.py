@@ -1,4 +1,9 @@
-from typing import Dict, Any, Iterable, TypeVar, Type, Set, Optional
+from types import TracebackType
+from typing import (
+    Dict, Any, Iterable, Mapping, Sequence, TypeVar, Type, Set, Optional
+)
+import weakref
+
 import numpy as np
 
 from smqtk_image_io import ImageReader
@@ -8,7 +13,9 @@ from smqtk_core.configuration import (
     to_config_dict,
 )
 from smqtk_dataprovider import DataElement
-from smqtk_descriptors.utils.parallel import parallel_map
+from smqtk_descriptors.utils.parallel import (
+    close_worker_pools, parallel_map, ParallelWorkerPool
+)
 from smqtk_descriptors.interfaces.descriptor_generator import \
     DescriptorGenerator
 from smqtk_descriptors.interfaces.image_descriptor_generator import \
@@ -33,6 +40,11 @@ class ImageDescriptorGeneratorWrapper (DescriptorGenerator):
         Optional integer number of threads to parallelize image loading.
         Thread parallelism only occurs if this is a positive integer
         greater than 1.
+    :param bool persistent_workers:
+        Keep image loading threads alive between ``generate_arrays`` calls in
+        a ``ParallelWorkerPool`` instead of starting new ones for every call.
+        The pool is stopped by ``close``, when exiting a ``with`` block of the
+        generator, or when the generator is garbage collected.
     """
 
     @classmethod
@@ -66,12 +78,49 @@ class ImageDescriptorGeneratorWrapper (DescriptorGenerator):
         self,
         image_reader: ImageReader,
         image_descriptor_generator: ImageDescriptorGenerator,
-        image_load_threads: Optional[int] = None
+        image_load_threads: Optional[int] = None,
+        persistent_workers: bool = False
     ):
         super(ImageDescriptorGeneratorWrapper, self).__init__()
         self._image_reader = image_reader
         self._image_descr_generator = image_descriptor_generator
         self._image_load_threads = image_load_threads
+        self._persistent_workers = persistent_workers
+        # Persistent worker pools by pipeline stage name, closed by ``close``
+        # or, at the latest, when this instance is garbage collected or the
+        # interpreter exits.
+        self._worker_pools: Dict[str, ParallelWorkerPool] = {}
+        weakref.finalize(self, close_worker_pools, self._worker_pools)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        # Worker threads are not transferable.
+        del state['_worker_pools']
+        return state
+
+    def __setstate__(self, state: Mapping[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._worker_pools = {}
+        weakref.finalize(self, close_worker_pools, self._worker_pools)
+
+    def __enter__(self: T) -> T:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the workers of the persistent worker pool of this generator, if
+        any. The pool is started again on demand should this generator be
+        used after this. This is also called when exiting a ``with`` block.
+        """
+        close_worker_pools(self._worker_pools)
 
     def get_config(self) -> Dict[str, Any]:
         return {
@@ -79,6 +128,7 @@ class ImageDescriptorGeneratorWrapper (DescriptorGenerator):
             "image_descriptor_generator":
                 to_config_dict(self._image_descr_generator),
             "image_load_threads": self._image_load_threads,
+            "persistent_workers": self._persistent_workers,
         }
 
     def valid_content_types(self) -> Set[str]:
@@ -88,19 +138,41 @@ class ImageDescriptorGeneratorWrapper (DescriptorGenerator):
         # Check element validity though the ImageReader algorithm instance.
         return self._image_reader.is_valid_element(data_element)
 
-    def _generate_arrays(
+    def _load_images(
         self,
         data_iter: Iterable[DataElement]
     ) -> Iterable[np.ndarray]:
+        """
+        :return: Image matrices of the input data elements, loaded in
+            parallel threads when so configured.
+        """
         ir_load = self._image_reader.load_as_matrix
         i_load_threads = self._image_load_threads
 
         if i_load_threads and i_load_threads > 1:
-            return self._image_descr_generator.generate_arrays_from_images(
-                parallel_map(ir_load, data_iter,
-                             cores=i_load_threads)
-            )
-        else:
-            return self._image_descr_generator.generate_arrays_from_images(
-                ir_load(d) for d in data_iter
-            )
+            if self._persistent_workers:
+                pool = self._worker_pools.get("image_load")
+                if pool is None or pool.closed:
+                    pool = self._worker_pools["image_load"] = \
+                        ParallelWorkerPool(cores=i_load_threads,
+                                           name="image_load")
+                return parallel_map(ir_load, data_iter, pool=pool)
+            return parallel_map(ir_load, data_iter, cores=i_load_threads)
+        return (ir_load(d) for d in data_iter)
+
+    def _generate_arrays(
+        self,
+        data_iter: Iterable[DataElement]
+    ) -> Iterable[np.ndarray]:
+        return self._image_descr_generator.generate_arrays_from_images(
+            self._load_images(data_iter)
+        )
+
+    def _generate_layer_arrays(
+        self,
+        data_iter: Iterable[DataElement],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, np.ndarray]]:
+        return self._image_descr_generator.generate_layer_arrays_from_images(
+            self._load_images(data_iter), layers
+        )
@@ -0,0 +1,333 @@
+import copy
+import logging
+from typing import (
+    Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set,
+    Type, TypeVar, Union
+)
+
+import numpy as np
+
+from smqtk_core.configuration import (
+    from_config_dict,
+    make_default_config,
+    to_config_dict,
+)
+from smqtk_dataprovider import DataElement
+from smqtk_descriptors import DescriptorGenerator
+from smqtk_descriptors.impls.descriptor_generator.pytorch import (
+    normalize_vectors
+)
+from smqtk_descriptors.utils.batching import iter_batches
+from smqtk_descriptors.utils.parallel import parallel_map
+from smqtk_image_io import ImageReader
+
+
+LOG = logging.getLogger(__name__)
+
+try:
+    import onnxruntime  # type: ignore
+except ImportError:
+    onnxruntime = None
+
+try:
+    import PIL.Image  # type: ignore
+except ImportError:
+    PIL = None
+
+__all__ = [
+    "OnnxDescriptorGenerator",
+]
+T = TypeVar("T", bound="OnnxDescriptorGenerator")
+
+# ONNX Runtime graph optimization levels by ``graph_optimization_level``
+# value.
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disabled": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+class ImageTransform (object):
+    """
+    Picklable transform of an image matrix into a network input array,
+    equivalent to the ``torchvision`` transform of the torch generators:
+    conversion to RGB, bilinear resize, scaling of pixel values into the
+    ``[0, 1]`` range, per-channel normalization and transposition into
+    ``channels x height x width`` order.
+
+    :param image_size: Optional ``(height, width)`` to resize images to.
+    :param pixel_mean: Per-channel mean to subtract from scaled pixel values.
+    :param pixel_std: Per-channel standard deviation to divide scaled pixel
+        values by, after mean subtraction.
+    """
+
+    def __init__(
+        self,
+        image_size: Optional[Sequence[int]],
+        pixel_mean: Sequence[float],
+        pixel_std: Sequence[float]
+    ) -> None:
+        self.image_size = image_size
+        self.pixel_mean = np.asarray(pixel_mean, dtype=np.float32)
+        self.pixel_std = np.asarray(pixel_std, dtype=np.float32)
+
+    def __call__(self, img_mat: np.ndarray) -> np.ndarray:
+        img = PIL.Image.fromarray(img_mat)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if self.image_size is not None:
+            height, width = self.image_size
+            img = img.resize((width, height), PIL.Image.BILINEAR)
+        a = np.asarray(img, dtype=np.float32) / 255.
+        a = (a - self.pixel_mean) / self.pixel_std
+        return np.ascontiguousarray(a.transpose(2, 0, 1))
+
+
+class OnnxDescriptorGenerator (DescriptorGenerator):
+    """
+    Descriptor generator running an ONNX model through ONNX Runtime, without
+    depending on torch.
+
+    Input images are loaded with the image reader, transformed by
+    ``ImageTransform`` and computed in batches, with the loading and
+    transformation stages run in parallel threads like in the torch
+    generators' ``iter_runtime`` mode. The model output for each image is
+    flattened into its descriptor vector.
+
+    Models of configured torch generators may be exported for use here with
+    ``TorchModuleDescriptorGenerator.export_onnx``, whose default input size
+    and the default image transform parameters here match the ResNet-50 torch
+    generators.
+
+    :param model: Data element containing the ONNX model file.
+    :param image_reader: Image reader algorithm to use for image loading.
+    :param image_load_threads: Number of threads to use for parallel image
+        loading. Set to None to use all available CPU threads. This is 1
+        (serial) by default.
+    :param image_tform_threads: Number of threads to use for parallel image
+        transformation. Set to None to use all available CPU threads. This is
+        1 (serial) by default.
+    :param batch_size: Maximum number of images to compute in one model run.
+    :param image_size: Optional ``(height, width)`` to resize input images to.
+    :param pixel_mean: Per-channel mean to subtract from pixel values scaled
+        into the ``[0, 1]`` range.
+    :param pixel_std: Per-channel standard deviation to divide pixel values by
+        after mean subtraction.
+    :param normalize: Optionally normalize descriptor vectors as they are
+        produced. We use ``numpy.linalg.norm`` so any valid value for the
+        ``ord`` parameter is acceptable here.
+    :param input_name: Name of the model input to feed image batches to. By
+        default, this is the first input of the model.
+    :param output_name: Name of the model output to take descriptors from. By
+        default, this is the first output of the model.
+    :param intra_op_threads: Optional number of threads ONNX Runtime uses to
+        parallelize the computation of an operator. ONNX Runtime picks a
+        default by default.
+    :param inter_op_threads: Optional number of threads ONNX Runtime uses to
+        run independent operators in parallel. If set, operators are run in
+        parallel execution mode instead of sequentially.
+    :param graph_optimization_level: ONNX Runtime graph optimization level,
+        one of ``"disabled"``, ``"basic"``, ``"extended"`` or ``"all"``.
+    :param providers: Optional list of ONNX Runtime execution providers to
+        use, in order of preference, e.g. ``["CUDAExecutionProvider",
+        "CPUExecutionProvider"]``. By default, only the CPU is used.
+    """
+
+    @classmethod
+    def is_usable(cls) -> bool:
+        valid = onnxruntime is not None and PIL is not None
+        if not valid:
+            LOG.debug("ONNX Runtime or PIL python module not imported")
+        return valid
+
+    @classmethod
+    def get_default_config(cls) -> Dict[str, Any]:
+        c = super().get_default_config()
+        c['model'] = make_default_config(DataElement.get_impls())
+        c['image_reader'] = make_default_config(ImageReader.get_impls())
+        return c
+
+    @classmethod
+    def from_config(
+        cls: Type[T],
+        config_dict: Dict,
+        merge_default: bool = True
+    ) -> T:
+        # Copy config to prevent input modification
+        config_dict = copy.deepcopy(config_dict)
+        config_dict['model'] = from_config_dict(
+            config_dict['model'],
+            DataElement.get_impls()
+        )
+        config_dict['image_reader'] = from_config_dict(
+            config_dict['image_reader'],
+            ImageReader.get_impls()
+        )
+        return super().from_config(config_dict, merge_default)
+
+    def __init__(
+        self,
+        model: DataElement,
+        image_reader: ImageReader,
+        image_load_threads: Optional[int] = 1,
+        image_tform_threads: Optional[int] = 1,
+        batch_size: int = 32,
+        image_size: Optional[Sequence[int]] = (224, 224),
+        pixel_mean: Sequence[float] = (0.485, 0.456, 0.406),
+        pixel_std: Sequence[float] = (0.229, 0.224, 0.225),
+        normalize: Optional[Union[int, float, str]] = None,
+        input_name: Optional[str] = None,
+        output_name: Optional[str] = None,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        graph_optimization_level: str = "all",
+        providers: Optional[List[str]] = None
+    ):
+        super().__init__()
+        if graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError("Invalid graph optimization level {!r}, "
+                             "expected one of {}."
+                             .format(graph_optimization_level,
+                                     tuple(GRAPH_OPTIMIZATION_LEVELS)))
+        self.model = model
+        self.image_reader = image_reader
+        self.image_load_threads = image_load_threads
+        self.image_tform_threads = image_tform_threads
+        self.batch_size = batch_size
+        self.image_size = image_size
+        self.pixel_mean = pixel_mean
+        self.pixel_std = pixel_std
+        self.normalize = normalize
+        self.input_name = input_name
+        self.output_name = output_name
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.graph_optimization_level = graph_optimization_level
+        self.providers = providers
+        # Place-holder for the ONNX Runtime session loaded.
+        self.session: Optional["onnxruntime.InferenceSession"] = None
+        self._ensure_session()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self.get_config()
+
+    def __setstate__(self, state: Mapping[str, Any]) -> None:
+        # This ``__dict__.update`` works because configuration parameters
+        # exactly match up with instance attributes currently.
+        self.__dict__.update(state)
+        self.session = None
+        # Translate nested Configurable instance configurations into actual
+        # object instances.
+        self.model = from_config_dict(state['model'], DataElement.get_impls())
+        self.image_reader = from_config_dict(
+            state['image_reader'], ImageReader.get_impls()
+        )
+        self._ensure_session()
+
+    def valid_content_types(self) -> Set:
+        return self.image_reader.valid_content_types()
+
+    def is_valid_element(self, data_element: DataElement) -> bool:
+        # Check element validity though the ImageReader algorithm instance
+        return self.image_reader.is_valid_element(data_element)
+
+    def _ensure_session(self) -> "onnxruntime.InferenceSession":
+        if self.session is None:
+            opts = onnxruntime.SessionOptions()
+            opts.graph_optimization_level = getattr(
+                onnxruntime.GraphOptimizationLevel,
+                GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization_level]
+            )
+            if self.intra_op_threads is not None:
+                opts.intra_op_num_threads = self.intra_op_threads
+            if self.inter_op_threads is not None:
+                opts.inter_op_num_threads = self.inter_op_threads
+                opts.execution_mode = \
+                    onnxruntime.ExecutionMode.ORT_PARALLEL
+            self.session = onnxruntime.InferenceSession(
+                self.model.get_bytes(), sess_options=opts,
+                providers=self.providers or ["CPUExecutionProvider"]
+            )
+        return self.session
+
+    def _make_transform(self) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        :return: A callable that takes in a ``numpy.ndarray`` image matrix and
+            returns the transformed network input array.
+        """
+        return ImageTransform(self.image_size, self.pixel_mean,
+                              self.pixel_std)
+
+    def _parallel_stage(
+        self,
+        threads: Optional[int],
+        work_func: Callable[[Any], Any],
+        data_iter: Iterable
+    ) -> Iterable:
+        """
+        :return: Ordered results of a work function over input data, in
+            parallel threads if more than one thread is configured.
+        """
+        if threads is None or threads > 1:
+            return parallel_map(work_func, data_iter, cores=threads,
+                                ordered=True)
+        return (work_func(d) for d in data_iter)
+
+    def _generate_arrays(self, data_iter: Iterable[DataElement]) -> Iterable[np.ndarray]:
+        output_name = (self.output_name or
+                       self._ensure_session().get_outputs()[0].name)
+        for layer_descrs in self._generate_layer_arrays(data_iter,
+                                                        [output_name]):
+            yield layer_descrs[output_name]
+
+    def _generate_layer_arrays(
+        self,
+        data_iter: Iterable[DataElement],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, np.ndarray]]:
+        """
+        Generate descriptors from several named outputs of the model in one
+        run per batch. Intermediate tensors of the model are only available
+        if they were declared as model outputs, e.g. when exporting it.
+        """
+        session = self._ensure_session()
+        input_name = self.input_name or session.get_inputs()[0].name
+        layers = list(layers)
+
+        img_mat_iter = self._parallel_stage(self.image_load_threads,
+                                            self.image_reader.load_as_matrix,
+                                            data_iter)
+        tfed_mat_iter = self._parallel_stage(self.image_tform_threads,
+                                             self._make_transform(),
+                                             img_mat_iter)
+        for batch in iter_batches(tfed_mat_iter, self.batch_size):
+            outputs = session.run(layers, {input_name: np.stack(batch)})
+            layer_descrs = {}
+            for layer, output in zip(layers, outputs):
+                feats = np.asarray(output, dtype=np.float32)
+                feats = feats.reshape(len(batch), -1)
+                layer_descrs[layer] = normalize_vectors(feats, self.normalize)
+            for i in range(len(batch)):
+                yield {layer: descrs[i]
+                       for layer, descrs in layer_descrs.items()}
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "model": to_config_dict(self.model),
+            "image_reader": to_config_dict(self.image_reader),
+            "image_load_threads": self.image_load_threads,
+            "image_tform_threads": self.image_tform_threads,
+            "batch_size": self.batch_size,
+            "image_size": self.image_size,
+            "pixel_mean": self.pixel_mean,
+            "pixel_std": self.pixel_std,
+            "normalize": self.normalize,
+            "input_name": self.input_name,
+            "output_name": self.output_name,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "graph_optimization_level": self.graph_optimization_level,
+            "providers": self.providers,
+        }
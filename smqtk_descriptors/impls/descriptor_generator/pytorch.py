@@ -1,11 +1,16 @@
 import abc
 import copy
-import itertools
+import hashlib
 import logging
+import multiprocessing
+import os
+import tempfile
+from types import TracebackType
 from typing import (
-    Any, Callable, Dict, Iterable, Iterator, Mapping,
-    Optional, Sequence, Set, Type, TypeVar, Union
+    Any, Callable, Dict, Iterable, Iterator, List, Mapping,
+    Optional, Sequence, Set, Tuple, Type, TypeVar, Union
 )
+import weakref
 
 import numpy as np
 
@@ -17,7 +22,10 @@ from smqtk_core.configuration import (
     make_default_config,
     to_config_dict,
 )
-from smqtk_descriptors.utils.parallel import parallel_map
+from smqtk_descriptors.utils.batching import iter_batches
+from smqtk_descriptors.utils.parallel import (
+    close_worker_pools, parallel_map, ParallelWorkerPool, shared_memory
+)
 from smqtk_descriptors.utils.pytorch_utils import load_state_dict
 
 
@@ -38,6 +46,19 @@ __all__ = [
     "AlignedReIDResNet50TorchDescriptorGenerator"
 ]
 T = TypeVar("T", bound="TorchModuleDescriptorGenerator")
+# Function computing per-item results of a batch input tensor on the target
+# device.
+BatchForward = Callable[["torch.Tensor"], Iterable[Any]]
+
+# Image matrices of at least this many bytes are sent to transform worker
+# processes through shared memory.
+TFORM_SHARED_MEMORY_MIN_BYTES = 64 * 1024
+# Valid ``compile_mode`` values of ``TorchModuleDescriptorGenerator``.
+COMPILE_MODES = (None, "trace", "script")
+# Valid ``quantize`` values of ``TorchModuleDescriptorGenerator``.
+QUANTIZE_MODES = (None, "dynamic", "static")
+# Valid ``descriptor_dtype`` values of ``TorchModuleDescriptorGenerator``.
+DESCRIPTOR_DTYPES = ("float32", "float16")
 
 
 def normalize_vectors(
@@ -51,17 +72,53 @@ def normalize_vectors(
     :param v: Vector to normalize.
     :param mode: ``numpy.linalg.norm`` order parameter.
 
-    :return: Normalize version of the input array ``v``.
+    :return: Normalize version of the input array ``v``. Floating point input
+        keeps its precision, though norms are computed in at least single
+        precision to avoid half precision overflow and rounding.
     """
     if mode is not None:
-        n = np.linalg.norm(v, mode, v.ndim - 1, keepdims=True)
+        v_safe = v.astype(np.promote_types(v.dtype, np.float32), copy=False)
+        n = np.linalg.norm(v_safe, mode, v.ndim - 1, keepdims=True)
         # replace 0's with 1's, preventing div-by-zero
         n[n == 0.] = 1.
-        return v / n
+        if np.issubdtype(v.dtype, np.floating):
+            return (v_safe / n).astype(v.dtype, copy=False)
+        return v_safe / n
     # When normalization off
     return v
 
 
+def cosine_drift(reference: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """
+    Cosine distance between corresponding rows of two descriptor matrices,
+    i.e. one minus their cosine similarity. Zero vectors are treated as
+    having a norm of one.
+
+    :param reference: Reference descriptor matrix.
+    :param other: Descriptor matrix of the same shape to compare.
+
+    :return: Array of the cosine distance of each row pair.
+    """
+    reference = normalize_vectors(reference.astype(np.float64), 2)
+    other = normalize_vectors(other.astype(np.float64), 2)
+    return 1. - np.sum(reference * other, axis=reference.ndim - 1)
+
+
+def _cpu_bf16_supported() -> bool:
+    """
+    :return: If bfloat16 CPU autocast is available and the host CPU has
+        native bfloat16 support, as far as torch can tell.
+    """
+    if not hasattr(torch, "autocast"):
+        return False
+    try:
+        is_supported = torch.ops.mkldnn._is_mkldnn_bf16_supported
+    except (AttributeError, RuntimeError):
+        # Unable to tell, so let the first autocast forward pass decide.
+        return True
+    return bool(is_supported())
+
+
 try:
     class ImgMatDataset (Dataset):
 
@@ -78,10 +135,69 @@ try:
 
         def __len__(self) -> int:
             return len(self.img_mat_list)
+
+    class DataElementDataset (Dataset):
+        """
+        Dataset of transformed images of data elements, indexed by the data
+        elements themselves, loading and transforming images in the
+        ``DataLoader`` workers fetching them.
+
+        Paired with a batch sampler yielding batches of data elements pulled
+        from an input iterable, the input is consumed in the main process, as
+        batches are requested, while only the elements of requested batches
+        are sent to the workers. Data elements must therefore be picklable.
+        """
+
+        def __init__(
+            self,
+            image_reader: ImageReader,
+            transform: Callable[[np.ndarray], "torch.Tensor"]
+        ) -> None:
+            self.image_reader = image_reader
+            self.transform = transform
+
+        def __getitem__(self, elem: DataElement) -> "torch.Tensor":
+            return self.transform(self.image_reader.load_as_matrix(elem))
+
+    class _ExportModule (torch.nn.Module):
+        """
+        Module computing the batch features of a generator's network, for
+        export.
+        """
+
+        def __init__(
+            self,
+            generator: "TorchModuleDescriptorGenerator",
+            module: "torch.nn.Module"
+        ) -> None:
+            super().__init__()
+            self.module = module
+            self.output_features = generator._output_features
+
+        def forward(self, x: "torch.Tensor") -> "torch.Tensor":
+            return self.output_features(self.module(x))
 except NameError:
     pass
 
 
+class _LoadAndTransform (object):
+    """
+    Picklable work function loading the image of a data element and
+    transforming it into a network input tensor in one step.
+    """
+
+    def __init__(
+        self,
+        image_reader: ImageReader,
+        transform: Callable[[np.ndarray], "torch.Tensor"]
+    ) -> None:
+        self.image_reader = image_reader
+        self.transform = transform
+
+    def __call__(self, elem: DataElement) -> "torch.Tensor":
+        return self.transform(self.image_reader.load_as_matrix(elem))
+
+
 class TorchModuleDescriptorGenerator (DescriptorGenerator):
     """
     Descriptor generator using some torch module.
@@ -121,14 +237,86 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
         batch-size instead of input image data amount, as well as having lower
         latency to first yield.
         This mode is idea for streaming input or high input volume situations.
-        This mode currently has a short-coming of working only in a threaded
-        manner so it is not as fast as using the `DataLoader` avenue.
+        By default this mode transforms images in threads, so it is not as
+        fast as using the `DataLoader` avenue for CPU heavy transforms unless
+        ``image_tform_processes`` is enabled.
     :param global_average_pool:
         Optionally apply a GAP operation to the spatial dimension of the feature
         vector that is returned by the descriptor generator. Some models return
         a w x h x k tensor and flatten them into a single dimension, which can
         remove the spatial context of the features. Taking an average over each
         channel can improve the clustering in some cases.
+    :param persistent_workers:
+        Keep the image loading and transformation worker threads alive
+        between ``generate_arrays`` calls, in a ``ParallelWorkerPool`` per
+        stage, instead of starting new ones for every call. This reduces the
+        latency of small requests. Pools are stopped by ``close``, when
+        exiting a ``with`` block of the generator, or when the generator is
+        garbage collected.
+    :param batch_max_wait:
+        Optional maximum time in seconds to wait for a batch to fill in the
+        ``iter_runtime`` mode. Once this much time has passed since the first
+        image of a batch was transformed, the partial batch is computed
+        instead of waiting for ``batch_size`` images. This bounds the latency
+        of descriptors for a trickling input stream while bulk input still
+        gets full batches. By default, batches wait to be full.
+    :param image_tform_processes:
+        Transform images in ``image_tform_threads`` worker processes instead
+        of threads in the ``iter_runtime`` mode, for ``DataLoader`` level CPU
+        parallelism with the bounded memory and low latency of streaming.
+        Image matrices are sent to the workers through shared memory and
+        transformed tensors are returned through torch's shared memory
+        tensor transport. Transforms from ``_make_transform`` must be
+        picklable.
+    :param streaming_dataloader:
+        When not in the ``iter_runtime`` mode, stream input through a
+        ``DataLoader`` instead of gathering all loaded images into a list
+        first. Input is pulled in batches in this process, as the
+        ``DataLoader`` requests them, and images are then both loaded and
+        transformed in ``image_tform_threads`` ``DataLoader`` worker
+        processes, so ``image_load_threads`` is not used. Input data elements
+        are sent to the worker processes, so must be picklable.
+    :param fused_load_transform:
+        In the ``iter_runtime`` mode, load and transform each image in the
+        same worker of a single stage of ``image_tform_threads`` threads, or
+        processes if ``image_tform_processes`` is enabled, instead of in
+        separate loading and transformation stages. This halves the queue
+        traffic per image and full resolution image matrices are not held in
+        queues between stages. ``image_load_threads`` is not used in this
+        case.
+    :param compile_mode:
+        Optionally run the loaded module as a TorchScript module, compiled
+        by ``"trace"``-ing it with the first batch of each input shape or by
+        ``"script"``-ing it, and frozen for operator fusion where supported.
+        This reduces the eager Python overhead of inference, notably on the
+        CPU.
+    :param compile_cache_dir:
+        Optional directory to save compiled modules in and load them from on
+        later start-ups, instead of compiling again. Saved modules are keyed
+        by the generator type, a hash of the weights file, the compile and
+        quantization modes, the input shape, the device and the torch
+        version.
+    :param quantize:
+        Optionally run int8 post-training quantized versions of the loaded
+        module for CPU inference. ``"dynamic"`` quantizes the weights of
+        linear layers ahead of time and their activations on the fly.
+        ``"static"`` additionally quantizes convolutions, calibrating
+        activation ranges on the first input batch, so the first batch
+        should be representative and ``batch_size`` not too small. The
+        module is quantized on the first batch, unless a compiled quantized
+        module is loaded from ``compile_cache_dir`` instead. The cosine drift
+        of the descriptors of the module run from the unquantized ones on
+        the first batch is reported in ``quantization_drift``. This cannot be combined with ``use_gpu``.
+    :param cpu_autocast:
+        Run the network under bfloat16 autocast when computing on the CPU,
+        if the host CPU supports bfloat16. Otherwise, or if an autocast
+        forward pass fails, we fall back to float32 with a warning. This is
+        ignored when ``use_gpu`` or ``quantize`` is set.
+    :param descriptor_dtype:
+        Floating point type of the produced descriptor vectors, either
+        ``"float32"`` or ``"float16"`` to halve their storage and transfer
+        size. Descriptors are normalized before conversion, in single
+        precision.
     """
 
     @classmethod
@@ -169,9 +357,31 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
         cuda_device: Optional[int] = None,
         normalize: Optional[Union[int, float, str]] = None,
         iter_runtime: bool = False,
-        global_average_pool: bool = False
+        global_average_pool: bool = False,
+        persistent_workers: bool = False,
+        batch_max_wait: Optional[float] = None,
+        image_tform_processes: bool = False,
+        streaming_dataloader: bool = False,
+        fused_load_transform: bool = False,
+        compile_mode: Optional[str] = None,
+        compile_cache_dir: Optional[str] = None,
+        quantize: Optional[str] = None,
+        cpu_autocast: bool = False,
+        descriptor_dtype: str = "float32"
     ):
         super().__init__()
+        if compile_mode not in COMPILE_MODES:
+            raise ValueError("Invalid compile mode {!r}, expected one of {}."
+                             .format(compile_mode, COMPILE_MODES))
+        if quantize not in QUANTIZE_MODES:
+            raise ValueError("Invalid quantize mode {!r}, expected one of {}."
+                             .format(quantize, QUANTIZE_MODES))
+        if quantize is not None and use_gpu:
+            raise ValueError("Quantized inference is only supported on the "
+                             "CPU, so quantize cannot be used with use_gpu.")
+        if descriptor_dtype not in DESCRIPTOR_DTYPES:
+            raise ValueError("Invalid descriptor dtype {!r}, expected one of "
+                             "{}.".format(descriptor_dtype, DESCRIPTOR_DTYPES))
 
         self.image_reader = image_reader
         self.image_load_threads = image_load_threads
@@ -183,6 +393,32 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
         self.normalize = normalize
         self.iter_runtime = iter_runtime
         self.global_average_pool = global_average_pool
+        self.persistent_workers = persistent_workers
+        self.batch_max_wait = batch_max_wait
+        self.image_tform_processes = image_tform_processes
+        self.streaming_dataloader = streaming_dataloader
+        self.fused_load_transform = fused_load_transform
+        self.compile_mode = compile_mode
+        self.compile_cache_dir = compile_cache_dir
+        self.quantize = quantize
+        self.cpu_autocast = cpu_autocast
+        self.descriptor_dtype = descriptor_dtype
+        # If bfloat16 CPU autocast is usable, once checked.
+        self._cpu_autocast_supported: Optional[bool] = None
+        # Persistent worker pools by pipeline stage name, closed by ``close``
+        # or, at the latest, when this instance is garbage collected or the
+        # interpreter exits.
+        self._worker_pools: Dict[str, ParallelWorkerPool] = {}
+        weakref.finalize(self, close_worker_pools, self._worker_pools)
+        # Compiled modules by per-item input shape.
+        self._compiled_modules: Dict[Tuple[int, ...], "torch.nn.Module"] = {}
+        # Feature extraction modules by requested layer names.
+        self._layer_extractors: Dict[Tuple[str, ...], "torch.nn.Module"] = {}
+        # Quantized version of the loaded module, once quantized.
+        self._quantized_module: Optional[torch.nn.Module] = None
+        # Cosine drift statistics of the quantized module's descriptors, from
+        # the batch it was quantized on.
+        self.quantization_drift: Optional[Dict[str, float]] = None
         # Place-holder for the torch.nn.Module loaded.
         self.module: Optional[torch.nn.Module] = None
         # Just load model on construction
@@ -210,6 +446,14 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
         # This ``__dict__.update`` works because configuration parameters
         # exactly match up with instance attributes currently.
         self.__dict__.update(state)
+        self._worker_pools = {}
+        weakref.finalize(self, close_worker_pools, self._worker_pools)
+        self._compiled_modules = {}
+        self._layer_extractors = {}
+        self._quantized_module = None
+        self.quantization_drift = None
+        self._cpu_autocast_supported = None
+        self.module = None
         # Translate nested Configurable instance configurations into actual
         # object instances.
         self.image_reader = from_config_dict(
@@ -251,9 +495,383 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
 
         return self.module
 
+    def _execution_module(
+        self,
+        model: "torch.nn.Module",
+        model_input: "torch.Tensor"
+    ) -> "torch.nn.Module":
+        """
+        Get the module to run on the given input batch: the loaded module, or
+        its quantized version when ``quantize`` is set, compiled for the
+        shape of the input items when ``compile_mode`` is set.
+
+        :param model: Loaded eager module.
+        :param model_input: Batch input tensor on the target device.
+
+        :return: Module to call on the input.
+        """
+        if self.compile_mode is not None:
+            item_shape = tuple(model_input.shape[1:])
+            module = self._compiled_modules.get(item_shape)
+            if module is None:
+                # A cached module was compiled from an earlier quantization,
+                # so the module is only quantized when compiling anew.
+                cache_fp = self._compile_cache_path(item_shape)
+                module = self._load_compiled_module(cache_fp)
+                if module is None:
+                    module = self._compile_module(
+                        self._ensure_quantized_module(model, model_input),
+                        model_input, cache_fp
+                    )
+                self._compiled_modules[item_shape] = module
+        elif self.quantize is not None:
+            module = self._ensure_quantized_module(model, model_input)
+        else:
+            return model
+        if self.quantize is not None and self.quantization_drift is None:
+            self.quantization_drift = \
+                self.measure_quantization_drift(model_input)
+            LOG.info("Cosine drift of {} quantized descriptors: {}"
+                     .format(self.quantize, self.quantization_drift))
+        return module
+
+    def _ensure_quantized_module(
+        self,
+        model: "torch.nn.Module",
+        model_input: "torch.Tensor"
+    ) -> "torch.nn.Module":
+        """
+        :return: The quantized version of the loaded module, quantized on the
+            given batch if not yet done, or the loaded module when
+            ``quantize`` is not set.
+        """
+        if self.quantize is None:
+            return model
+        if self._quantized_module is None:
+            self._quantized_module = self._quantize_module(model, model_input)
+        return self._quantized_module
+
+    def _quantize_module(
+        self,
+        model: "torch.nn.Module",
+        model_input: "torch.Tensor"
+    ) -> "torch.nn.Module":
+        """
+        Quantize the loaded module to int8 for CPU inference. Linear layers
+        are dynamically quantized. In the ``"static"`` mode, the rest of the
+        network is statically quantized through FX graph mode quantization,
+        calibrated on the given batch.
+
+        :param model: Loaded eager module.
+        :param model_input: Calibration batch input tensor.
+
+        :return: New quantized module. The loaded module is not modified.
+        """
+        from torch.ao import quantization as tq  # type: ignore
+        LOG.info("Quantizing module ({})".format(self.quantize))
+        with torch.no_grad():
+            if self.quantize == "dynamic":
+                return tq.quantize_dynamic(copy.deepcopy(model),
+                                           {torch.nn.Linear},
+                                           dtype=torch.qint8)
+
+            from torch.ao.quantization import quantize_fx  # type: ignore
+            qconfig_mapping = tq.get_default_qconfig_mapping(
+                torch.backends.quantized.engine
+            ).set_object_type(torch.nn.Linear, tq.default_dynamic_qconfig)
+            prepared = quantize_fx.prepare_fx(copy.deepcopy(model),
+                                              qconfig_mapping,
+                                              example_inputs=(model_input,))
+            # Calibrate activation observers.
+            prepared(model_input)
+            return quantize_fx.convert_fx(prepared)
+
+    def measure_quantization_drift(
+        self,
+        model_input: "torch.Tensor"
+    ) -> Dict[str, float]:
+        """
+        Measure the cosine drift of descriptors computed by the quantized
+        module from those of the unquantized module on a sample batch. When
+        ``compile_mode`` is set, this is the compiled module run for inputs
+        shaped like the sample, which may have been loaded from
+        ``compile_cache_dir``.
+
+        :param model_input: Sample batch input tensor, as transformed by
+            ``_make_transform``.
+
+        :raises RuntimeError: The module has not been quantized yet.
+
+        :return: Mean and maximum cosine distance between the quantized and
+            unquantized descriptors of the sample, and the sample size.
+        """
+        if self.compile_mode is not None:
+            quantized = self._compiled_modules.get(
+                tuple(model_input.shape[1:])
+            )
+        else:
+            quantized = self._quantized_module
+        if self.quantize is None or quantized is None:
+            raise RuntimeError("Module has not been quantized yet.")
+        drift = cosine_drift(
+            self._forward(self._ensure_module(), model_input),
+            self._forward(quantized, model_input)
+        )
+        return {
+            "mean_cosine_drift": float(drift.mean()),
+            "max_cosine_drift": float(drift.max()),
+            "num_samples": len(drift),
+        }
+
+    def _compile_cache_key(self, item_shape: Sequence[int]) -> str:
+        """
+        :return: Hex digest identifying a compiled module of this generator's
+            network for input items of the given shape.
+        """
+        h = hashlib.sha256()
+        for part in (type(self).__module__, type(self).__name__,
+                     self.compile_mode, self.quantize, tuple(item_shape),
+                     self.cuda_device if self.use_gpu else "cpu",
+                     torch.__version__):
+            h.update(repr(part).encode())
+        if self.weights_filepath:
+            with open(self.weights_filepath, 'rb') as f:
+                for block in iter(lambda: f.read(2**20), b''):
+                    h.update(block)
+        else:
+            h.update(b'pretrained')
+        return h.hexdigest()
+
+    def _compile_cache_path(self, item_shape: Sequence[int]) -> Optional[str]:
+        """
+        :return: Path of the compiled module of this generator's network for
+            input items of the given shape in ``compile_cache_dir``, or None
+            if that is not set.
+        """
+        if not self.compile_cache_dir:
+            return None
+        return os.path.join(
+            self.compile_cache_dir,
+            "{}-{}.pt".format(type(self).__name__,
+                              self._compile_cache_key(item_shape))
+        )
+
+    def _load_compiled_module(
+        self,
+        cache_fp: Optional[str]
+    ) -> Optional["torch.nn.Module"]:
+        """
+        :param cache_fp: Optional path of a cached compiled module.
+
+        :return: Compiled module loaded from the given path, or None if there
+            is none.
+        """
+        if cache_fp is None or not os.path.isfile(cache_fp):
+            return None
+        LOG.info("Loading compiled module from {}".format(cache_fp))
+        map_location = "cpu"
+        if self.use_gpu:
+            map_location = torch.device("cuda", self.cuda_device)
+        return torch.jit.load(cache_fp, map_location=map_location)
+
+    def _compile_module(
+        self,
+        model: "torch.nn.Module",
+        model_input: "torch.Tensor",
+        cache_fp: Optional[str] = None
+    ) -> "torch.nn.Module":
+        """
+        Compile the given module for inputs shaped like the given batch,
+        saving it to the given cache path if any.
+        """
+        LOG.info("Compiling module by {} for input items of shape {}"
+                 .format(self.compile_mode, tuple(model_input.shape[1:])))
+        with torch.no_grad():
+            if self.compile_mode == "trace":
+                compiled = torch.jit.trace(model, model_input)
+            else:
+                compiled = torch.jit.script(model)
+            if hasattr(torch.jit, "freeze"):
+                compiled = torch.jit.freeze(compiled)
+
+        if cache_fp is not None:
+            cache_dir = os.path.dirname(cache_fp)
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write to a temporary file first so that concurrent start-ups
+            # never load a partially written module.
+            fd, tmp_fp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                torch.jit.save(compiled, tmp_fp)
+                os.replace(tmp_fp, cache_fp)
+            except BaseException:
+                os.remove(tmp_fp)
+                raise
+            LOG.info("Saved compiled module to {}".format(cache_fp))
+        return compiled
+
+    def __enter__(self: T) -> T:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the workers of the persistent worker pools of this generator, if
+        any. Pools are started again on demand should this generator be used
+        after this. This is also called when exiting a ``with`` block.
+        """
+        close_worker_pools(self._worker_pools)
+
+    def _parallel_map(
+        self,
+        stage: str,
+        cores: Optional[int],
+        work_func: Callable[..., Any],
+        data_iter: Iterable,
+        use_multiprocessing: bool = False,
+        **kwargs: Any
+    ) -> Iterator:
+        """
+        Map a work function over input data in parallel threads, or
+        processes, for a stage of the generation pipeline, using the
+        persistent worker pool of that stage when ``persistent_workers`` is
+        enabled.
+
+        :param stage: Name of the pipeline stage.
+        :param cores: Number of threads or processes to use.
+        :param work_func: Function to map. This must be picklable when using
+            processes.
+        :param data_iter: Input data to map over.
+        :param use_multiprocessing: Use worker processes instead of threads,
+            sending large input arrays through shared memory where
+            available.
+        :param kwargs: Additional ``parallel_map`` job options.
+
+        :return: Iterator of work results.
+        """
+        shm_min_bytes = None
+        if use_multiprocessing and shared_memory is not None:
+            shm_min_bytes = TFORM_SHARED_MEMORY_MIN_BYTES
+        if not self.persistent_workers:
+            return parallel_map(work_func, data_iter, cores=cores,
+                                use_multiprocessing=use_multiprocessing,
+                                shared_memory_min_bytes=shm_min_bytes,
+                                **kwargs)
+        pool = self._worker_pools.get(stage)
+        if pool is None or pool.closed:
+            pool = self._worker_pools[stage] = ParallelWorkerPool(
+                cores=cores, use_multiprocessing=use_multiprocessing,
+                name=stage, shared_memory_min_bytes=shm_min_bytes
+            )
+        return parallel_map(work_func, data_iter, pool=pool, **kwargs)
+
     def _generate_arrays(self, data_iter: Iterable[DataElement]) -> Iterable[np.ndarray]:
+        return self._generate_outputs(data_iter, self._forward_batch)
+
+    def _generate_layer_arrays(
+        self,
+        data_iter: Iterable[DataElement],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, np.ndarray]]:
+        """
+        Generate descriptors of the outputs of several named nodes of the
+        loaded module in one forward pass, through any of the input pipeline
+        modes. Layer names are those accepted as ``return_nodes`` by
+        ``torchvision.models.feature_extraction.create_feature_extractor``,
+        like the qualified names of submodules as given by
+        ``named_modules()``. For example, ``"7"`` and ``"8"`` name the last
+        residual stage and the average pool of
+        ``Resnet50SequentialTorchDescriptorGenerator``.
+
+        Layer outputs with spatial dimensions are globally average pooled if
+        ``global_average_pool`` is set, and flattened otherwise, before being
+        normalized like other descriptors. The ``compile_mode`` and
+        ``quantize`` options do not apply to multi-layer generation.
+        """
+        extractor = self._layer_extractor(tuple(layers))
+        return self._generate_outputs(
+            data_iter,
+            lambda x: self._forward_layers(extractor, x)
+        )
+
+    def _layer_extractor(self, layers: Tuple[str, ...]) -> "torch.nn.Module":
+        """
+        :return: Module returning the outputs of the named nodes of the loaded
+            module as a dictionary, cached by layer names.
+        """
+        extractor = self._layer_extractors.get(layers)
+        if extractor is None:
+            from torchvision.models.feature_extraction import (  # type: ignore
+                create_feature_extractor
+            )
+            extractor = self._layer_extractors[layers] = \
+                create_feature_extractor(self._ensure_module(),
+                                         return_nodes=list(layers))
+            extractor.eval()
+        return extractor
+
+    def _forward_layers(
+        self,
+        extractor: "torch.nn.Module",
+        model_input: "torch.Tensor"
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        :return: Descriptors of each layer by name, for each item of the
+            input batch.
+        """
+        outputs = self._run_module(extractor, model_input)
+        layer_descrs = {}
+        for layer, feats in outputs.items():
+            if self.global_average_pool and len(feats.size()) > 2:
+                feats = F.avg_pool2d(feats, feats.size()[2:])
+            feats = feats.reshape(feats.size(0), -1)
+            layer_descrs[layer] = self._features_to_descriptors(feats)
+        return [{layer: descrs[i] for layer, descrs in layer_descrs.items()}
+                for i in range(model_input.size(0))]
+
+    def _forward_batch(self, model_input: "torch.Tensor") -> np.ndarray:
+        """
+        :return: Descriptors of the items of a batch input tensor on the
+            target device.
+        """
+        model = self._ensure_module()
+        return self._forward(self._execution_module(model, model_input),
+                             model_input)
+
+    def _generate_outputs(
+        self,
+        data_iter: Iterable[DataElement],
+        forward: BatchForward
+    ) -> Iterable[Any]:
+        """
+        Load and transform the images of data elements through the configured
+        pipeline, computing per-item results of batches of them.
+
+        :param data_iter: Iterable of data elements to describe.
+        :param forward: Function computing per-item results of a batch.
+
+        :return: Iterable of results in parallel association with the input
+            data elements.
+        """
         # Generically load image data [in parallel], iterating results into
         # template method.
+        if self.streaming_dataloader and not self.iter_runtime:
+            return self.generate_arrays_from_elements_streaming(data_iter,
+                                                                forward)
+        if self.fused_load_transform and self.iter_runtime:
+            return self._generate_arrays_from_tensors(self._parallel_transform(
+                "load_tform_img",
+                _LoadAndTransform(self.image_reader, self._make_transform()),
+                data_iter
+            ), forward)
+
         ir_load: Callable[..., Any] = self.image_reader.load_as_matrix
         i_load_threads = self.image_load_threads
 
@@ -264,12 +882,14 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
 
         if i_load_threads is None or i_load_threads > 1:
             return gen_fn(
-                parallel_map(ir_load, data_iter,
-                             cores=i_load_threads)
+                self._parallel_map("img_load", i_load_threads, ir_load,
+                                   data_iter),
+                forward
             )
         else:
             return gen_fn(
-                ir_load(d) for d in data_iter
+                (ir_load(d) for d in data_iter),
+                forward
             )
 
     # NOTE: may need to create wrapper function around _make_transform
@@ -278,43 +898,91 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
 
     def generate_arrays_from_images_naive(
         self,
-        img_mat_iter: Iterable[DataElement]
+        img_mat_iter: Iterable[DataElement],
+        forward: Optional[BatchForward] = None
     ) -> Iterable[np.ndarray]:
-        model = self._ensure_module()
+        self._ensure_module()
 
         # Just gather all input into list for pytorch dataset wrapping
         img_mat_list = list(img_mat_iter)
         tform_img_fn = self._make_transform()
         use_gpu = self.use_gpu
-        cuda_device = self.cuda_device
-
-        if self.image_tform_threads is not None:
-            num_workers: int = min(self.image_tform_threads, len(img_mat_list))
-        else:
-            num_workers = len(img_mat_list)
 
         dl = torch.utils.data.DataLoader(
             ImgMatDataset(img_mat_list, tform_img_fn),
             batch_size=self.batch_size,
             # Don't need more workers than we have input, so don't bother
             # spinning them up...
-            num_workers=num_workers,
+            num_workers=min(self._num_loader_workers(), len(img_mat_list)),
             # Use pinned memory when we're in use-gpu mode.
             pin_memory=use_gpu is True)
+        return self._generate_arrays_from_loader(dl, forward)
+
+    def generate_arrays_from_elements_streaming(
+        self,
+        data_iter: Iterable[DataElement],
+        forward: Optional[BatchForward] = None
+    ) -> Iterable[np.ndarray]:
+        """
+        Generate descriptors of data elements through a ``DataLoader`` over
+        a ``DataElementDataset``, loading and transforming images in its
+        worker processes without holding all input in memory.
+
+        Batches of input data elements are pulled from ``data_iter`` in this
+        process by the ``DataLoader``'s batch sampler, at most a few batches
+        per worker ahead of the batches computed, so ``data_iter`` may be any
+        iterable, including a stateful generator.
+
+        :param data_iter: Iterable of data elements to describe.
+        :param forward: Optional function computing per-item results of a
+            batch instead of descriptors.
 
+        :return: Iterable of numpy arrays in parallel association with the
+            input data elements.
+        """
+        self._ensure_module()
+        dl = torch.utils.data.DataLoader(
+            DataElementDataset(self.image_reader, self._make_transform()),
+            batch_sampler=iter_batches(data_iter, self.batch_size),
+            num_workers=self._num_loader_workers(),
+            # Use pinned memory when we're in use-gpu mode.
+            pin_memory=self.use_gpu is True)
+        return self._generate_arrays_from_loader(dl, forward)
+
+    def _num_loader_workers(self) -> int:
+        """
+        :return: Number of ``DataLoader`` worker processes to use, being
+            ``image_tform_threads`` or the number of CPU cores if that is
+            None.
+        """
+        if self.image_tform_threads is not None:
+            return self.image_tform_threads
+        return multiprocessing.cpu_count()
+
+    def _generate_arrays_from_loader(
+        self,
+        dl: "torch.utils.data.DataLoader",
+        forward: Optional[BatchForward] = None
+    ) -> Iterable[Any]:
+        """
+        :return: Descriptors, or ``forward`` results, of the batches of a
+            ``DataLoader``.
+        """
+        forward = forward or self._forward_batch
+        use_gpu = self.use_gpu
+        cuda_device = self.cuda_device
         for batch_input in dl:
             # batch_input: batch_size x channels x height x width
             if use_gpu:
                 batch_input = batch_input.cuda(cuda_device)
 
-            feats = self._forward(model, batch_input)
-
-            for f in feats:
+            for f in forward(batch_input):
                 yield f
 
     def generate_arrays_from_images_iter(
         self,
-        img_mat_iter: Iterable[DataElement]
+        img_mat_iter: Iterable[DataElement],
+        forward: Optional[BatchForward] = None
     ) -> Iterable[np.ndarray]:
         """
         Template method for implementation to define descriptor generation over
@@ -322,66 +990,113 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
 
         :param img_mat_iter:
             Iterable of numpy arrays representing input image matrices.
+        :param forward:
+            Optional function computing per-item results of a batch instead
+            of descriptors.
 
         :raises
 
         :return: Iterable of numpy arrays in parallel association with the
             input image matrices.
         """
-        model = self._ensure_module()
-
         # Set up running parallelize
         # - Not utilizing a DataLoader due to input being an iterator where
         #   we don't know the size of input a priori.
-        tform_img_fn: Callable[..., Any] = self._make_transform()
+        return self._generate_arrays_from_tensors(self._parallel_transform(
+            "tform_img", self._make_transform(), img_mat_iter
+        ), forward)
+
+    def _parallel_transform(
+        self,
+        stage: str,
+        tform_fn: Callable[[Any], "torch.Tensor"],
+        data_iter: Iterable
+    ) -> Iterator["torch.Tensor"]:
+        """
+        Apply a transform to input data in order, in ``image_tform_threads``
+        threads, or processes if ``image_tform_processes`` is enabled, or
+        serially in this thread if a single thread is configured.
+
+        :param stage: Name of the pipeline stage.
+        :param tform_fn: Function transforming an input into a network input
+            tensor.
+        :param data_iter: Input data to transform.
+
+        :return: Iterator of transformed tensors in input order.
+        """
         tform_threads = self.image_tform_threads
-        if tform_threads is None or tform_threads > 1:
-            tfed_mat_iter: Iterator = parallel_map(tform_img_fn,
-                                                   img_mat_iter,
-                                                   cores=self.image_tform_threads,
-                                                   name="tform_img",
-                                                   ordered=True)
-        else:
-            tfed_mat_iter = (
-                tform_img_fn(mat)
-                for mat in img_mat_iter
+        if (self.image_tform_processes or tform_threads is None or
+                tform_threads > 1):
+            return self._parallel_map(
+                stage, tform_threads, tform_fn, data_iter,
+                use_multiprocessing=self.image_tform_processes,
+                name=stage, ordered=True
             )
+        return (tform_fn(d) for d in data_iter)
 
-        batch_size = self.batch_size
+    def _generate_arrays_from_tensors(
+        self,
+        tfed_mat_iter: Iterable["torch.Tensor"],
+        forward: Optional[BatchForward] = None
+    ) -> Iterable[Any]:
+        """
+        :return: Descriptors, or ``forward`` results, of transformed image
+            tensors, computed in batches.
+        """
+        forward = forward or self._forward_batch
         use_gpu = self.use_gpu
-        # We don't know the shape of input data yet.
-        batch_tensor = None
-
-        #: :type: list[torch.Tensor]
-        batch_slice = list(itertools.islice(tfed_mat_iter, batch_size))
         cuda_device = self.cuda_device
-        while batch_slice:
-            # Use batch tensor unless this is the leaf batch, in which case
-            # we need to allocate a reduced size one.
-            if batch_tensor is None or len(batch_slice) != batch_size:
-                batch_size = len(batch_slice)
-                batch_tensor = torch.empty([len(batch_slice)] +
-                                           list(batch_slice[0].shape))
-                if use_gpu:
-                    # When using the GPU, attempt to use page-locked memory.
-                    # https://devblogs.nvidia.com/how-optimize-data-transfers-cuda-cc/
-                    batch_tensor.pin_memory()
-
-            # Fill in tensor with batch image matrices
-            for i in range(batch_size):
-                batch_tensor[i, :] = batch_slice[i]
+        for batch_tensor in self._iter_batch_tensors(tfed_mat_iter):
             process_tensor = batch_tensor
             if use_gpu:
                 # Copy input data tensor in batch to GPU.
                 # - Need to use the same CUDA device that model is loaded on.
-                process_tensor = batch_tensor.cuda(cuda_device)
-
-            feats = self._forward(model, process_tensor)
+                # - The copy from page-locked memory may run asynchronously
+                #   as it is ordered before the forward pass on the stream.
+                process_tensor = batch_tensor.cuda(cuda_device,
+                                                   non_blocking=True)
 
-            for f in feats:
+            for f in forward(process_tensor):
                 yield f
-            #: :type: list[torch.Tensor]
-            batch_slice = list(itertools.islice(tfed_mat_iter, batch_size))
+
+    def _iter_batch_tensors(
+        self,
+        tfed_mat_iter: Iterable["torch.Tensor"]
+    ) -> Iterator["torch.Tensor"]:
+        """
+        Stack transformed image tensors into batch tensors.
+
+        Batches are stacked into a single preallocated buffer, so no tensor
+        is allocated per batch and each batch is filled with a single copy.
+        The buffer is page-locked when using the GPU. Partial batches are
+        views of the first rows of the buffer. Reusing one buffer is safe as
+        the next batch is only stacked once the results of the current one
+        have been copied back from the device.
+
+        A yielded batch tensor is only valid until the next batch is
+        requested.
+
+        :param tfed_mat_iter: Iterable of transformed image tensors of the
+            same shape.
+
+        :return: Iterator of batch tensors.
+        """
+        buffer: Optional["torch.Tensor"] = None
+        for batch_slice in iter_batches(tfed_mat_iter, self.batch_size,
+                                        self.batch_max_wait):
+            item = batch_slice[0]
+            # We don't know the shape of input data until the first batch.
+            if buffer is None or buffer.shape[1:] != item.shape or \
+                    buffer.dtype != item.dtype:
+                buffer = torch.empty([self.batch_size] + list(item.shape),
+                                     dtype=item.dtype)
+                if self.use_gpu:
+                    # When using the GPU, use page-locked memory.
+                    # https://devblogs.nvidia.com/how-optimize-data-transfers-cuda-cc/
+                    buffer = buffer.pin_memory()
+            batch_tensor = buffer[:len(batch_slice)]
+            torch.stack(batch_slice, out=batch_tensor)
+            yield batch_tensor
 
     def _forward(self, model: "torch.nn.Module", model_input: "torch.Tensor") -> np.ndarray:
         """
@@ -393,15 +1108,108 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
 
         :return: Tensor output of module() call
         """
-        with torch.no_grad():
-            feats = model(model_input)
+        feats = self._output_features(self._run_module(model, model_input))
+        return self._features_to_descriptors(feats)
+
+    def _output_features(self, output: Any) -> "torch.Tensor":
+        """
+        Template method reducing the output of a module call to a batch
+        feature tensor, in torch operations so that it may also be exported
+        with the module.
+
+        :param output: Output of the module call.
 
+        :return: Batch feature tensor.
+        """
         # Apply global average pool
-        if self.global_average_pool and len(feats.size()) > 2:
-            feats = F.avg_pool2d(feats, feats.size()[2:])
-            feats = feats.view(feats.size(0), -1)
+        if self.global_average_pool and len(output.size()) > 2:
+            output = F.avg_pool2d(output, output.size()[2:])
+            output = output.view(output.size(0), -1)
+        return output
 
-        feats_np = np.squeeze(feats.cpu().numpy().astype(np.float32))
+    def export_onnx(
+        self,
+        filepath: str,
+        input_size: Tuple[int, int] = (224, 224),
+        opset_version: int = 13
+    ) -> None:
+        """
+        Export the network of this generator, including the feature
+        reduction of ``_output_features``, to an ONNX model file usable by
+        ``OnnxDescriptorGenerator``. The model has a single ``"input"`` of
+        shape ``batch x 3 x height x width`` and a single ``"output"`` of
+        batch feature vectors, with a dynamic batch size. Descriptor
+        normalization is not included.
+
+        :param filepath: Path of the ONNX model file to write.
+        :param input_size: Height and width of the network input images, as
+            produced by ``_make_transform``.
+        :param opset_version: ONNX operator set version to export with.
+        """
+        module = _ExportModule(self, self._ensure_module())
+        device = torch.device("cuda", self.cuda_device) if self.use_gpu \
+            else torch.device("cpu")
+        dummy_input = torch.zeros(1, 3, *input_size, device=device)
+        with torch.no_grad():
+            torch.onnx.export(
+                module, dummy_input, filepath,
+                input_names=["input"], output_names=["output"],
+                dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
+                opset_version=opset_version
+            )
+        LOG.info("Exported ONNX model to {}".format(filepath))
+
+    def _use_cpu_autocast(self) -> bool:
+        """
+        :return: If the network should be run under bfloat16 CPU autocast.
+        """
+        if not self.cpu_autocast or self.use_gpu or self.quantize is not None:
+            return False
+        if self._cpu_autocast_supported is None:
+            self._cpu_autocast_supported = _cpu_bf16_supported()
+            if not self._cpu_autocast_supported:
+                LOG.warning("bfloat16 CPU autocast is not supported on this "
+                            "host, computing in float32.")
+        return self._cpu_autocast_supported
+
+    def _run_module(
+        self,
+        model: "torch.nn.Module",
+        model_input: "torch.Tensor"
+    ) -> Any:
+        """
+        Call the module on the input without gradient tracking, under
+        bfloat16 CPU autocast if enabled and supported.
+
+        :param model: Network module to call.
+        :param model_input: Batch input tensor on the target device.
+
+        :return: Output of the module call.
+        """
+        with torch.no_grad():
+            if self._use_cpu_autocast():
+                try:
+                    with torch.autocast("cpu", dtype=torch.bfloat16):
+                        return model(model_input)
+                except RuntimeError as ex:
+                    LOG.warning("bfloat16 CPU autocast forward pass failed, "
+                                "computing in float32 from now on: {}"
+                                .format(ex))
+                    self._cpu_autocast_supported = False
+            return model(model_input)
+
+    def _features_to_descriptors(self, feats: "torch.Tensor") -> np.ndarray:
+        """
+        Convert a batch of network output features into normalized descriptor
+        vectors of the configured ``descriptor_dtype``.
+
+        :param feats: Batch feature tensor, of any floating point type.
+
+        :return: Matrix of descriptor vectors, one row per batch item.
+        """
+        # Reduced precision outputs (e.g. of autocast) are brought to single
+        # precision, which numpy also requires for bfloat16.
+        feats_np = np.squeeze(feats.float().cpu().numpy())
         if len(feats_np.shape) < 2:
             # Add a dim if the batch size was only one (first dim squeezed
             # down).
@@ -410,7 +1218,7 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
         # Normalizing *after* squeezing for axis sanity.
         feats_np = normalize_vectors(feats_np, self.normalize)
 
-        return feats_np
+        return feats_np.astype(self.descriptor_dtype, copy=False)
 
     def get_config(self) -> Dict[str, Any]:
         return {
@@ -423,7 +1231,17 @@ class TorchModuleDescriptorGenerator (DescriptorGenerator):
             "cuda_device": self.cuda_device,
             "normalize": self.normalize,
             "iter_runtime": self.iter_runtime,
-            "global_average_pool": self.global_average_pool
+            "global_average_pool": self.global_average_pool,
+            "persistent_workers": self.persistent_workers,
+            "batch_max_wait": self.batch_max_wait,
+            "image_tform_processes": self.image_tform_processes,
+            "streaming_dataloader": self.streaming_dataloader,
+            "fused_load_transform": self.fused_load_transform,
+            "compile_mode": self.compile_mode,
+            "compile_cache_dir": self.compile_cache_dir,
+            "quantize": self.quantize,
+            "cpu_autocast": self.cpu_autocast,
+            "descriptor_dtype": self.descriptor_dtype,
         }
 
 
@@ -493,27 +1311,13 @@ class AlignedReIDResNet50TorchDescriptorGenerator (TorchModuleDescriptorGenerato
             *tuple(m.children())[:-2]
         )
 
-    def _forward(self, model: "torch.nn.Module", model_input: "torch.Tensor") -> np.ndarray:
-        with torch.no_grad():
-            feats = model(model_input)
-
+    def _output_features(self, output: Any) -> "torch.Tensor":
         # Use only global features from return of (global_feats, local_feats)
-        if isinstance(feats, tuple):
-            feats = feats[0]
-
-        feats = F.avg_pool2d(feats, feats.size()[2:])
-        feats = feats.view(feats.size(0), -1)
-
-        feats_np = np.squeeze(feats.cpu().numpy().astype(np.float32))
-        if len(feats_np.shape) < 2:
-            # Add a dim if the batch size was only one (first dim squeezed
-            # down).
-            feats_np = np.expand_dims(feats_np, 0)
-
-        # Normalizing *after* squeezing for axis sanity.
-        feats_np = normalize_vectors(feats_np, self.normalize)
+        if isinstance(output, tuple):
+            output = output[0]
 
-        return feats_np
+        output = F.avg_pool2d(output, output.size()[2:])
+        return output.view(output.size(0), -1)
 
     def _make_transform(self) -> Callable[[Iterable[np.ndarray]], "torch.Tensor"]:
         # Transform based on: https://pytorch.org/hub/pytorch_vision_resnet/
@@ -1,11 +1,14 @@
 import logging
+import os
+import os.path as osp
 import pickle
-from typing import Any, Dict, Hashable, Iterable, Iterator, Optional, Tuple, Type, TypeVar
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
 
 from smqtk_core.configuration import from_config_dict, make_default_config, to_config_dict
 from smqtk_core.dict import merge_dict
 from smqtk_dataprovider import DataElement
 from smqtk_dataprovider.utils import SimpleTimer
+from smqtk_dataprovider.utils.file import safe_create_dir
 from smqtk_descriptors import DescriptorElement, DescriptorSet
 
 
@@ -24,6 +27,15 @@ class MemoryDescriptorSet (DescriptorSet):
     If the path to a file cache is provided, it is loaded at construction if it
     exists. When elements are added to the index, the in-memory table is dumped
     to the cache.
+
+    Optionally, a journal file path may be provided in addition to the cache
+    element. In this mode, each add/remove/clear operation is appended to the
+    journal file instead of re-writing the whole table to the cache element.
+    The journal is compacted into the cache element snapshot (and truncated)
+    once it accumulates ``journal_compact_threshold`` records. When loading,
+    the snapshot is loaded from the cache element and then the journal is
+    replayed on top of it. Only one instance should write to a given journal
+    at a time.
     """
 
     @classmethod
@@ -96,7 +108,9 @@ class MemoryDescriptorSet (DescriptorSet):
     def __init__(
         self,
         cache_element: Optional[DataElement] = None,
-        pickle_protocol: int = -1
+        pickle_protocol: int = -1,
+        journal_filepath: Optional[str] = None,
+        journal_compact_threshold: int = 10000
     ):
         """
         Initialize a new in-memory descriptor index, or reload one from a
@@ -110,14 +124,38 @@ class MemoryDescriptorSet (DescriptorSet):
             table to the optionally provided, writable cache element. We will
             use -1 by default (latest version, probably a binary form).
 
+        :param journal_filepath: Optional path to an append-only journal file
+            of index modifications. When provided, modifications are appended
+            to this file instead of re-writing the full table to the
+            ``cache_element``, which then only receives periodic snapshots.
+            This requires that a ``cache_element`` is also provided.
+
+        :param journal_compact_threshold: Number of journal records after which
+            the journal is compacted into a new ``cache_element`` snapshot.
+            Only used when ``journal_filepath`` is provided.
+
+        :raises ValueError: A journal file path was provided without a cache
+            element, or the compaction threshold was not positive.
+
         """
         super(MemoryDescriptorSet, self).__init__()
 
+        if journal_filepath and cache_element is None:
+            raise ValueError("A cache element is required for snapshots when "
+                             "using a journal file.")
+        if journal_compact_threshold < 1:
+            raise ValueError("Journal compaction threshold must be positive "
+                             "(given {}).".format(journal_compact_threshold))
+
         # Mapping of descriptor UUID to the DescriptorElement instance.
         self._table: Dict[Hashable, DescriptorElement] = {}
         # Record of optional file cache we're using
         self.cache_element = cache_element
         self.pickle_protocol = pickle_protocol
+        self.journal_filepath = journal_filepath
+        self.journal_compact_threshold = journal_compact_threshold
+        # Number of records currently in the journal file.
+        self._journal_records = 0
 
         if cache_element and not cache_element.is_empty():
             LOG.debug(f"Loading cached descriptor index table from "
@@ -125,9 +163,14 @@ class MemoryDescriptorSet (DescriptorSet):
             self._table = pickle.loads(cache_element.get_bytes())
             assert isinstance(self._table, dict), "Loaded cache structure was not a dictionary type!"
 
+        if journal_filepath and osp.isfile(journal_filepath):
+            self._replay_journal()
+
     def get_config(self) -> Dict[str, Any]:
         c = merge_dict(self.get_default_config(), {
             "pickle_protocol": self.pickle_protocol,
+            "journal_filepath": self.journal_filepath,
+            "journal_compact_threshold": self.journal_compact_threshold,
         })
         if self.cache_element:
             merge_dict(c['cache_element'],
@@ -135,10 +178,76 @@ class MemoryDescriptorSet (DescriptorSet):
         return c
 
     def cache_table(self) -> None:
+        """
+        Dump the full in-memory table to the cache element, if it is writable.
+
+        When a journal is in use, this also truncates the journal as its
+        records are now reflected in the snapshot.
+        """
         if self.cache_element and self.cache_element.writable():
             with SimpleTimer("Caching descriptor table", LOG.debug):
                 self.cache_element.set_bytes(pickle.dumps(self._table,
                                                           self.pickle_protocol))
+            if self.journal_filepath and self._journal_records:
+                LOG.debug("Truncating compacted journal ({} records)"
+                          .format(self._journal_records))
+                open(self.journal_filepath, 'wb').close()
+                self._journal_records = 0
+
+    def _replay_journal(self) -> None:
+        """
+        Apply records from the journal file on top of the current table.
+
+        A trailing partial record, e.g. from an interrupted write, is
+        discarded and truncated from the journal file.
+        """
+        assert self.journal_filepath is not None
+        table = self._table
+        n = 0
+        with SimpleTimer("Replaying descriptor table journal", LOG.debug):
+            with open(self.journal_filepath, 'r+b') as f:
+                good_pos = 0
+                while True:
+                    try:
+                        op, payload = pickle.load(f)
+                    except EOFError:
+                        break
+                    except (pickle.UnpicklingError, ValueError, TypeError) as ex:
+                        LOG.warning("Discarding corrupt trailing journal "
+                                    "record at byte {}: {}".format(good_pos, ex))
+                        break
+                    if op == 'add':
+                        for d in payload:
+                            table[d.uuid()] = d
+                    elif op == 'remove':
+                        for uid in payload:
+                            table.pop(uid, None)
+                    elif op == 'clear':
+                        table.clear()
+                    good_pos = f.tell()
+                    n += 1
+                f.truncate(good_pos)
+        self._journal_records = n
+
+    def _commit(self, op: str, payload: List) -> None:
+        """
+        Persist a table modification, either by appending a record to the
+        journal or by dumping the whole table to the cache element.
+
+        :param op: Operation label, one of "add", "remove" or "clear".
+        :param payload: Descriptor elements added, or UUIDs removed.
+        """
+        if not self.journal_filepath:
+            self.cache_table()
+            return
+        safe_create_dir(osp.dirname(osp.abspath(self.journal_filepath)))
+        with open(self.journal_filepath, 'ab') as f:
+            pickle.dump((op, payload), f, self.pickle_protocol)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_records += 1
+        if self._journal_records >= self.journal_compact_threshold:
+            self.cache_table()
 
     def count(self) -> int:
         return len(self._table)
@@ -148,7 +257,7 @@ class MemoryDescriptorSet (DescriptorSet):
         Clear this descriptor index's entries.
         """
         self._table = {}
-        self.cache_table()
+        self._commit('clear', [])
 
     def has_descriptor(self, uuid: Hashable) -> bool:
         """
@@ -188,7 +297,7 @@ class MemoryDescriptorSet (DescriptorSet):
         """
         self._table[descriptor.uuid()] = descriptor
         if not no_cache:
-            self.cache_table()
+            self._commit('add', [descriptor])
 
     def add_many_descriptors(self, descriptors: Iterable[DescriptorElement]) -> None:
         """
@@ -198,13 +307,13 @@ class MemoryDescriptorSet (DescriptorSet):
             index.
 
         """
-        added_something = False
+        added = []
         for d in descriptors:
             # using no-cache so we don't trigger multiple file writes
             self._inner_add_descriptor(d, no_cache=True)
-            added_something = True
-        if added_something:
-            self.cache_table()
+            added.append(d)
+        if added:
+            self._commit('add', added)
 
     def get_descriptor(self, uuid: Hashable) -> DescriptorElement:
         """
@@ -262,7 +371,7 @@ class MemoryDescriptorSet (DescriptorSet):
         """
         del self._table[uuid]
         if not no_cache:
-            self.cache_table()
+            self._commit('remove', [uuid])
 
     def remove_many_descriptors(self, uuids: Iterable[Hashable]) -> None:
         """
@@ -275,10 +384,19 @@ class MemoryDescriptorSet (DescriptorSet):
             DescriptorElement in this index.
 
         """
-        for uid in uuids:
-            # using no-cache so we don't trigger multiple file writes
-            self._inner_remove_descriptor(uid, no_cache=True)
-        self.cache_table()
+        removed = []
+        try:
+            for uid in uuids:
+                # using no-cache so we don't trigger multiple file writes
+                self._inner_remove_descriptor(uid, no_cache=True)
+                removed.append(uid)
+        finally:
+            # Record what was actually removed, even if a KeyError cut
+            # iteration short, so the journal reflects the in-memory table.
+            if removed and self.journal_filepath:
+                self._commit('remove', removed)
+        if not self.journal_filepath:
+            self.cache_table()
 
     def keys(self) -> Iterator[Hashable]:
         return iter(self._table.keys())
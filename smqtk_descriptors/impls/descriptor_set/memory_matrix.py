@@ -0,0 +1,423 @@
+import logging
+import pickle
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+import numpy
+
+from smqtk_core.configuration import from_config_dict, make_default_config, to_config_dict
+from smqtk_core.dict import merge_dict
+from smqtk_dataprovider import DataElement
+from smqtk_dataprovider.utils import SimpleTimer
+from smqtk_descriptors import DescriptorElement, DescriptorSet
+from smqtk_descriptors.impls.descriptor_element.memory import DescriptorMemoryElement
+
+
+LOG = logging.getLogger(__name__)
+# Type variable for Configurable-inheriting types.
+MMDS = TypeVar("MMDS", bound="MatrixMemoryDescriptorSet")
+
+
+class MatrixMemoryDescriptorSet (DescriptorSet):
+    """
+    In-memory descriptor set storing all vectors in a single contiguous 2D
+    matrix, with optional file caching.
+
+    Unlike the :class:`.MemoryDescriptorSet`, this implementation does not
+    retain the descriptor element instances added to it. Vectors are copied
+    into rows of a growable ``numpy.ndarray`` and a uuid-to-row index is
+    maintained. Bulk vector retrieval (e.g. ``get_many_vectors``) is then a
+    single fancy-indexing gather instead of a per-element ``vector()`` call.
+
+    Descriptor elements returned from this set are new
+    :class:`.DescriptorMemoryElement` instances containing a copy of the
+    stored row.
+
+    All vectors stored must be of the same dimensionality. The first vector
+    added determines the dimensionality of the set until it is cleared.
+
+    If the path to a file cache is provided, it is loaded at construction if it
+    exists. When elements are added to the set, the used portion of the matrix
+    and the parallel UUID list are dumped to the cache.
+    """
+
+    @classmethod
+    def is_usable(cls) -> bool:
+        """
+        Check whether this class is available for use.
+
+        :return: Boolean determination of whether this implementation is usable.
+
+        """
+        # no dependencies
+        return True
+
+    @classmethod
+    def get_default_config(cls) -> Dict[str, Any]:
+        """
+        Generate and return a default configuration dictionary for this class.
+        This will be primarily used for generating what the configuration
+        dictionary would look like for this class without instantiating it.
+
+        It is not be guaranteed that the configuration dictionary returned
+        from this method is valid for construction of an instance of this class.
+
+        :return: Default configuration dictionary for the class.
+
+        """
+        c = super(MatrixMemoryDescriptorSet, cls).get_default_config()
+        c['cache_element'] = make_default_config(DataElement.get_impls())
+        return c
+
+    @classmethod
+    def from_config(
+        cls: Type[MMDS],
+        config_dict: Dict,
+        merge_default: bool = True
+    ) -> MMDS:
+        """
+        Instantiate a new instance of this class given the configuration
+        JSON-compliant dictionary encapsulating initialization arguments.
+
+        :param config_dict: JSON compliant dictionary encapsulating
+            a configuration.
+
+        :param merge_default: Merge the given configuration on top of the
+            default provided by ``get_default_config``.
+
+        :return: Constructed instance from the provided config.
+
+        """
+        if merge_default:
+            config_dict = merge_dict(cls.get_default_config(), config_dict)
+
+        # Optionally construct cache element from sub-config.
+        if config_dict['cache_element'] \
+                and config_dict['cache_element']['type']:
+            e = from_config_dict(config_dict['cache_element'],
+                                 DataElement.get_impls())
+            config_dict['cache_element'] = e
+        else:
+            config_dict['cache_element'] = None
+
+        return super(MatrixMemoryDescriptorSet, cls).from_config(config_dict, False)
+
+    def __init__(
+        self,
+        cache_element: Optional[DataElement] = None,
+        pickle_protocol: int = -1,
+        dtype: str = "float64",
+        initial_capacity: int = 1024
+    ):
+        """
+        Initialize a new matrix-backed in-memory descriptor set, or reload one
+        from a cache.
+
+        :param cache_element: Optional data element cache, loading an existing
+            set if the element has bytes. If the given element is writable,
+            new descriptors added to this set are cached to the element.
+        :param pickle_protocol: Pickling protocol to use when serializing the
+            set's content to the optionally provided, writable cache element.
+            We will use -1 by default (latest version, probably a binary form).
+        :param dtype: String name of the ``numpy`` data type vectors are
+            stored as. Input vectors are cast to this type when added.
+        :param initial_capacity: Number of rows to allocate when the first
+            vector is added. Capacity is doubled whenever it is exceeded.
+
+        :raises ValueError: ``initial_capacity`` was not a positive integer.
+
+        """
+        super(MatrixMemoryDescriptorSet, self).__init__()
+
+        if int(initial_capacity) < 1:
+            raise ValueError("Initial capacity must be a positive integer "
+                             "(given {}).".format(initial_capacity))
+
+        self.cache_element = cache_element
+        self.pickle_protocol = pickle_protocol
+        self.dtype = numpy.dtype(dtype).name
+        self.initial_capacity = int(initial_capacity)
+
+        # Row-major storage matrix. Only the first ``len(self._row_uuids)`` rows
+        # are valid. This is None until the first vector is added.
+        self._matrix: Optional[numpy.ndarray] = None
+        # Parallel list of the UUID stored in each valid matrix row.
+        self._row_uuids: List[Hashable] = []
+        # Mapping of descriptor UUID to the matrix row index.
+        self._uuid_to_row: Dict[Hashable, int] = {}
+
+        if cache_element and not cache_element.is_empty():
+            LOG.debug(f"Loading cached descriptor matrix from "
+                      f"{cache_element.__class__.__name__} element.")
+            cache = pickle.loads(cache_element.get_bytes())
+            assert isinstance(cache, dict), "Loaded cache structure was not a dictionary type!"
+            self._row_uuids = list(cache['uuids'])
+            self._uuid_to_row = {uid: r for r, uid in enumerate(self._row_uuids)}
+            m = cache['matrix']
+            if m is not None:
+                self._matrix = numpy.array(m, dtype=self.dtype, copy=True)
+
+    def get_config(self) -> Dict[str, Any]:
+        c = merge_dict(self.get_default_config(), {
+            "pickle_protocol": self.pickle_protocol,
+            "dtype": self.dtype,
+            "initial_capacity": self.initial_capacity,
+        })
+        if self.cache_element:
+            merge_dict(c['cache_element'],
+                       to_config_dict(self.cache_element))
+        return c
+
+    def cache_table(self) -> None:
+        if self.cache_element and self.cache_element.writable():
+            with SimpleTimer("Caching descriptor matrix", LOG.debug):
+                m = None
+                if self._matrix is not None:
+                    m = self._matrix[:len(self._row_uuids)]
+                self.cache_element.set_bytes(pickle.dumps(
+                    {'uuids': self._row_uuids, 'matrix': m},
+                    self.pickle_protocol
+                ))
+
+    def _ensure_capacity(self, n_rows: int, dim: int) -> numpy.ndarray:
+        """
+        Make sure the storage matrix can hold at least ``n_rows`` rows of
+        ``dim`` dimensional vectors, allocating or growing as needed.
+
+        :param n_rows: Total number of rows required.
+        :param dim: Dimensionality of vectors being stored.
+
+        :raises ValueError: ``dim`` does not match the dimensionality of
+            vectors already stored.
+
+        :return: The storage matrix.
+        """
+        m = self._matrix
+        if m is None:
+            m = numpy.empty((max(self.initial_capacity, n_rows), dim),
+                            dtype=self.dtype)
+        elif m.shape[1] != dim:
+            raise ValueError("Descriptor vector dimensionality ({}) does not "
+                             "match that of this set ({})."
+                             .format(dim, m.shape[1]))
+        elif m.shape[0] < n_rows:
+            new_m = numpy.empty((max(m.shape[0] * 2, n_rows), dim),
+                                dtype=self.dtype)
+            n_valid = len(self._row_uuids)
+            new_m[:n_valid] = m[:n_valid]
+            m = new_m
+        self._matrix = m
+        return m
+
+    def _rows_for(self, uuids: Iterable[Hashable]) -> numpy.ndarray:
+        """
+        :param uuids: Iterable of descriptor UUIDs.
+
+        :raises KeyError: A given UUID is not contained in this set.
+
+        :return: Integer array of matrix row indices for the given UUIDs.
+        """
+        u2r = self._uuid_to_row
+        return numpy.fromiter((u2r[uid] for uid in uuids), dtype=numpy.intp)
+
+    def _make_element(self, uuid: Hashable, row: numpy.ndarray) -> DescriptorElement:
+        return DescriptorMemoryElement(uuid).set_vector(row)
+
+    def count(self) -> int:
+        return len(self._row_uuids)
+
+    def clear(self) -> None:
+        """
+        Clear this descriptor set's entries.
+        """
+        self._matrix = None
+        self._row_uuids = []
+        self._uuid_to_row = {}
+        self.cache_table()
+
+    def has_descriptor(self, uuid: Hashable) -> bool:
+        return uuid in self._uuid_to_row
+
+    def add_descriptor(self, descriptor: DescriptorElement) -> None:
+        """
+        Add a descriptor to this set.
+
+        Adding the same descriptor multiple times should not add multiple
+        copies of the descriptor in the set.
+
+        :param descriptor: Descriptor to add.
+
+        :raises ValueError: The descriptor has no vector or its vector's
+            dimensionality does not match this set.
+        """
+        self.add_many_descriptors([descriptor])
+
+    def add_many_descriptors(self, descriptors: Iterable[DescriptorElement]) -> None:
+        """
+        Add multiple descriptors at one time.
+
+        Vectors are retrieved via a single
+        :meth:`.DescriptorElement.get_many_vectors` call and copied into the
+        storage matrix.
+
+        :param descriptors: Iterable of descriptor instances to add to this
+            set.
+
+        :raises ValueError: A descriptor has no vector or its vector's
+            dimensionality does not match this set.
+        """
+        descriptors = list(descriptors)
+        if not descriptors:
+            return
+        uuids = [d.uuid() for d in descriptors]
+        vectors = DescriptorElement.get_many_vectors(descriptors)
+        for uid, v in zip(uuids, vectors):
+            if v is None:
+                raise ValueError("Descriptor with UUID {} has no vector to "
+                                 "add.".format(uid))
+        vec_mat = numpy.vstack(vectors)
+
+        # Determine destination rows, appending rows for new UUIDs. The last
+        # vector given for a duplicated UUID wins.
+        u2r = self._uuid_to_row
+        row_uuids = self._row_uuids
+        n_new = len(set(uuids).difference(u2r))
+        m = self._ensure_capacity(len(row_uuids) + n_new, vec_mat.shape[1])
+        dst_rows = numpy.empty(len(uuids), dtype=numpy.intp)
+        for i, uid in enumerate(uuids):
+            r = u2r.get(uid)
+            if r is None:
+                r = u2r[uid] = len(row_uuids)
+                row_uuids.append(uid)
+            dst_rows[i] = r
+        m[dst_rows] = vec_mat
+        self.cache_table()
+
+    def get_descriptor(self, uuid: Hashable) -> DescriptorElement:
+        """
+        Get the descriptor in this set that is associated with the given UUID.
+
+        :param uuid: UUID of the DescriptorElement to get.
+
+        :raises KeyError: The given UUID doesn't associate to a
+            DescriptorElement in this set.
+
+        :return: DescriptorElement associated with the queried UUID.
+
+        """
+        r = self._uuid_to_row[uuid]
+        assert self._matrix is not None
+        return self._make_element(uuid, self._matrix[r])
+
+    def get_many_descriptors(self, uuids: Iterable[Hashable]) -> Iterator[DescriptorElement]:
+        """
+        Get an iterator over descriptors associated to given descriptor UUIDs.
+
+        :param uuids: Iterable of descriptor UUIDs to query for.
+
+        :raises KeyError: A given UUID doesn't associate with a
+            DescriptorElement in this set.
+
+        :return: Iterator of descriptors associated to given uuid values.
+
+        """
+        for uid in uuids:
+            yield self.get_descriptor(uid)
+
+    def get_many_vectors(self, uuids: Iterable[Hashable]) -> List[Optional[numpy.ndarray]]:
+        """
+        Get underlying vectors of descriptors associated with given uuids.
+
+        This is a single gather from the storage matrix.
+
+        :param uuids: Iterable of descriptor UUIDs to query for.
+
+        :raises: KeyError: When there is not a descriptor in this set for one
+            or more input UIDs.
+
+        :return: List of vectors for descriptors associated with given uuid
+            values.
+
+        """
+        return list(self.get_vector_matrix(uuids))
+
+    def get_vector_matrix(self, uuids: Optional[Iterable[Hashable]] = None) -> numpy.ndarray:
+        """
+        Get a 2D matrix of vectors for the given UUIDs, or for all descriptors
+        in this set if no UUIDs are given.
+
+        When all descriptors are requested, rows are in the same order as
+        UUIDs are yielded by ``keys()``.
+
+        :param uuids: Optional iterable of descriptor UUIDs to query for.
+
+        :raises: KeyError: When there is not a descriptor in this set for one
+            or more input UIDs.
+
+        :return: New ``N x D`` matrix of vectors. This is a copy and may be
+            modified freely.
+
+        """
+        m = self._matrix
+        if uuids is None:
+            if m is None:
+                return numpy.empty((0, 0), dtype=self.dtype)
+            return m[:len(self._row_uuids)].copy()
+        rows = self._rows_for(uuids)
+        if m is None:
+            # Implies that ``rows`` is empty, otherwise a KeyError would have
+            # been raised.
+            return numpy.empty((0, 0), dtype=self.dtype)
+        return m[rows]
+
+    def remove_descriptor(self, uuid: Hashable) -> None:
+        """
+        Remove a descriptor from this set by the given UUID.
+
+        :param uuid: UUID of the DescriptorElement to remove.
+
+        :raises KeyError: The given UUID doesn't associate to a
+            DescriptorElement in this set.
+
+        """
+        self.remove_many_descriptors([uuid])
+
+    def remove_many_descriptors(self, uuids: Iterable[Hashable]) -> None:
+        """
+        Remove descriptors associated to given descriptor UUIDs from this
+        set.
+
+        Removed rows are filled by moving the current last row into them,
+        keeping the valid portion of the storage matrix contiguous.
+
+        :param uuids: Iterable of descriptor UUIDs to remove.
+
+        :raises KeyError: A given UUID doesn't associate with a
+            DescriptorElement in this set.
+
+        """
+        u2r = self._uuid_to_row
+        row_uuids = self._row_uuids
+        m = self._matrix
+        for uid in uuids:
+            r = u2r.pop(uid)
+            last_r = len(row_uuids) - 1
+            last_uid = row_uuids.pop()
+            if r != last_r:
+                assert m is not None
+                m[r] = m[last_r]
+                row_uuids[r] = last_uid
+                u2r[last_uid] = r
+        self.cache_table()
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(list(self._row_uuids))
+
+    def descriptors(self) -> Iterator[DescriptorElement]:
+        for _, d in self.items():
+            yield d
+
+    def items(self) -> Iterator[Tuple[Hashable, DescriptorElement]]:
+        m = self._matrix
+        for r, uid in enumerate(list(self._row_uuids)):
+            assert m is not None
+            yield uid, self._make_element(uid, m[r])
@@ -5,7 +5,7 @@ References:
 import logging
 import multiprocessing
 import pickle
-from typing import Any, Dict, Generator, Hashable, Iterable, Optional, Sequence, Tuple
+from typing import Any, Dict, Generator, Hashable, Iterable, List, Optional, Sequence, Tuple
 
 from smqtk_dataprovider.exceptions import ReadOnlyError
 from smqtk_dataprovider.utils.postgres import norm_psql_cmd_string, PsqlConnectionHelper
@@ -88,6 +88,12 @@ class PostgresDescriptorSet (DescriptorSet):
           ORDER BY __ordering__.{uuid_col:s}_order
     """)
 
+    SELECT_MANY_EXISTING_TMPL = norm_psql_cmd_string("""
+        SELECT {uuid_col:s}
+          FROM {table_name:s}
+         WHERE {uuid_col:s} = ANY(%(uuid_list)s)
+    """)
+
     UPSERT_TMPL = norm_psql_cmd_string("""
         WITH upsert AS (
           UPDATE {table_name:s}
@@ -268,6 +274,31 @@ class PostgresDescriptorSet (DescriptorSet):
             exec_hook, yield_result_rows=True
         )))
 
+    def has_many_descriptors(self, uuids: Iterable[Hashable]) -> List[bool]:
+        """
+        Check which of the given UUIDs have a descriptor in this set, with
+        one query per ``multiquery_batch_size`` UUIDs.
+
+        :param uuids: Iterable of UUIDs to query for.
+
+        :return: List of booleans of whether a descriptor with each given
+            UUID exists in this set, in the order that UUIDs were given.
+        """
+        uuid_strs = [str(uid) for uid in uuids]
+        q = self.SELECT_MANY_EXISTING_TMPL.format(
+            table_name=self.table_name,
+            uuid_col=self.uuid_col,
+        )
+
+        def exec_hook(cur: psycopg2.extensions.cursor, batch: Sequence[str]) -> None:
+            cur.execute(q, {'uuid_list': list(batch)})
+
+        existing = {r[0] for r in self.psql_helper.batch_execute(
+            iter(uuid_strs), exec_hook, self.multiquery_batch_size,
+            yield_result_rows=True
+        )}
+        return [uid in existing for uid in uuid_strs]
+
     def add_descriptor(self, descriptor: DescriptorElement) -> None:
         """
         Add a descriptor to this set.
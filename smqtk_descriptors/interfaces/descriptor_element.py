@@ -1,5 +1,6 @@
 import abc
 from collections import defaultdict
+from itertools import zip_longest
 from typing import Any, Dict, Generator, Hashable, Iterable, List, Mapping, Optional, Tuple, Type, TypeVar
 
 import numpy
@@ -26,6 +27,20 @@ def _uuid_and_vector_from_descriptor(
     return descriptor.uuid(), descriptor.vector()
 
 
+def _uuid_and_has_vector_from_descriptor(
+    descriptor: "DescriptorElement"
+) -> Tuple[Hashable, bool]:
+    """
+    Given a descriptor, return a tuple containing the UUID and whether that
+    descriptor has a vector.
+
+    :param descriptor: The descriptor to process.
+    :return: Tuple containing the UUID and whether the given descriptor has an
+        associated vector.
+    """
+    return descriptor.uuid(), descriptor.has_vector()
+
+
 class DescriptorElement (Configurable, Pluggable):
     """
     Abstract descriptor vector container.
@@ -199,6 +214,129 @@ class DescriptorElement (Configurable, Pluggable):
 
         return ordered_vectors
 
+    @classmethod
+    def _has_many_vectors(
+        cls,
+        descriptors: Iterable["DescriptorElement"]
+    ) -> Generator[Tuple[Hashable, bool], None, None]:
+        """
+        Internal method to be overridden by subclasses to check whether many
+        given descriptors have an associated vector.
+
+        By default, this calls ``has_vector`` on each descriptor in turn.
+
+        :note: Results are *not* guaranteed to be returned in the order they
+            are requested. Descriptors may be omitted from results, in which
+            case they are considered to not have a vector. The wrapper
+            function `has_many_vectors` handles re-ordering as necessary.
+
+        :param descriptors: Iterable of descriptors to query for.
+
+        :return: Iterator of tuples containing the descriptor uuid and whether
+            that descriptor has an associated vector.
+        """
+        for d in descriptors:
+            yield _uuid_and_has_vector_from_descriptor(d)
+
+    @classmethod
+    def has_many_vectors(cls, descriptors: Iterable["DescriptorElement"]) -> List[bool]:
+        """
+        Check whether each of the given descriptors has an associated vector.
+
+        :note: Most subclasses should override internal method
+            `_has_many_vectors` rather than this external wrapper function. If
+            a subclass does override this classmethod, it is responsible for
+            appropriately handling any valid DescriptorElement, regardless of
+            subclass.
+
+        :param descriptors: Iterable of descriptors to query for.
+
+        :return: List of booleans of whether each given descriptor has an
+            associated vector. Results are returned in the order that
+            descriptors were given.
+        """
+        batch_dictionary = defaultdict(list)
+        uuid_indices: Dict[Hashable, List[int]] = defaultdict(list)
+        index = -1
+        for index, descriptor_ in enumerate(descriptors):
+            # Divide descriptors up into batches based on their type, since
+            # each DescriptorElement subclass knows best how to optimally
+            # check for vectors of its own type.
+            batch_dictionary[type(descriptor_)].append(descriptor_)
+            uuid_indices[descriptor_.uuid()].append(index)
+
+        # Default to False, since _has_many_vectors implementations may omit
+        # descriptors without a vector.
+        ordered_has = [False] * (index + 1)
+
+        for _cls, descriptor_batch in batch_dictionary.items():
+            # Types that are not DescriptorElement subclasses, but quack like
+            # one, are checked one at a time.
+            if not issubclass(_cls, DescriptorElement):
+                _cls = DescriptorElement
+            # noinspection PyProtectedMember
+            for uuid, has_vec in _cls._has_many_vectors(descriptor_batch):
+                for i in uuid_indices[uuid]:
+                    ordered_has[i] = has_vec
+
+        return ordered_has
+
+    @classmethod
+    def _set_many_vectors(
+        cls,
+        descr_vec_pairs: Iterable[Tuple["DescriptorElement", numpy.ndarray]]
+    ) -> None:
+        """
+        Internal method to be overridden by subclasses to store many vectors
+        into their associated descriptors.
+
+        By default, this calls ``set_vector`` on each descriptor in turn.
+
+        :param descr_vec_pairs: Iterable of descriptor and new vector pairs.
+        """
+        for d, v in descr_vec_pairs:
+            d.set_vector(v)
+
+    @classmethod
+    def set_many_vectors(
+        cls,
+        descriptors: Iterable["DescriptorElement"],
+        vectors: Iterable[numpy.ndarray]
+    ) -> None:
+        """
+        Set vectors for many descriptors, in parallel association.
+
+        :note: Most subclasses should override internal method
+            `_set_many_vectors` rather than this external wrapper function. If
+            a subclass does override this classmethod, it is responsible for
+            appropriately handling any valid DescriptorElement, regardless of
+            subclass.
+
+        :param descriptors: Iterable of descriptors to set vectors of.
+        :param vectors: Iterable of new vectors, parallel to ``descriptors``.
+
+        :raises ValueError: The given iterables were not of equal length.
+        """
+        batch_dictionary = defaultdict(list)
+        sentinel = object()
+        for descriptor_, vector in zip_longest(descriptors, vectors,
+                                               fillvalue=sentinel):
+            if descriptor_ is sentinel or vector is sentinel:
+                raise ValueError("Descriptors and vectors given are not of "
+                                 "equal length.")
+            # Divide descriptors up into batches based on their type, since
+            # each DescriptorElement subclass knows best how to optimally
+            # store vectors of its own type.
+            batch_dictionary[type(descriptor_)].append((descriptor_, vector))
+
+        for _cls, pair_batch in batch_dictionary.items():
+            # Types that are not DescriptorElement subclasses, but quack like
+            # one, are set one at a time.
+            if not issubclass(_cls, DescriptorElement):
+                _cls = DescriptorElement
+            # noinspection PyProtectedMember
+            _cls._set_many_vectors(pair_batch)
+
     ###
     # Abstract methods
     #
@@ -1,17 +1,25 @@
 import abc
 from collections import deque
+import itertools
 import logging
-from typing import Deque, Generator, Iterable, List, Optional, Tuple
+from typing import (
+    Callable, Deque, Dict, Generator, Iterable, List, Mapping, Optional,
+    Sequence, Tuple
+)
 import numpy as np
 
 from smqtk_core import Configurable, Pluggable
 from smqtk_dataprovider import ContentTypeValidator, DataElement
 from smqtk_descriptors import DescriptorElement, DescriptorElementFactory
 from smqtk_descriptors.impls.descriptor_element.memory import DescriptorMemoryElement
+from smqtk_descriptors.utils.write_behind import WriteBehindVectorWriter
 
 
 DFLT_DESCRIPTOR_FACTORY = DescriptorElementFactory(DescriptorMemoryElement, {})
 LOG = logging.getLogger(__name__)
+# Layer name of the descriptor elements of ``generate_elements`` when sharing
+# the implementation of ``generate_layer_elements``.
+_SINGLE_LAYER = ""
 
 
 class DescriptorGenerator (Configurable, Pluggable, ContentTypeValidator):
@@ -71,11 +79,83 @@ class DescriptorGenerator (Configurable, Pluggable, ContentTypeValidator):
         validated_data_iter = (self.raise_valid_element(d) for d in data_iter)
         return self._generate_arrays(validated_data_iter)
 
+    def _generate_layer_arrays(
+        self,
+        data_iter: Iterable[DataElement],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, np.ndarray]]:
+        """
+        Inner template method that defines the generation of the descriptor
+        vectors of several named layers, or outputs, of a model for a given
+        iterable of data elements, computing all layers of an input in one
+        pass.
+
+        Implementations supporting multi-layer generation override this
+        method. By default, it is not supported.
+
+        Pre-conditions:
+          - Data elements input to this method have been validated to be of at
+            least one of this class's reported ``valid_content_types``.
+          - ``layers`` is not empty.
+
+        :param data_iter: Iterable of data element instances to be described.
+        :param layers: Names of the layers to generate descriptors from.
+
+        :raises NotImplementedError: This implementation does not support
+            multi-layer generation.
+        :raises RuntimeError: Descriptor extraction failure of some kind.
+
+        :return: Iterable of dictionaries of numpy arrays by layer name, in
+            parallel association with the input data elements.
+        """
+        raise NotImplementedError(
+            "{} does not support multi-layer descriptor generation."
+            .format(type(self).__name__)
+        )
+
+    def generate_layer_arrays(
+        self,
+        data_iter: Iterable[DataElement],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, np.ndarray]]:
+        """
+        Generate the descriptor vectors of several named layers, or outputs,
+        of the model of this generator for **all** input data elements, from
+        a single pass over each input. What layer names are valid is
+        implementation specific.
+
+        Dictionaries yielded out will be parallel in association with the
+        data elements input. See :meth:`DescriptorGenerator.generate_arrays`
+        regarding selective iteration.
+
+        :param data_iter:
+            Iterable of DataElement instances to be described.
+        :param layers:
+            Names of the layers to generate descriptors from.
+
+        :raises NotImplementedError: This implementation does not support
+            multi-layer generation.
+        :raises RuntimeError: Descriptor extraction failure of some kind.
+        :raises ValueError: Given data element content was not of a valid type
+            with respect to this descriptor generator implementation, or no
+            layers were given.
+
+        :return: Iterator of dictionaries of result numpy.ndarray instances by
+            layer name.
+        """
+        if not layers:
+            raise ValueError("At least one layer must be given.")
+        validated_data_iter = (self.raise_valid_element(d) for d in data_iter)
+        return self._generate_layer_arrays(validated_data_iter, list(layers))
+
     def generate_elements(
         self,
         data_iter: Iterable[DataElement],
         descr_factory: DescriptorElementFactory = DFLT_DESCRIPTOR_FACTORY,
-        overwrite: bool = False
+        overwrite: bool = False,
+        check_batch_size: int = 128,
+        set_batch_size: int = 1,
+        write_behind_bytes: Optional[int] = None
     ) -> Generator[DescriptorElement, None, None]:
         """
         Generate DescriptorElement instances for the input data elements,
@@ -110,6 +190,25 @@ class DescriptorGenerator (Configurable, Pluggable, ContentTypeValidator):
         If the ``overwrite`` flag is True then descriptors are computed for all
         input data elements and are set to their respective descriptor elements
         regardless of existing vector storage.
+        Existence of vectors is checked via
+        :meth:`DescriptorElement.has_many_vectors` on windows of
+        ``check_batch_size`` descriptor elements at a time so that backends
+        with remote storage may check many elements per round trip.
+        Computed vectors are stored via
+        :meth:`DescriptorElement.set_many_vectors`, optionally in batches of
+        ``set_batch_size`` for backends with remote storage. Elements are
+        yielded once their vectors have been stored, so larger batches delay
+        the yielding of computed elements. Should generation fail part way
+        through a batch, the vectors computed so far are still stored.
+
+        **Write-behind**
+        When ``write_behind_bytes`` is given, batches of computed vectors are
+        instead stored by a background thread while generation continues (see
+        :class:`.WriteBehindVectorWriter`). Generation blocks while more than
+        ``write_behind_bytes`` of vector data is waiting to be stored.
+        In this mode, yielded elements may not have their vector stored yet
+        until this generator completes, at which point all vectors have been
+        stored and any storage error has been raised.
 
         :param data_iter:
             Iterable of DataElement instances to be described.
@@ -123,10 +222,23 @@ class DescriptorGenerator (Configurable, Pluggable, ContentTypeValidator):
             generate descriptors for all input data elements, overwriting the
             vectors previously stored in the factory-produces descriptor
             elements.
+        :param check_batch_size:
+            Number of input data elements whose descriptor elements are
+            checked for existing vectors at a time. Larger windows mean fewer
+            backend round trips at the cost of reading further ahead in
+            ``data_iter``.
+        :param set_batch_size:
+            Maximum number of computed vectors to store at a time. This is 1
+            (no batching) by default.
+        :param write_behind_bytes:
+            Optionally store computed vectors in the background, limiting the
+            number of vector bytes waiting to be stored to this value.
 
         :raises RuntimeError: Descriptor extraction failure of some kind.
         :raises ValueError: Given data element content was not of a valid type
-            with respect to this descriptor generator implementation.
+            with respect to this descriptor generator implementation, or
+            ``check_batch_size``, ``set_batch_size`` or
+            ``write_behind_bytes`` was not positive.
         :raises IndexError: Underlying vector-producing generator either under
             or over produced vectors.
 
@@ -134,15 +246,145 @@ class DescriptorGenerator (Configurable, Pluggable, ContentTypeValidator):
             generated DescriptorElement instances will reflect the UUID of the
             DataElement it was generated from.
         """
-        log_debug = LOG.debug
+        def generate(tocompute_iter: Iterable[DataElement]) -> Iterable[Dict[str, np.ndarray]]:
+            return ({_SINGLE_LAYER: v}
+                    for v in self.generate_arrays(tocompute_iter))
+
+        for elems in self._generate_element_dicts(
+                data_iter, {_SINGLE_LAYER: descr_factory}, generate, overwrite,
+                check_batch_size, set_batch_size, write_behind_bytes):
+            yield elems[_SINGLE_LAYER]
+
+    def generate_layer_elements(
+        self,
+        data_iter: Iterable[DataElement],
+        layer_factories: Mapping[str, DescriptorElementFactory],
+        overwrite: bool = False,
+        check_batch_size: int = 128,
+        set_batch_size: int = 1,
+        write_behind_bytes: Optional[int] = None
+    ) -> Generator[Dict[str, DescriptorElement], None, None]:
+        """
+        Multi-layer variant of
+        :meth:`DescriptorGenerator.generate_elements`, generating the
+        DescriptorElement instances of several named layers for the input
+        data elements, each layer from its own DescriptorElementFactory, from
+        a single pass over each input via
+        :meth:`DescriptorGenerator.generate_layer_arrays`.
+
+        Like ``generate_elements``, descriptors are only computed for data
+        elements for which some layer's descriptor element does not report as
+        already containing a vector, unless ``overwrite`` is True. Computed
+        vectors are only stored into the descriptor elements missing one in
+        that case. Existence checks, batched and write-behind storage behave
+        as described for ``generate_elements``, with batch sizes counted in
+        input data elements.
+
+        :param data_iter:
+            Iterable of DataElement instances to be described.
+        :param layer_factories:
+            DescriptorElementFactory instances by the name of the layer whose
+            descriptor elements they produce.
+        :param overwrite:
+            Generate descriptors for all input data elements, overwriting the
+            vectors previously stored in the factory-produced descriptor
+            elements.
+        :param check_batch_size:
+            Number of input data elements whose descriptor elements are
+            checked for existing vectors at a time.
+        :param set_batch_size:
+            Maximum number of input data elements whose computed vectors are
+            stored at a time. This is 1 (no batching) by default.
+        :param write_behind_bytes:
+            Optionally store computed vectors in the background, limiting the
+            number of vector bytes waiting to be stored to this value.
+
+        :raises NotImplementedError: This implementation does not support
+            multi-layer generation.
+        :raises RuntimeError: Descriptor extraction failure of some kind.
+        :raises ValueError: Given data element content was not of a valid type
+            with respect to this descriptor generator implementation, no
+            layer factories were given, or ``check_batch_size``,
+            ``set_batch_size`` or ``write_behind_bytes`` was not positive.
+        :raises IndexError: Underlying vector-producing generator either under
+            or over produced vectors.
+
+        :return: Iterator of dictionaries of result DescriptorElement
+            instances by layer name, in parallel association with the input
+            data elements. UUIDs of generated DescriptorElement instances will
+            reflect the UUID of the DataElement it was generated from.
+        """
+        layers = list(layer_factories)
+        if not layers:
+            raise ValueError("At least one layer factory must be given.")
+
+        def generate(tocompute_iter: Iterable[DataElement]) -> Iterable[Dict[str, np.ndarray]]:
+            return self.generate_layer_arrays(tocompute_iter, layers)
+
+        return self._generate_element_dicts(
+            data_iter, layer_factories, generate, overwrite, check_batch_size,
+            set_batch_size, write_behind_bytes
+        )
 
-        # Parallel lists of (uuid, DescriptorElement, already-computed) triples
-        #   for formulating the return yielding.
-        # Using deques so we can efficiently popleft off of them in the below
-        #   for-loop. This way we do not retain elements and booleans for
-        #   things we have yielded that would otherwise build up if this method
-        #   iterated for a long time.
-        elem_and_status_q: Deque[Tuple[DescriptorElement, bool]] = deque()
+    def _generate_element_dicts(
+        self,
+        data_iter: Iterable[DataElement],
+        layer_factories: Mapping[str, DescriptorElementFactory],
+        generate: Callable[[Iterable[DataElement]],
+                           Iterable[Dict[str, np.ndarray]]],
+        overwrite: bool,
+        check_batch_size: int,
+        set_batch_size: int,
+        write_behind_bytes: Optional[int]
+    ) -> Generator[Dict[str, DescriptorElement], None, None]:
+        """
+        Generate the DescriptorElement instances of one or more layers for
+        the input data elements, implementing ``generate_elements`` and
+        ``generate_layer_elements``.
+
+        :param data_iter: Iterable of DataElement instances to be described.
+        :param layer_factories: DescriptorElementFactory instances by layer
+            name.
+        :param generate: Function generating dictionaries of vectors by layer
+            name for an iterable of data elements, in parallel association.
+        :param overwrite: Generate descriptors for all input data elements.
+        :param check_batch_size: Number of input data elements whose
+            descriptor elements are checked for existing vectors at a time.
+        :param set_batch_size: Maximum number of input data elements whose
+            computed vectors are stored at a time.
+        :param write_behind_bytes: Optionally store computed vectors in the
+            background, limiting the number of vector bytes waiting to be
+            stored to this value.
+
+        :raises ValueError: ``check_batch_size``, ``set_batch_size`` or
+            ``write_behind_bytes`` was not positive.
+        :raises IndexError: ``generate`` either under or over produced
+            vectors.
+
+        :return: Iterator of dictionaries of result DescriptorElement
+            instances by layer name.
+        """
+        if check_batch_size < 1:
+            raise ValueError("Check batch size must be a positive integer "
+                             "(given {}).".format(check_batch_size))
+        if set_batch_size < 1:
+            raise ValueError("Set batch size must be a positive integer "
+                             "(given {}).".format(set_batch_size))
+        if write_behind_bytes is not None and write_behind_bytes < 1:
+            raise ValueError("Write-behind bytes must be a positive integer "
+                             "(given {}).".format(write_behind_bytes))
+        log_debug = LOG.debug
+        layers = list(layer_factories)
+
+        # Descriptor elements by layer of input data elements, with the
+        #   layers missing a vector, for formulating the return yielding.
+        # Using a deque so we can efficiently popleft off of it in the below
+        #   for-loop. This way we do not retain elements for things we have
+        #   yielded that would otherwise build up if this method iterated for
+        #   a long time.
+        elems_and_missing_q: Deque[
+            Tuple[Dict[str, DescriptorElement], List[str]]
+        ] = deque()
 
         # Flag for end of data iteration. When not None will be the index of
         # the last data/descriptor element to be yielded. This will NOT be the
@@ -158,68 +400,162 @@ class DescriptorGenerator (Configurable, Pluggable, ContentTypeValidator):
         def tocompute_data() -> Generator[DataElement, None, None]:
             """ Yield data elements that need descriptor computation.
 
-            Populate parallel lists as we traverse ``data_iter``, yielding data
-            elements that do not have an associated descriptor element with a
-            vector set. Alternatively, if ``overwrite`` is True, all data
-            elements are yielded and descriptor elements are marked for vector
-            setting.
+            Populate the queue as we traverse ``data_iter``, yielding data
+            elements for which some layer does not have an associated
+            descriptor element with a vector set. Alternatively, if
+            ``overwrite`` is True, all data elements are yielded and all
+            descriptor elements are marked for vector setting.
 
             :returns: Generator over data elements that need descriptor
                 generation.
             """
             # Running var for the index of final data element in input
             # iterator. This will be -1 or the value of the final index in the
-            # parallel lists.
+            # queue.
             last_i = -1
-            for d_i, data in enumerate(data_iter):
-                data_uuid_ = data.uuid()
-                descr_elem_ = \
-                    descr_factory.new_descriptor(data_uuid_)
-                already_computed = not overwrite and descr_elem_.has_vector()
-                elem_and_status_q.append((descr_elem_, already_computed))
-                if not already_computed:
-                    # Descriptor should be computed for this element
-                    log_debug("Yielding DataElement with UUID {} for "
-                              "generation".format(data_uuid_))
-                    yield data
+            data_iter_ = iter(data_iter)
+            while True:
+                data_window = list(itertools.islice(data_iter_,
+                                                    check_batch_size))
+                if not data_window:
+                    break
+                descr_windows = {
+                    layer: [layer_factories[layer].new_descriptor(d.uuid())
+                            for d in data_window]
+                    for layer in layers
+                }
+                if overwrite:
+                    computed_windows = {layer: [False] * len(data_window)
+                                        for layer in layers}
                 else:
-                    log_debug("Descriptor already computed for UUID {}"
-                              .format(data_uuid_))
-                last_i = d_i
+                    computed_windows = {
+                        layer: DescriptorElement.has_many_vectors(window)
+                        for layer, window in descr_windows.items()
+                    }
+                for i, data in enumerate(data_window):
+                    missing = [layer for layer in layers
+                               if not computed_windows[layer][i]]
+                    elems_and_missing_q.append(
+                        ({layer: descr_windows[layer][i] for layer in layers},
+                         missing)
+                    )
+                    if missing:
+                        # Descriptor should be computed for this element
+                        log_debug("Yielding DataElement with UUID {} for "
+                                  "generation".format(data.uuid()))
+                        yield data
+                    else:
+                        log_debug("Descriptor already computed for UUID {}"
+                                  .format(data.uuid()))
+                    last_i += 1
 
             end_of_iter[0] = last_i
 
-        descr_vec_iter = self.generate_arrays(tocompute_data())
-        for v_i, v in enumerate(descr_vec_iter):
-            # These pops would fail with an IndexError if there is nothing left
-            #   left from parallel allocation within ``tocompute_data``.
-            # This usually means that the ``self.generate_arrays`` is
-            #   generating more vectors than there are descr element slots to
-            #   fill.
-            v_descr_elem, v_already_computed = elem_and_status_q.popleft()
-
-            # Forwarding the iterator of the ``descr_vec_iter`` generator will,
-            # probably, forward the ``tocompute_data`` iterator, thus
-            # populating the ``elem_and_status_q`` to some degree. The current
-            # ``v`` should be be used to populate the next DescriptorElement
-            # with an associated "already_computed" flag of False.
-            while v_already_computed:
-                yield v_descr_elem
-                # We clearly have a descriptor vector from the result of
-                # computation so there should logically be some future element
-                # in which to store this result.
-                v_descr_elem, v_already_computed = elem_and_status_q.popleft()
-
-            # Assign the current computed descriptor vector to the current
-            # element that should be set to.
-            log_debug("Setting computed vector {} to element UUID {}"
-                      .format(v_i, v_descr_elem.uuid()))
-            v_descr_elem.set_vector(v)
-            yield v_descr_elem
+        # Computed elements and vectors by layer waiting to be stored, and the
+        # element dictionaries waiting to be yielded, in input order, once
+        # they are.
+        to_set: Dict[str, Tuple[List[DescriptorElement], List[np.ndarray]]] = \
+            {layer: ([], []) for layer in layers}
+        to_yield_q: Deque[Dict[str, DescriptorElement]] = deque()
+        # Number of input data elements whose vectors are waiting to be
+        # stored.
+        n_to_set = [0]
+
+        def store_set_vectors() -> None:
+            """ Store queued vectors, unqueuing them first so that they are
+            not attempted again should storing fail. """
+            n_to_set[0] = 0
+            for layer_elems, layer_vecs in to_set.values():
+                if not layer_elems:
+                    continue
+                elems, vecs = layer_elems[:], layer_vecs[:]
+                del layer_elems[:], layer_vecs[:]
+                if writer is not None:
+                    log_debug("Submitting {} computed vectors for writing"
+                              .format(len(elems)))
+                    writer.submit(elems, vecs)
+                else:
+                    log_debug("Setting {} computed vectors"
+                              .format(len(elems)))
+                    DescriptorElement.set_many_vectors(elems, vecs)
+
+        def flush_set_vectors() -> Generator[Dict[str, DescriptorElement],
+                                             None, None]:
+            """ Store queued vectors, then yield waiting elements. """
+            store_set_vectors()
+            while to_yield_q:
+                yield to_yield_q.popleft()
+
+        writer: Optional[WriteBehindVectorWriter] = None
+        if write_behind_bytes is not None:
+            writer = WriteBehindVectorWriter(
+                write_behind_bytes, name="generate_elements_writer"
+            )
+        try:
+            for v_i, layer_vecs in enumerate(generate(tocompute_data())):
+                # These pops would fail with an IndexError if there is nothing
+                #   left from parallel allocation within ``tocompute_data``.
+                # This usually means that ``generate`` is generating more
+                #   vectors than there are descr element slots to fill.
+                elems, missing = elems_and_missing_q.popleft()
+
+                # Forwarding the ``generate`` iterator will, probably,
+                # forward the ``tocompute_data`` iterator, thus populating the
+                # ``elems_and_missing_q`` to some degree. The current vectors
+                # should be be used to populate the next descriptor elements
+                # missing a vector.
+                while not missing:
+                    # Maintain input order behind elements still waiting for
+                    # their vectors to be stored.
+                    if n_to_set[0]:
+                        to_yield_q.append(elems)
+                    else:
+                        yield elems
+                    # We clearly have descriptor vectors from the result of
+                    # computation so there should logically be some future
+                    # element in which to store this result.
+                    elems, missing = elems_and_missing_q.popleft()
+
+                # Queue the current computed descriptor vectors to be set to
+                # the current elements missing one, storing queued vectors
+                # once there are enough.
+                log_debug("Queuing computed vectors {} for element UUID {}"
+                          .format(v_i, elems[missing[0]].uuid()))
+                for layer in missing:
+                    to_set[layer][0].append(elems[layer])
+                    to_set[layer][1].append(layer_vecs[layer])
+                to_yield_q.append(elems)
+                n_to_set[0] += 1
+                if n_to_set[0] >= set_batch_size:
+                    yield from flush_set_vectors()
+
+            # Store any remaining computed vectors.
+            yield from flush_set_vectors()
+            if writer is not None:
+                # Wait for all vectors to be stored, raising any error.
+                writer_, writer = writer, None
+                writer_.close()
+        finally:
+            if n_to_set[0]:
+                # Generation failed part way through a batch. Still store the
+                # vectors computed so far without masking the original error.
+                try:
+                    store_set_vectors()
+                except BaseException as ex:
+                    LOG.error("Storing computed vectors failed after "
+                              "generation was interrupted: {}".format(ex))
+            if writer is not None:
+                # Generation stopped early or failed. Still wait for submitted
+                # vectors to be stored without masking the original error.
+                try:
+                    writer.close()
+                except BaseException as ex:
+                    LOG.error("Background vector writing failed after "
+                              "generation was interrupted: {}".format(ex))
 
         # At this point, the ``tocompute_data()`` iterator should have
-        #   completed due to the ``self.generate_arrays`` method iterating
-        #   through it completely, assigning a value to ``end_of_iter[0]``.
+        #   completed due to the ``generate`` function iterating through it
+        #   completely, assigning a value to ``end_of_iter[0]``.
         # This also indicates that nothing more should be being added to the
         #   deques.
         assert end_of_iter[0] is not None, \
@@ -229,18 +565,18 @@ class DescriptorGenerator (Configurable, Pluggable, ContentTypeValidator):
 
         # Finish yielding any already-computed descriptor elements that are
         # past the last computed element index.
-        for e, already_comp in elem_and_status_q:
-            # If an element's already computed state is False at this point,
-            # then this implementation's ``_generate_arrays`` method must not
-            # have yielded enough arrays to fill vacancies that needed to be
-            # filled.
-            if not already_comp:
+        for elems, missing in elems_and_missing_q:
+            # If an element is missing a vector at this point, then this
+            # implementation must not have yielded enough vectors to fill
+            # vacancies that needed to be filled.
+            if missing:
                 raise IndexError(
                     "Implementation generator under-produced vectors to fill "
                     "descriptor elements in need of a vector (UUID `{}` not "
-                    "filled).".format(e.uuid())
+                    "filled).".format(elems[missing[0]].uuid())
                 )
-            yield e
+            yield elems
+
     #
     # Single-element-based convenience methods
     #
@@ -79,6 +79,21 @@ class DescriptorSet (Configurable, Pluggable):
 
         """
 
+    def has_many_descriptors(self, uuids: Iterable[Hashable]) -> List[bool]:
+        """
+        Check which of the given UUIDs have a DescriptorElement in this index.
+
+        The default implementation checks one UUID at a time. Implementations
+        able to check many UUIDs with a single query should override this.
+
+        :param uuids: Iterable of UUIDs to query for.
+
+        :return: List of booleans of whether a DescriptorElement with each
+            given UUID exists in this index, in the order that UUIDs were
+            given.
+        """
+        return [self.has_descriptor(uuid) for uuid in uuids]
+
     @abc.abstractmethod
     def add_descriptor(self, descriptor: DescriptorElement) -> None:
         """
@@ -1,5 +1,5 @@
 import abc
-from typing import Iterable
+from typing import Dict, Iterable, Sequence
 import numpy as np
 
 from smqtk_core import Configurable, Pluggable
@@ -27,3 +27,33 @@ class ImageDescriptorGenerator (Configurable, Pluggable):
         :return: Iterable of numpy arrays in parallel association with the
             input image matrices.
         """
+
+    def generate_layer_arrays_from_images(
+        self,
+        img_mat_iter: Iterable[np.ndarray],
+        layers: Sequence[str]
+    ) -> Iterable[Dict[str, np.ndarray]]:
+        """
+        Generate the descriptor vectors of several named layers, or outputs,
+        of a model for input image matrices, computing all layers of an image
+        in one pass.
+
+        Implementations supporting multi-layer generation override this
+        method. By default, it is not supported.
+
+        :param img_mat_iter:
+            Iterable of numpy arrays representing input image matrices.
+        :param layers:
+            Names of the layers to generate descriptors from.
+
+        :raises NotImplementedError: This implementation does not support
+            multi-layer generation.
+        :raises RuntimeError: Descriptor extraction failure of some kind.
+
+        :return: Iterable of dictionaries of numpy arrays by layer name, in
+            parallel association with the input image matrices.
+        """
+        raise NotImplementedError(
+            "{} does not support multi-layer descriptor generation."
+            .format(type(self).__name__)
+        )
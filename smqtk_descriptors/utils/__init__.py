@@ -1 +1,4 @@
-from .parallel import parallel_map  # noqa: F401
+from .parallel import (  # noqa: F401
+    parallel_map, ParallelMapMetrics, ParallelWorkerPool
+)
+from .async_parallel import async_parallel_map  # noqa: F401
@@ -0,0 +1,266 @@
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import logging
+import multiprocessing
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional,
+    Set, TypeVar, Union
+)
+
+from smqtk_descriptors.utils.parallel import _max_chunks_in_flight
+
+
+LOG = logging.getLogger(__name__)
+T = TypeVar("T")
+
+# Marker for an input sequence that has been exhausted.
+_EXHAUSTED = object()
+
+
+def async_parallel_map(
+    work_func: Callable[..., Union[T, Awaitable[T]]],
+    *sequences: Union[Iterable, AsyncIterator],
+    **kwargs: Any
+) -> AsyncIterator[T]:
+    """
+    Asynchronous counterpart to ``parallel_map``, applying a work function to
+    input sequences concurrently and yielding results through an asynchronous
+    iterator to be consumed on an asyncio event loop.
+
+    If ``work_func`` is a coroutine function, up to ``cores`` calls are awaited
+    concurrently on the event loop, which suits I/O bound work like fetching
+    ``DataElement`` bytes. Otherwise, ``work_func`` is run in a thread or
+    process pool executor, which suits CPU bound work, while the event loop is
+    free to perform other tasks.
+
+    Input sequences may be regular or asynchronous iterables. Regular
+    iterables are iterated on the event loop, so they should not block.
+
+    Like ``parallel_map``, the number of input items fed to work whose results
+    have not yet been yielded is limited to ``2 * floor(C * F) + C``, for
+    ``C`` cores and buffer factor ``F``. Since this includes results held to
+    maintain input order, this is a hard limit on the number of buffered
+    results in ordered mode as well. Input is only consumed while the
+    returned iterator is iterated.
+
+    Work is canceled, and an owned executor is shut down, when the returned
+    iterator is exhausted, raises an exception or is closed via its
+    ``aclose`` method. An exception raised by the work function is raised
+    when its result would have been yielded.
+
+    Example::
+
+        async def fetch(elem):
+            ...
+
+        async for data in async_parallel_map(fetch, elements, cores=16):
+            ...
+
+    :param work_func: Function, or coroutine function, that performs some
+        work on input data, resulting in some returned value. When using
+        multiprocessing, this must be picklable.
+    :param sequences: Input data to apply to the given ``work_func`` function.
+        If more than one sequence is given, the function is called with an
+        argument list consisting of the corresponding item of each sequence.
+    :param kwargs: Optionally available keyword arguments are as follows:
+
+        - fill_void
+            - Optional value that, if specified, activates sequence handling
+              like that of ``itertools.zip_longest``, using the provided value
+              as a fill-in for shorter sequences until the longest sequence is
+              exhausted.
+            - type: Any
+            - default: No default
+
+        - ordered
+            - If results for input elements should be yielded in the same order
+              as input elements. If False, we yield results as soon as they are
+              completed.
+            - type: bool
+            - default: True
+
+        - buffer_factor
+            - Multiplier against the number of cores used to limit the number
+              of input items in flight (see above).
+            - type: float
+            - default: 2.0
+
+        - cores
+            - Optional maximum number of concurrent work function calls, or
+              the number of executor workers. If None, we will use the number
+              of available cores.
+            - type: None | int
+            - default: None
+
+        - use_multiprocessing
+            - Whether a non-coroutine ``work_func`` is run in a process pool
+              executor instead of a thread pool executor. Ignored for
+              coroutine functions or when ``executor`` is given.
+            - type: bool
+            - default: False
+
+        - executor
+            - Optional ``concurrent.futures.Executor`` to run a non-coroutine
+              ``work_func`` in instead of one created for this call. This
+              executor is not shut down by this function.
+            - type: None | concurrent.futures.Executor
+            - default: None
+
+    :raises ValueError: ``buffer_factor`` is not positive.
+
+    :return: A new asynchronous iterator of results that starts work on the
+        input sequences when iterated.
+    """
+    cores: Optional[int] = kwargs.get('cores', None)
+    ordered = kwargs.get('ordered', True)
+    buffer_factor = kwargs.get('buffer_factor', 2.0)
+    use_multiprocessing = kwargs.get('use_multiprocessing', False)
+    executor: Optional[concurrent.futures.Executor] = \
+        kwargs.get('executor', None)
+    fill_activate = 'fill_void' in kwargs
+    fill_value = kwargs.get('fill_void', None)
+
+    if buffer_factor <= 0:
+        raise ValueError("buffer_factor must be positive (given {!r})."
+                         .format(buffer_factor))
+    if cores is None or cores <= 0:
+        cores = multiprocessing.cpu_count()
+        LOG.debug("Using all cores (%d)", cores)
+
+    return _async_map(work_func, sequences, cores, ordered,
+                      _max_chunks_in_flight(cores, buffer_factor),
+                      use_multiprocessing, executor, fill_activate,
+                      fill_value)
+
+
+async def _async_zip(
+    sequences: Iterable[Union[Iterable, AsyncIterator]],
+    do_fill: bool,
+    fill_value: Any
+) -> AsyncIterator[tuple]:
+    """
+    Asynchronous ``zip``, or ``zip_longest`` if ``do_fill``, over regular and
+    asynchronous iterables.
+    """
+    iters: List[Any] = [
+        s.__aiter__() if hasattr(s, '__aiter__') else iter(s)
+        for s in sequences
+    ]
+    if not iters:
+        return
+    exhausted = [False] * len(iters)
+
+    async def next_of(i: int) -> Any:
+        it = iters[i]
+        try:
+            if hasattr(it, '__anext__'):
+                return await it.__anext__()
+            return next(it)
+        except (StopIteration, StopAsyncIteration):
+            exhausted[i] = True
+            return _EXHAUSTED
+
+    while True:
+        args = []
+        for i in range(len(iters)):
+            v = fill_value if exhausted[i] else await next_of(i)
+            if v is _EXHAUSTED:
+                if not do_fill:
+                    return
+                v = fill_value
+            args.append(v)
+        if all(exhausted):
+            return
+        yield tuple(args)
+
+
+async def _async_map(
+    work_func: Callable,
+    sequences: Iterable[Union[Iterable, AsyncIterator]],
+    cores: int,
+    ordered: bool,
+    max_in_flight: int,
+    use_multiprocessing: bool,
+    executor: Optional[concurrent.futures.Executor],
+    do_fill: bool,
+    fill_value: Any
+) -> AsyncIterator:
+    """
+    Asynchronous generator implementing ``async_parallel_map``.
+    """
+    loop = asyncio.get_running_loop()
+    owned_executor: Optional[concurrent.futures.Executor] = None
+    if inspect.iscoroutinefunction(work_func):
+        concurrency = asyncio.Semaphore(cores)
+
+        async def call(*args: Any) -> Any:
+            async with concurrency:
+                return await work_func(*args)
+    else:
+        if executor is None:
+            if use_multiprocessing:
+                executor = owned_executor = \
+                    concurrent.futures.ProcessPoolExecutor(cores)
+            else:
+                executor = owned_executor = \
+                    concurrent.futures.ThreadPoolExecutor(cores)
+
+        def call(*args: Any) -> Awaitable:
+            return loop.run_in_executor(
+                executor, functools.partial(work_func, *args)
+            )
+
+    # Work fed whose results have not been yielded yet, by input index.
+    pending: Dict[int, asyncio.Future] = {}
+    # Input indices by future, for unordered mode.
+    indices: Dict[asyncio.Future, int] = {}
+    n_fed = 0
+    next_index = 0
+    args_iter = _async_zip(sequences, do_fill, fill_value)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    args = await args_iter.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                fut = asyncio.ensure_future(call(*args))
+                pending[n_fed] = fut
+                indices[fut] = n_fed
+                n_fed += 1
+            if not pending:
+                return
+
+            if ordered:
+                fut = pending[next_index]
+                # Wait while the future is still pending, so that it is
+                # canceled below should this generator be canceled or closed
+                # meanwhile.
+                await asyncio.wait([fut])
+                del pending[next_index]
+                next_index += 1
+            else:
+                done: Set[asyncio.Future]
+                done, _ = await asyncio.wait(
+                    list(pending.values()),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                fut = done.pop()
+                del pending[indices[fut]]
+            del indices[fut]
+            yield fut.result()
+    finally:
+        for fut in pending.values():
+            if fut.done():
+                if not fut.cancelled():
+                    # Mark exceptions of unused results as retrieved.
+                    fut.exception()
+            else:
+                fut.cancel()
+        if owned_executor is not None:
+            owned_executor.shutdown(wait=False)
+        await args_iter.aclose()
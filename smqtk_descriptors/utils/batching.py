@@ -0,0 +1,146 @@
+from collections import deque
+import itertools
+import logging
+import threading
+import time
+from typing import (
+    Any, Deque, Iterable, Iterator, List, Optional, Tuple, TypeVar
+)
+
+from smqtk_descriptors.utils.parallel import ParallelResultsIterator
+
+
+LOG = logging.getLogger(__name__)
+T = TypeVar("T")
+
+
+def iter_batches(
+    items: Iterable[T],
+    batch_size: int,
+    max_wait: Optional[float] = None
+) -> Iterator[List[T]]:
+    """
+    Group items of an iterable into batches of up to ``batch_size`` items.
+
+    Without ``max_wait``, every batch but the last is full, waiting as long as
+    it takes for input items to fill it. With ``max_wait``, a partial batch is
+    yielded once ``max_wait`` seconds have passed since its first item was
+    available, bounding the latency added by batching on a trickling input
+    stream while still yielding full batches when input is plentiful. In this
+    mode, input items are pulled on a background thread, at most
+    ``batch_size`` items ahead of those yielded.
+
+    :param items: Input items to batch.
+    :param batch_size: Maximum number of items per batch.
+    :param max_wait: Optional maximum time in seconds to wait for a batch to
+        fill after its first item is available.
+
+    :raises ValueError: ``batch_size`` is not positive or ``max_wait`` is
+        negative.
+
+    :return: Iterator of non-empty lists of input items, in input order.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer (given {!r})."
+                         .format(batch_size))
+    if max_wait is None:
+        return _iter_full_batches(iter(items), batch_size)
+    if max_wait < 0:
+        raise ValueError("max_wait must not be negative (given {!r})."
+                         .format(max_wait))
+    return _iter_deadline_batches(iter(items), batch_size, max_wait)
+
+
+def _iter_full_batches(it: Iterator[T], batch_size: int) -> Iterator[List[T]]:
+    batch = list(itertools.islice(it, batch_size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(it, batch_size))
+
+
+class _BatchPump (threading.Thread):
+    """
+    Thread pulling items from an iterator into a buffer for deadline batch
+    assembly, at most ``max_ahead`` items ahead of those taken. Items are
+    buffered with the monotonic time they were pulled at.
+    """
+
+    def __init__(self, it: Iterator, max_ahead: int):
+        super().__init__(name="BatchPump", daemon=True)
+        self.it = it
+        self.cond = threading.Condition()
+        self.buffer: Deque[Tuple[float, Any]] = deque()
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._slots = threading.Semaphore(max_ahead)
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        # Wake up if waiting for a slot.
+        self._slots.release()
+        # Wake up if waiting for results of a parallel map.
+        if isinstance(self.it, ParallelResultsIterator):
+            self.it.stop()
+
+    def taken(self, n: int) -> None:
+        """ Mark ``n`` buffered items as taken, allowing more to be pulled. """
+        for _ in range(n):
+            self._slots.release()
+
+    def run(self) -> None:
+        try:
+            while True:
+                self._slots.acquire()
+                if self._stop_event.is_set():
+                    return
+                try:
+                    item = next(self.it)
+                except StopIteration:
+                    return
+                with self.cond:
+                    self.buffer.append((time.monotonic(), item))
+                    self.cond.notify()
+        except BaseException as ex:
+            self.error = ex
+        finally:
+            with self.cond:
+                self.done = True
+                self.cond.notify()
+
+
+def _iter_deadline_batches(
+    it: Iterator[T],
+    batch_size: int,
+    max_wait: float
+) -> Iterator[List[T]]:
+    pump = _BatchPump(it, batch_size)
+    pump.start()
+    cond = pump.cond
+    try:
+        while True:
+            with cond:
+                # Wait without deadline for the first item of a batch.
+                while not pump.buffer and not pump.done:
+                    cond.wait()
+                # The wait is bounded from when the first item was pulled,
+                # which may be well before it was waited for here when items
+                # were pulled while the previous batch was being processed.
+                if pump.buffer:
+                    deadline = pump.buffer[0][0] + max_wait
+                    while len(pump.buffer) < batch_size and not pump.done:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        cond.wait(remaining)
+                batch = [pump.buffer.popleft()[1]
+                         for _ in range(min(batch_size, len(pump.buffer)))]
+                error = pump.error if not batch else None
+            if error is not None:
+                raise error
+            if not batch:
+                return
+            pump.taken(len(batch))
+            yield batch
+    finally:
+        pump.stop()
@@ -1,20 +1,42 @@
 import abc
-from itertools import zip_longest
+import bisect
+from collections import deque
+from itertools import islice, zip_longest
 import heapq
 import logging
 import multiprocessing
 import multiprocessing.queues
 import multiprocessing.synchronize
+from multiprocessing.reduction import ForkingPickler
+import pickle
 import queue
 import sys
 import threading
+import time
 import traceback
-from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Type, Union, TypeVar
+from types import TracebackType
+from typing import (
+    Any, Callable, Deque, Dict, Iterable, Iterator, List, MutableMapping,
+    Optional, Sequence, Tuple, Type, Union, TypeVar
+)
+
+import numpy
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # pragma: no cover
+    # Only available in python 3.8+.
+    resource_tracker = shared_memory = None  # type: ignore
 
 
 LOG = logging.getLogger(__name__)
 T_co = TypeVar("T_co", covariant=True)
 
+# Work time, in seconds, that automatically sized chunks aim to take.
+AUTO_CHUNK_TARGET_SECONDS = 0.01
+# Upper limit on automatically sized chunks.
+AUTO_CHUNK_MAX_SIZE = 256
+
 
 def parallel_map(
     work_func: Callable[..., T_co],
@@ -62,34 +84,36 @@ def parallel_map(
     iterated and the number of work function outputs are held in memory at any
     given time.
 
-    The maximum number of input sequence items loaded at a time is
-    ``floor(C * F) + C``.
-    This is due to the input work queue ``maxsize`` being set to ``floor(C*F)``
-    while there can be ``C`` workers could be utilizing their inputs to
-    complete their work instances.
-
-    The maximum number of results queued is ``floor(C * F) + C``.
-    This is similarly due to the output result queue maxsize being set to
-    ``floor(C * F)`` while there can be ``C`` workers blocked on putting values
-    into a full results queue.
+    The maximum number of input sequence items fed to workers whose results
+    have not yet been received from the results queue is
+    ``2 * floor(C * F) + C``.
+    The feeder thread waits before feeding more input while this many items
+    are queued for, being worked on by, or queued as results from workers.
 
     Sometimes its important to know how much farther ahead the input
     iterator(s) have yielded compared to the number of output results from the
     ``ParallelResultsIterator``.
     For some yielded result at index ``N``, the input iterator(s) next yielded
-    item should be their index ``N + (2 * floor(C * F) + C)``. This is
-    derived from the input work and output result queues maximally filled with
-    at most ``floor(C * F)`` items and there being ``C`` workers working on, or
-    attempting to queue results for, their current inputs.
+    item should be their index ``N + (2 * floor(C * F) + C)``, following from
+    the above limit.
     For example, if we have use ``C=4`` and ``F=1.5``, if result index N has just
     been yielded, then the input iterators are ready to yield their
     ``N + 16``-th indexed item (``2 * floor(4*1.5) + 4 = 2 * 6 + 4 = 16``).
 
+    When work is dispatched in chunks (see the ``chunksize`` option), the
+    above bounds count chunks instead of individual items.
+
     The above is only guaranteed no the ``ordered`` option is ``False``,
     otherwise non-determinism in processing order can cause results for input
     items to return out of order, causing additional buffering in the heap used
-    to ensure ordered output which, necessarily, has no size limits so as to
-    not dead-lock.
+    to ensure ordered output which, by default, has no size limits.
+    A hard limit may be set with the ``max_outstanding`` option, bounding the
+    number of items fed to workers whose results have not yet been yielded in
+    order: while the head-of-line item is late, the feeder thread waits
+    instead of feeding more input whose results would pile up in the heap.
+    Since items are fed in order, the head-of-line item is always already
+    fed, so this cannot dead-lock, though a slow item stalls the other
+    workers once this limit is reached.
 
     :param work_func:
         Function that performs some work on input data, resulting in some
@@ -123,9 +147,8 @@ def parallel_map(
 
         - buffer_factor
             - Multiplier against the number of processes used to limit the
-              growth size of the result queue coming from worker processes
-              (``int(cores * buffer_factor)``). This is utilized so we don't
-              overrun our RAM buffering results.
+              number of input items in flight (see above). This is utilized
+              so we don't overrun our RAM buffering inputs and results.
             - type: float
             - default: 2.0
 
@@ -142,13 +165,11 @@ def parallel_map(
             - default: False
 
         - heart_beat
-            - Interval at which workers check for operational messages while
-              waiting on locks (e.g. waiting to push or pull messages). This
-              ensures that workers are not left hanging, or hang the program,
-              when and error or interruption occurs, or when waiting on an full
-              edge. This must be >0.
+            - No longer used and only accepted for backwards compatibility.
+              Workers block on their queues and are woken by stop messages
+              instead of periodically polling for them.
             - type: float
-            - default: 0.001
+            - default: None
 
         - name
             - Optional string name for identifying workers and logging
@@ -164,6 +185,58 @@ def parallel_map(
             - type: bool
             - default: True
 
+        - chunksize
+            - Number of input items sent to a worker at a time. Workers call
+              the work function on each item of a chunk and return results of
+              a chunk together. Larger chunks amortize the per-item queue
+              overhead for cheap work functions. If ``"auto"``, the chunk size
+              is adjusted during iteration based on the work time reported by
+              workers, aiming for chunks taking about
+              ``AUTO_CHUNK_TARGET_SECONDS`` of work, up to
+              ``AUTO_CHUNK_MAX_SIZE`` items. Result order semantics are not
+              affected.
+            - type: int | str
+            - default: 1
+
+        - pool
+            - Optional ``ParallelWorkerPool`` to perform work with instead of
+              starting new workers for this call. Worker options (``cores``,
+              ``use_multiprocessing``, ``buffer_factor``, ``daemon`` and
+              ``shared_memory_min_bytes``) are those of the pool and may not
+              be given with this option.
+            - type: None | ParallelWorkerPool
+            - default: None
+
+        - max_outstanding
+            - Optional maximum number of input items fed to workers whose
+              results have not yet been yielded, including results held out
+              of order when ``ordered`` is True (see above). This is in
+              addition to the limit set by ``buffer_factor``. When work is
+              dispatched in chunks, this counts chunks. ``None`` means no
+              additional limit.
+            - type: None | int
+            - default: None
+
+        - collect_metrics
+            - If throughput, blocking and queue depth metrics of this job
+              should be collected into a ``ParallelMapMetrics`` instance,
+              available as the ``metrics`` attribute of the returned
+              iterator. Otherwise, that attribute is None.
+            - type: bool
+            - default: False
+
+        - shared_memory_min_bytes
+            - When using multiprocessing, numpy arrays of at least this many
+              bytes, given as work function arguments or returned as results
+              (including those directly within tuples or lists), are
+              transported through ``multiprocessing.shared_memory`` blocks
+              instead of being pickled through the work and result queues.
+              This avoids pickling and piping large image matrices and
+              descriptor arrays. ``None`` disables this. This is ignored when
+              not using multiprocessing. Requires python 3.8+.
+            - type: None | int
+            - default: None
+
     :return: A new parallel results iterator that starts work on the input
         iterable when iterated.
 
@@ -181,19 +254,31 @@ def parallel_map(
     ordered = kwargs.get('ordered', True)
     buffer_factor = kwargs.get('buffer_factor', 2.0)
     use_multiprocessing = kwargs.get('use_multiprocessing', False)
-    heart_beat = kwargs.get('heart_beat', 0.001)
     fill_activate = 'fill_void' in kwargs
     fill_value = kwargs.get('fill_void', None)
     name = kwargs.get('name', None)
     daemon = kwargs.get('daemon', True)
+    shm_min_bytes: Optional[int] = kwargs.get('shared_memory_min_bytes', None)
+    chunksize: Union[int, str] = kwargs.get('chunksize', 1)
+    max_outstanding: Optional[int] = kwargs.get('max_outstanding', None)
+    collect_metrics = kwargs.get('collect_metrics', False)
+    pool: Optional[ParallelWorkerPool] = kwargs.pop('pool', None)
+
+    if pool is not None:
+        return pool.map(work_func, *sequences, **kwargs)
 
     if name:
         log = logging.getLogger(__name__ + '[%s]' % name)
     else:
         log = logging.getLogger(__name__)
 
-    if heart_beat <= 0:
-        raise ValueError("heart_beat must be >0.")
+    chunksize, auto_chunksize = _resolve_chunksize(chunksize)
+    _check_max_outstanding(max_outstanding)
+
+    if not use_multiprocessing:
+        shm_min_bytes = None
+    elif shm_min_bytes is not None and shared_memory is None:  # pragma: no cover
+        raise RuntimeError("Shared memory transport requires python 3.8+.")
 
     if cores is None or cores <= 0:
         cores = multiprocessing.cpu_count()
@@ -211,32 +296,254 @@ def parallel_map(
         queue_t = queue.Queue
         worker_t = _WorkerThread
 
+    # Queues are not bounded themselves as the feeder thread limits the
+    # number of chunks in flight, so that blocking on them never needs to be
+    # interrupted other than by putting stop messages.
     # Type ignoring these calls due to a mypy issue where it's deducing the
     # type to `<nothing>` for some reason.
-    queue_work = queue_t(maxsize=int(cores * buffer_factor))  # type: ignore
-    queue_results = queue_t(maxsize=int(cores * buffer_factor))  # type: ignore
+    queue_work = queue_t()  # type: ignore
+    queue_results = queue_t()  # type: ignore
 
     log.log(1, "Constructing worker processes")
     workers = [worker_t(name, i, work_func, queue_work, queue_results,
-                        heart_beat)
+                        shm_min_bytes)
                for i in range(cores)]
 
     log.log(1, "Constructing feeder thread")
     feeder_thread = _FeedQueueThread(name, sequences, queue_work,
-                                     len(workers), heart_beat, fill_activate,
-                                     fill_value)
+                                     len(workers), fill_activate, fill_value,
+                                     _max_chunks_in_flight(cores,
+                                                           buffer_factor),
+                                     shm_min_bytes, chunksize,
+                                     max_outstanding=max_outstanding,
+                                     metrics=(ParallelMapMetrics(len(workers))
+                                              if collect_metrics else None))
 
     return ParallelResultsIterator(name, ordered, use_multiprocessing,
-                                   heart_beat, queue_work,
+                                   queue_work,
                                    queue_results, feeder_thread, workers,
-                                   daemon)
+                                   daemon, shm_min_bytes is not None,
+                                   auto_chunksize)
+
+
+def _max_chunks_in_flight(cores: int, buffer_factor: float) -> int:
+    """
+    :return: Maximum number of chunks fed to workers whose results have not
+        yet been received, ``2 * floor(cores * buffer_factor) + cores``.
+    """
+    return max(1, 2 * int(cores * buffer_factor) + cores)
+
+
+def _resolve_chunksize(chunksize: Union[int, str]) -> Tuple[int, bool]:
+    """
+    Check a ``chunksize`` option value.
+
+    :raises ValueError: The value is not a positive integer or ``"auto"``.
+
+    :return: Initial chunk size and if the chunk size is automatically
+        adjusted.
+    """
+    if chunksize == 'auto':
+        return 1, True
+    elif not isinstance(chunksize, int) or chunksize < 1:
+        raise ValueError("chunksize must be a positive integer or 'auto' "
+                         "(given {!r}).".format(chunksize))
+    return chunksize, False
+
+
+def _check_max_outstanding(max_outstanding: Optional[int]) -> None:
+    """
+    Check a ``max_outstanding`` option value.
+
+    :raises ValueError: The value is not None or a positive integer.
+    """
+    if max_outstanding is not None and (
+            not isinstance(max_outstanding, int) or max_outstanding < 1):
+        raise ValueError("max_outstanding must be None or a positive integer "
+                         "(given {!r}).".format(max_outstanding))
+
+
+class ParallelMapMetrics (object):
+    """
+    Opt-in instrumentation of a parallel mapping job, to tell whether the
+    input feeder, the workers or the results consumer is the bottleneck.
+
+    Counters are updated by the feeder thread and by the consumer of the
+    results iterator as chunks are fed and received. ``summary`` may be called
+    from any thread at any time for live values, and after iteration for a
+    final summary, which is also logged at the debug level on clean-up.
+
+    Reading the summary:
+
+    - ``feeder_blocked_seconds`` is the time the feeder waited for a free
+      chunk slot: workers or the consumer are not keeping up.
+    - ``workers[w]["idle_seconds"]`` is the time worker ``w`` waited for input
+      before starting the chunks it completed: the feeder, i.e. the input
+      sequences, are not keeping up.
+    - ``consumer_blocked_seconds`` is the time the consumer waited for
+      results: workers are not keeping up.
+    - ``reorder_heap_size`` is the number of chunks held out of order to
+      maintain input order.
+    - ``work_latency_histogram`` counts items by work function time, as
+      ``(upper_bound_seconds, count)`` pairs. When work is dispatched in
+      chunks, each item of a chunk is counted at the chunk's average.
+
+    :param n_workers: Number of workers items may be completed by.
+    """
+
+    #: Upper bounds, in seconds, of the work latency histogram buckets. A last
+    #: bucket counts items over the largest bound.
+    LATENCY_BUCKETS = (
+        1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 2e-2,
+        5e-2, 0.1, 0.2, 0.5, 1., 2., 5., 10., 20., 50., 100.
+    )
+
+    def __init__(self, n_workers: int):
+        self._lock = threading.Lock()
+        self._start: Optional[float] = None
+        self._end: Optional[float] = None
+        self.items_fed = 0
+        self.chunks_fed = 0
+        self.feeder_blocked_seconds = 0.
+        self.items_completed = 0
+        self.chunks_completed = 0
+        self.consumer_blocked_seconds = 0.
+        self.reorder_heap_size = 0
+        self.max_reorder_heap_size = 0
+        self.worker_items = [0] * n_workers
+        self.worker_chunks = [0] * n_workers
+        self.worker_work_seconds = [0.] * n_workers
+        self.worker_idle_seconds = [0.] * n_workers
+        self.latency_counts = [0] * (len(self.LATENCY_BUCKETS) + 1)
+
+    def start(self) -> None:
+        """ Mark the start of the job. """
+        with self._lock:
+            self._start = time.perf_counter()
+
+    def end(self) -> None:
+        """ Mark the end of the job. """
+        with self._lock:
+            if self._end is None:
+                self._end = time.perf_counter()
+
+    def record_fed(self, n_items: int, blocked_seconds: float) -> None:
+        """
+        Record a chunk being fed to workers.
+
+        :param n_items: Number of items in the chunk.
+        :param blocked_seconds: Time the feeder waited for a chunk slot.
+        """
+        with self._lock:
+            self.items_fed += n_items
+            self.chunks_fed += 1
+            self.feeder_blocked_seconds += blocked_seconds
+
+    def record_completed(
+        self,
+        worker: int,
+        n_items: int,
+        work_seconds: float,
+        idle_seconds: float
+    ) -> None:
+        """
+        Record the results of a chunk being received.
+
+        :param worker: Index of the worker that completed the chunk.
+        :param n_items: Number of items in the chunk.
+        :param work_seconds: Time spent in the work function for the chunk.
+        :param idle_seconds: Time the worker waited for the chunk.
+        """
+        bucket = bisect.bisect_left(self.LATENCY_BUCKETS,
+                                    work_seconds / max(n_items, 1))
+        with self._lock:
+            self.items_completed += n_items
+            self.chunks_completed += 1
+            self.worker_items[worker] += n_items
+            self.worker_chunks[worker] += 1
+            self.worker_work_seconds[worker] += work_seconds
+            self.worker_idle_seconds[worker] += idle_seconds
+            self.latency_counts[bucket] += n_items
+
+    def record_consumer_blocked(self, seconds: float) -> None:
+        """
+        Record time the consumer waited for results.
+        """
+        with self._lock:
+            self.consumer_blocked_seconds += seconds
+
+    def record_reorder_heap_size(self, size: int) -> None:
+        """
+        Record the current number of chunks held to maintain order.
+        """
+        with self._lock:
+            self.reorder_heap_size = size
+            self.max_reorder_heap_size = max(self.max_reorder_heap_size, size)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        :return: JSON compatible dictionary of current metric values.
+        """
+        with self._lock:
+            if self._start is None:
+                elapsed = 0.
+            else:
+                elapsed = (self._end or time.perf_counter()) - self._start
+            bounds = list(self.LATENCY_BUCKETS) + [float('inf')]
+            return {
+                'elapsed_seconds': elapsed,
+                'items_fed': self.items_fed,
+                'chunks_fed': self.chunks_fed,
+                'items_completed': self.items_completed,
+                'chunks_completed': self.chunks_completed,
+                'items_per_second': (self.items_completed / elapsed
+                                     if elapsed > 0 else 0.),
+                'feeder_blocked_seconds': self.feeder_blocked_seconds,
+                'consumer_blocked_seconds': self.consumer_blocked_seconds,
+                'reorder_heap_size': self.reorder_heap_size,
+                'max_reorder_heap_size': self.max_reorder_heap_size,
+                'workers': [
+                    {
+                        'items': self.worker_items[w],
+                        'chunks': self.worker_chunks[w],
+                        'work_seconds': self.worker_work_seconds[w],
+                        'idle_seconds': self.worker_idle_seconds[w],
+                    }
+                    for w in range(len(self.worker_items))
+                ],
+                'work_latency_histogram': list(zip(bounds,
+                                                   self.latency_counts)),
+            }
 
 
 class _TerminalPacket (object):
     """
     Signals a terminal message
+
+    :param n_chunks: Number of work chunks fed for the job ending, when sent
+        by the feeder of a ``ParallelWorkerPool`` job.
     """
 
+    def __init__(self, n_chunks: Optional[int] = None):
+        self.n_chunks = n_chunks
+
+
+class _StopPacket (object):
+    """
+    Signals the receiver to stop waiting for messages
+    """
+
+
+def _is_stop(p: Any) -> bool:
+    """
+    Check if a given packet is a stop message.
+
+    :param p: element to check
+
+    :return: If ``p`` is a stop message
+    """
+    return isinstance(p, _StopPacket)
+
 
 def _is_terminal(p: Any) -> bool:
     """
@@ -249,6 +556,109 @@ def _is_terminal(p: Any) -> bool:
     return isinstance(p, _TerminalPacket)
 
 
+def _open_shared_memory(name: str) -> "shared_memory.SharedMemory":
+    """
+    Attach to an existing shared memory block without having the resource
+    tracker of this process take ownership of it, where supported.
+    """
+    try:
+        # python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore
+    except TypeError:
+        # Attaching registers the block with the resource tracker before
+        # python 3.13, which is balanced by the unregister in ``unlink``.
+        return shared_memory.SharedMemory(name=name)
+
+
+class _SharedArrayHandle (object):
+    """
+    Picklable reference to a copy of a numpy array in a shared memory block,
+    transported between processes in place of the array itself.
+
+    The process that receives a handle owns the shared memory block and must
+    either ``take`` or ``release`` it exactly once to free it.
+
+    :param arr: Array to copy into a new shared memory block.
+    """
+
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, arr: numpy.ndarray):
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        # The receiving process is responsible for unlinking the block, so do
+        # not let the resource tracker of this process claim it.
+        resource_tracker.unregister(shm._name, 'shared_memory')  # type: ignore
+        try:
+            numpy.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        finally:
+            shm.close()
+        self.name = shm.name
+        self.shape = arr.shape
+        self.dtype = arr.dtype
+
+    def __getstate__(self) -> tuple:
+        return self.name, self.shape, self.dtype
+
+    def __setstate__(self, state: tuple) -> None:
+        self.name, self.shape, self.dtype = state
+
+    def take(self) -> numpy.ndarray:
+        """
+        :return: Copy of the referenced array, freeing the shared memory block.
+        """
+        shm = _open_shared_memory(self.name)
+        try:
+            return numpy.ndarray(self.shape, self.dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def release(self) -> None:
+        """
+        Free the shared memory block without reading the referenced array.
+        """
+        shm = _open_shared_memory(self.name)
+        shm.close()
+        shm.unlink()
+
+
+def _to_shared(obj: Any, min_bytes: int) -> Any:
+    """
+    Replace numpy arrays of at least ``min_bytes`` size, either given or
+    within given tuples or lists, with shared memory handles.
+    """
+    if isinstance(obj, numpy.ndarray):
+        if obj.nbytes >= min_bytes and not obj.dtype.hasobject:
+            return _SharedArrayHandle(obj)
+    elif type(obj) in (tuple, list):
+        return type(obj)(_to_shared(o, min_bytes) for o in obj)
+    return obj
+
+
+def _from_shared(obj: Any) -> Any:
+    """
+    Replace shared memory handles, either given or within given tuples or
+    lists, with the arrays they reference.
+    """
+    if isinstance(obj, _SharedArrayHandle):
+        return obj.take()
+    elif type(obj) in (tuple, list):
+        return type(obj)(_from_shared(o) for o in obj)
+    return obj
+
+
+def _release_shared(obj: Any) -> None:
+    """
+    Free the shared memory of any handles, either given or within given tuples
+    or lists, that will not be received.
+    """
+    if isinstance(obj, _SharedArrayHandle):
+        obj.release()
+    elif type(obj) in (tuple, list):
+        for o in obj:
+            _release_shared(o)
+
+
 class ParallelResultsIterator (Iterator[T_co]):
     """
     Iterator return from a parallel mapping job, managing workers and output
@@ -265,11 +675,6 @@ class ParallelResultsIterator (Iterator[T_co]):
     :param is_multiprocessing: If workers are processes vs. threads. When
         this is true, extra steps are taken to appropriately shutdown
         processes.
-    :param heart_beat: How long in seconds we wait when polling for data on
-        the results queue before momentarily giving up to allow a cycle of
-        the loop. This is important in allowing an external signal to
-        indicate we should stop iterating (prevents hanging on getting the
-        next result value).
     :param work_queue: Queue into which work is placed by the feeder
         thread. This object is responsible for cleaning up this queue, if
         applicable, upon iteration termination.
@@ -282,6 +687,12 @@ class ParallelResultsIterator (Iterator[T_co]):
         to manage starting and stopping appropriately.
     :param daemon: If the managed threads/processes should be started as
         daemons.
+    :param uses_shared_memory: If work arguments and results may contain
+        shared memory array handles. When true, results are resolved into
+        arrays, and the shared memory of any arguments or results left in the
+        queues is freed upon clean-up.
+    :param auto_chunksize: If the chunk size of the feeder thread should be
+        adjusted based on the work times reported with chunk results.
     """
 
     def __init__(
@@ -289,12 +700,13 @@ class ParallelResultsIterator (Iterator[T_co]):
         name: Optional[str],
         ordered: bool,
         is_multiprocessing: bool,
-        heart_beat: float,
         work_queue: Union[queue.Queue, multiprocessing.Queue],
         results_queue: Union[queue.Queue, multiprocessing.Queue],
         feeder_thread: "_FeedQueueThread",
         workers: Sequence[Union["_WorkerThread", "_WorkerProcess"]],
-        daemon: bool
+        daemon: bool,
+        uses_shared_memory: bool = False,
+        auto_chunksize: bool = False
     ):
         self.name = name
         self._l_prefix: str = f"[PRI{(name and f'::{name}') or ''}]"
@@ -303,7 +715,6 @@ class ParallelResultsIterator (Iterator[T_co]):
         if self.ordered:
             LOG.debug(f"{self._l_prefix} Maintaining result iteration order "
                       f"based on input order")
-        self.heart_beat = heart_beat
         self.is_multiprocessing = is_multiprocessing
 
         self.work_queue = work_queue
@@ -311,13 +722,21 @@ class ParallelResultsIterator (Iterator[T_co]):
         self.feeder_thread = feeder_thread
         self.workers = workers
         self.daemon = daemon
+        self.uses_shared_memory = uses_shared_memory
+        self.auto_chunksize = auto_chunksize
 
         self.has_started_workers = False
         self.has_cleaned_up = False
 
         self.found_terminals = 0
+        self.received_chunks = 0
+        # Heap of (chunk index, chunk results) pairs when ordered.
         self.result_heap: List = []
         self.next_index = 0
+        # Results of the current chunk still to be yielded.
+        self.chunk_results: Deque = deque()
+        # Running estimate of work time per item, for automatic chunk sizing.
+        self.item_seconds: Optional[float] = None
 
         self.stop_event = threading.Event()
         self.stop_event_lock = threading.Lock()
@@ -344,41 +763,9 @@ class ParallelResultsIterator (Iterator[T_co]):
             if not self.has_started_workers:
                 self.start_workers()
 
-            while (self.found_terminals < len(self.workers) and
-                   not self.stopped()):
-                packet = self.results_q_get()
-
-                if _is_terminal(packet):
-                    LOG.log(1, f'{l_prefix} Found terminal')
-                    self.found_terminals += 1
-                elif isinstance(packet[0], BaseException):
-                    ex, formatted_exc = packet
-                    LOG.warning(f'{l_prefix} Received exception: '
-                                f'{ex}\n{formatted_exc}')
-                    raise ex
-                else:
-                    i, result = packet
-                    if self.ordered:
-                        heapq.heappush(self.result_heap, (i, result))
-                        if self.result_heap[0][0] == self.next_index:
-                            _, result = heapq.heappop(self.result_heap)
-                            self.next_index += 1
-                            return result
-                    else:
-                        return result
-
-            # Go through heap if there's anything in it
-            if self.result_heap:
-                _, result = heapq.heappop(self.result_heap)
-                return result
-
-            # Nothing left
-            if not self.stopped():
-                LOG.log(1, f"{l_prefix} Asserting empty queues on what looks "
-                           f"like a full iteration.")
-                self.assert_queues_empty()
-
-            raise StopIteration()
+            if not self.chunk_results:
+                self.chunk_results.extend(self._next_chunk())
+            return self.chunk_results.popleft()
 
         # If anything bad happens, stop iteration and workers.
         # - Using BaseException to also catch things like KeyboardInterrupt
@@ -393,6 +780,118 @@ class ParallelResultsIterator (Iterator[T_co]):
 
     next = __next__
 
+    def _next_chunk(self) -> List:
+        """
+        Get the next chunk of results to yield, in order if configured so.
+
+        :raises StopIteration: There are no more results.
+
+        :return: Non-empty list of results.
+        """
+        l_prefix = self._l_prefix
+        metrics = self.feeder_thread.metrics
+        while not self._received_all() and not self.stopped():
+            if metrics is None:
+                packet = self.results_q_get()
+            else:
+                start = time.perf_counter()
+                packet = self.results_q_get()
+                metrics.record_consumer_blocked(time.perf_counter() - start)
+
+            if _is_terminal(packet):
+                LOG.log(1, f'{l_prefix} Found terminal')
+                self._on_terminal(packet)
+            elif isinstance(packet[0], BaseException):
+                ex, formatted_exc = packet
+                LOG.warning(f'{l_prefix} Received exception: '
+                            f'{ex}\n{formatted_exc}')
+                raise ex
+            else:
+                i, results, work_seconds, idle_seconds, worker = packet
+                self.received_chunks += 1
+                self.feeder_thread.chunk_received()
+                if self.uses_shared_memory:
+                    results = _from_shared(results)
+                if self.auto_chunksize:
+                    self._update_chunksize(len(results), work_seconds)
+                if metrics is not None:
+                    metrics.record_completed(worker, len(results),
+                                             work_seconds, idle_seconds)
+                if self.ordered:
+                    heapq.heappush(self.result_heap, (i, results))
+                    if self.result_heap[0][0] == self.next_index:
+                        _, results = heapq.heappop(self.result_heap)
+                        self.next_index += 1
+                        self.feeder_thread.chunk_yielded()
+                    else:
+                        results = None
+                    if metrics is not None:
+                        metrics.record_reorder_heap_size(
+                            len(self.result_heap))
+                    if results is not None:
+                        return results
+                else:
+                    self.feeder_thread.chunk_yielded()
+                    return results
+
+        # Go through heap if there's anything in it
+        if self.result_heap:
+            _, results = heapq.heappop(self.result_heap)
+            self.feeder_thread.chunk_yielded()
+            if metrics is not None:
+                metrics.record_reorder_heap_size(len(self.result_heap))
+            return results
+
+        # Nothing left
+        if not self.stopped():
+            LOG.log(1, f"{l_prefix} Asserting empty queues on what looks "
+                       f"like a full iteration.")
+            self.assert_queues_empty()
+
+        raise StopIteration()
+
+    @property
+    def metrics(self) -> Optional[ParallelMapMetrics]:
+        """
+        :return: Metrics of this job if collected (see the ``collect_metrics``
+            option of ``parallel_map``), otherwise None.
+        """
+        return self.feeder_thread.metrics
+
+    def _received_all(self) -> bool:
+        """
+        :return: If all results of this iteration have been received.
+        """
+        return self.found_terminals >= len(self.workers)
+
+    def _on_terminal(self, packet: _TerminalPacket) -> None:
+        """
+        Account for a terminal packet received from the results queue.
+        """
+        self.found_terminals += 1
+
+    def _update_chunksize(self, n_items: int, work_seconds: float) -> None:
+        """
+        Update the per-item work time estimate with a worker's report for a
+        chunk and adjust the feeder's chunk size to aim for chunks taking
+        ``AUTO_CHUNK_TARGET_SECONDS`` of work.
+
+        :param n_items: Number of items in the reported chunk.
+        :param work_seconds: Time the worker spent in the work function for
+            the chunk.
+        """
+        sample = work_seconds / n_items
+        if self.item_seconds is None:
+            self.item_seconds = sample
+        else:
+            # Exponential moving average to smooth over noisy items.
+            self.item_seconds = 0.8 * self.item_seconds + 0.2 * sample
+        if self.item_seconds > 0:
+            size = int(AUTO_CHUNK_TARGET_SECONDS / self.item_seconds)
+        else:
+            size = AUTO_CHUNK_MAX_SIZE
+        self.feeder_thread.chunksize = max(1, min(AUTO_CHUNK_MAX_SIZE, size))
+
     def start_workers(self) -> None:
         """
         Start worker threads/processes.
@@ -421,10 +920,15 @@ class ParallelResultsIterator (Iterator[T_co]):
             self.feeder_thread.join()
 
             LOG.log(1, f"{l_prefix} Stopping workers")
-            for w in self.workers:
-                w.stop()
-                w.master_stop()
-                w.join()
+            _stop_workers(self.workers, self.work_queue)
+
+            if self.uses_shared_memory:
+                LOG.log(1, f"{l_prefix} Releasing unconsumed shared memory")
+                for q in (self.work_queue, self.results_queue):
+                    self._release_queued_shared(q)
+
+            # Wake up a consumer waiting for results in another thread.
+            self.results_queue.put(_StopPacket())
 
             if self.is_multiprocessing:
                 LOG.log(1, f"{l_prefix} Closing/Joining process queues")
@@ -435,6 +939,22 @@ class ParallelResultsIterator (Iterator[T_co]):
 
             self.has_cleaned_up = True
 
+    @staticmethod
+    def _release_queued_shared(
+        q: Union[queue.Queue, multiprocessing.Queue]
+    ) -> None:
+        """
+        Drain the given queue, freeing the shared memory of any array handles
+        in the drained packets.
+        """
+        while True:
+            try:
+                packet = q.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(packet, tuple):
+                _release_shared(packet[1])
+
     def stop(self) -> None:
         """
         Stop this iterator.
@@ -444,6 +964,10 @@ class ParallelResultsIterator (Iterator[T_co]):
         with self.stop_event_lock:
             self.stop_event.set()
             self.clean_up()
+        metrics = self.metrics
+        if metrics is not None and self.has_started_workers:
+            metrics.end()
+            LOG.debug(f"{self._l_prefix} Metrics: {metrics.summary()}")
 
     def stopped(self) -> bool:
         """
@@ -458,11 +982,10 @@ class ParallelResultsIterator (Iterator[T_co]):
         :raises StopIteration: when we've been told to stop.
         :returns: Single result from the results queue.
         """
-        while not self.stopped():
-            try:
-                return self.results_queue.get(timeout=self.heart_beat)
-            except queue.Empty:
-                pass
+        if not self.stopped():
+            packet = self.results_queue.get()
+            if not _is_stop(packet):
+                return packet
         raise StopIteration()
 
     def assert_queues_empty(self) -> None:
@@ -491,6 +1014,409 @@ class ParallelResultsIterator (Iterator[T_co]):
                 "Out queue not empty (%d)" % self.results_queue.qsize()
 
 
+class ParallelWorkerPool (object):
+    """
+    Persistent pool of worker threads or processes that ``parallel_map`` calls
+    may be bound to (see its ``pool`` option), keeping workers alive across
+    calls instead of starting and stopping new workers for every call.
+
+    Jobs mapped on a pool have the same result ordering and chunking options
+    as ``parallel_map``. Multiple jobs may be iterated concurrently, including
+    jobs that consume the results of other jobs on the same pool, with workers
+    serving work in the order it was fed. To keep concurrent jobs from
+    starving each other, the number of chunks of a job that have been fed but
+    whose results have not yet been consumed is limited to
+    ``2 * floor(C * F) + C``, matching the input look-ahead described for
+    ``parallel_map``, where ``C`` is the number of workers and ``F`` the buffer
+    factor.
+
+    Work functions are sent to workers when the iteration of a job starts.
+    With a process pool they must therefore be picklable (e.g. not lambda or
+    local functions), unlike with ``parallel_map`` without a pool where new
+    workers inherit them.
+
+    Workers are started on construction and stopped by ``close``, which is
+    also called when exiting a ``with`` block. Exceptions raised by a work
+    function are raised from the iteration of its job and do not affect the
+    workers or other jobs.
+
+    :param cores: Number of worker threads/processes. If None or not
+        positive, we use all available threads/cores.
+    :param use_multiprocessing: Whether or not to use discrete processes as the
+        parallelization agent vs python threads.
+    :param buffer_factor: Multiplier against the number of workers used to
+        limit the number of chunks of a job in flight.
+    :param name: Optional string name for identifying workers and logging
+        messages. This is also the default name of mapped jobs.
+    :param daemon: If started threads/processes are flagged as daemonic.
+    :param shared_memory_min_bytes: When using multiprocessing, transport
+        numpy arrays of at least this many bytes through shared memory blocks.
+        See ``parallel_map``.
+    """
+
+    def __init__(
+        self,
+        cores: Optional[int] = None,
+        use_multiprocessing: bool = False,
+        buffer_factor: float = 2.0,
+        name: Optional[str] = None,
+        daemon: bool = True,
+        shared_memory_min_bytes: Optional[int] = None
+    ):
+        if not use_multiprocessing:
+            shared_memory_min_bytes = None
+        elif shared_memory_min_bytes is not None and shared_memory is None:  # pragma: no cover
+            raise RuntimeError("Shared memory transport requires python 3.8+.")
+        if cores is None or cores <= 0:
+            cores = multiprocessing.cpu_count()
+
+        self.name = name
+        self._l_prefix: str = f"[Pool{(name and f'::{name}') or ''}]"
+        self.cores = cores
+        self.use_multiprocessing = use_multiprocessing
+        self.daemon = daemon
+        self.shm_min_bytes = shared_memory_min_bytes
+
+        queue_t: Union[Type[multiprocessing.Queue], Type[queue.Queue]]
+        worker_t: Type[Union[_WorkerThread, _WorkerProcess]]
+        if use_multiprocessing:
+            queue_t = multiprocessing.Queue
+            worker_t = _WorkerProcess
+        else:
+            queue_t = queue.Queue
+            worker_t = _WorkerThread
+
+        self.max_chunks_in_flight = _max_chunks_in_flight(cores,
+                                                          buffer_factor)
+        # Queues are not bounded themselves as the feeder threads of jobs
+        # limit the number of chunks in flight.
+        # Type ignoring these calls due to a mypy issue where it's deducing
+        # the type to `<nothing>` for some reason.
+        self._work_q = queue_t()  # type: ignore
+        self._results_q = queue_t()  # type: ignore
+        self._control_qs = [queue_t() for _ in range(cores)]  # type: ignore
+        self._workers = [
+            worker_t(name, i, None, self._work_q, self._results_q,
+                     self.shm_min_bytes, control_q)
+            for i, control_q in enumerate(self._control_qs)
+        ]
+
+        # Results queue and iterator of active jobs by job ID.
+        self._jobs: Dict[int, Tuple[queue.Queue, _PoolResultsIterator]] = {}
+        self._jobs_lock = threading.Lock()
+        self._next_job = 0
+        self._closed = False
+
+        LOG.debug(f"{self._l_prefix} Starting {cores} workers")
+        for w in self._workers:
+            w.daemon = daemon
+            w.start()
+        self._router = threading.Thread(target=self._route_results,
+                                        name=name, daemon=daemon)
+        self._router.start()
+
+    def __enter__(self) -> "ParallelWorkerPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        """
+        :return: If this pool has been closed.
+        """
+        return self._closed
+
+    def map(
+        self,
+        work_func: Callable[..., T_co],
+        *sequences: Iterable,
+        **kwargs: Any
+    ) -> "ParallelResultsIterator[T_co]":
+        """
+        Map a work function over input sequences with the workers of this
+        pool. Work starts when the returned iterator is first iterated.
+
+        See ``parallel_map`` for details. Only its ``fill_void``, ``ordered``,
+        ``name``, ``chunksize``, ``max_outstanding`` and ``collect_metrics``
+        options are supported here. Metrics of workers are indexed by their
+        position in this pool.
+
+        :param work_func: Function that performs some work on input data.
+        :param sequences: Input data to apply to ``work_func``.
+        :param kwargs: Job options as described above.
+
+        :raises RuntimeError: This pool has been closed.
+        :raises ValueError: An unsupported or invalid option was given.
+
+        :return: A new parallel results iterator for the job.
+        """
+        unsupported = set(kwargs) - {'fill_void', 'ordered', 'name',
+                                     'chunksize', 'max_outstanding',
+                                     'collect_metrics'}
+        if unsupported:
+            raise ValueError("Options not supported when mapping on a worker "
+                             "pool: {}".format(sorted(unsupported)))
+        if self._closed:
+            raise RuntimeError("Cannot map on a closed worker pool.")
+        chunksize, auto_chunksize = \
+            _resolve_chunksize(kwargs.get('chunksize', 1))
+        max_outstanding = kwargs.get('max_outstanding', None)
+        _check_max_outstanding(max_outstanding)
+
+        work_payload: Union[Callable, bytes] = work_func
+        if self.use_multiprocessing:
+            # Pickle now so that an unpicklable function fails here instead of
+            # in the background thread of the control queues.
+            work_payload = bytes(ForkingPickler.dumps(work_func))
+
+        name = kwargs.get('name', self.name)
+        results_q: queue.Queue = queue.Queue()
+        feeder_thread = _FeedQueueThread(
+            name, sequences, self._work_q, 0, 'fill_void' in kwargs,
+            kwargs.get('fill_void', None), self.max_chunks_in_flight,
+            self.shm_min_bytes, chunksize, results_q, max_outstanding,
+            (ParallelMapMetrics(len(self._workers))
+             if kwargs.get('collect_metrics', False) else None)
+        )
+        return _PoolResultsIterator(self, work_payload, name,
+                                    kwargs.get('ordered', True), results_q,
+                                    feeder_thread, auto_chunksize)
+
+    def _register_job(
+        self,
+        it: "_PoolResultsIterator",
+        work_payload: Union[Callable, bytes]
+    ) -> int:
+        """
+        Register a starting job, sending its work function to all workers.
+
+        :raises RuntimeError: This pool has been closed.
+
+        :return: ID of the job.
+        """
+        with self._jobs_lock:
+            if self._closed:
+                raise RuntimeError("Cannot map on a closed worker pool.")
+            job = self._next_job
+            self._next_job += 1
+            self._jobs[job] = (it.results_queue, it)
+            for q in self._control_qs:
+                q.put((job, work_payload))
+        return job
+
+    def _unregister_job(self, job: int) -> None:
+        """
+        Unregister an ended job, dropping any of its results still to arrive
+        and letting workers skip any of its queued work.
+        """
+        with self._jobs_lock:
+            self._jobs.pop(job, None)
+            if not self._closed:
+                for q in self._control_qs:
+                    q.put((job, None))
+
+    def _route_results(self) -> None:
+        """
+        Move result packets from workers into the results queues of their
+        jobs, dropping those of jobs that have ended.
+        """
+        while True:
+            packet = self._results_q.get()
+            if _is_stop(packet):
+                return
+            job, payload = packet
+            with self._jobs_lock:
+                job_entry = self._jobs.get(job)
+                if job_entry is not None:
+                    job_entry[0].put(payload)
+                    continue
+            if (self.shm_min_bytes is not None and
+                    not isinstance(payload[0], BaseException)):
+                _release_shared(payload[1])
+
+    def close(self) -> None:
+        """
+        Stop any running jobs and the workers of this pool.
+
+        Subsequent ``map`` calls, or starting the iteration of jobs already
+        mapped, raise a ``RuntimeError``. This does nothing if this pool has
+        already been closed.
+        """
+        with self._jobs_lock:
+            if self._closed:
+                return
+            self._closed = True
+            iterators = [it for _, it in self._jobs.values()]
+        l_prefix = self._l_prefix
+        LOG.log(1, f"{l_prefix} Stopping {len(iterators)} running jobs")
+        for it in iterators:
+            it.stop()
+
+        LOG.log(1, f"{l_prefix} Stopping workers")
+        _stop_workers(self._workers, self._work_q)
+        self._results_q.put(_StopPacket())
+        self._router.join()
+
+        if self.shm_min_bytes is not None:
+            LOG.log(1, f"{l_prefix} Releasing unconsumed shared memory")
+            for q, get_shared in (
+                # Work packets are (job, index, chunk) triples.
+                (self._work_q, lambda p: p[2]),
+                # Result packets are (job, payload) pairs, payloads being
+                # (index, results, work_seconds, idle_seconds, worker) or
+                # (exception, traceback).
+                (self._results_q,
+                 lambda p: (None if isinstance(p[1][0], BaseException)
+                            else p[1][1])),
+            ):
+                while True:
+                    try:
+                        packet = q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(packet, tuple):
+                        _release_shared(get_shared(packet))
+
+        if self.use_multiprocessing:
+            LOG.log(1, f"{l_prefix} Closing/Joining process queues")
+            for q in self._control_qs:
+                assert isinstance(q, multiprocessing.queues.Queue)
+                # Unread work functions may not fit in the pipe and are not
+                # needed anymore.
+                q.cancel_join_thread()
+                q.close()
+            for q in (self._work_q, self._results_q):
+                assert isinstance(q, multiprocessing.queues.Queue)
+                q.close()
+                q.join_thread()
+
+
+def close_worker_pools(pools: MutableMapping[Any, ParallelWorkerPool]) -> None:
+    """
+    Close all worker pools of the given mapping, removing them from it.
+
+    This is suitable as a ``weakref.finalize`` callback of objects lazily
+    creating pools, as it does not reference the object itself.
+
+    :param pools: Mapping of worker pools to close.
+    """
+    while pools:
+        _, pool = pools.popitem()
+        pool.close()
+
+
+class _PoolResultsIterator (ParallelResultsIterator[T_co]):
+    """
+    Results iterator of a job mapped on a ``ParallelWorkerPool``, managing the
+    registration of the job with the pool and the job's feeder thread.
+
+    :param pool: Pool the job is mapped on.
+    :param work_payload: Work function, pickled if the pool uses processes.
+    :param name: String name to attribute to this iterator. May be None.
+    :param ordered: If results should be yielded in input order.
+    :param results_queue: Queue the pool puts results of the job into.
+    :param feeder_thread: Thread feeding work of the job into the pool.
+    :param auto_chunksize: If the chunk size of the feeder thread should be
+        adjusted based on reported work times.
+    """
+
+    def __init__(
+        self,
+        pool: ParallelWorkerPool,
+        work_payload: Union[Callable, bytes],
+        name: Optional[str],
+        ordered: bool,
+        results_queue: queue.Queue,
+        feeder_thread: "_FeedQueueThread",
+        auto_chunksize: bool
+    ):
+        super().__init__(name, ordered, pool.use_multiprocessing,
+                         pool._work_q, results_queue,
+                         feeder_thread, pool._workers, pool.daemon,
+                         pool.shm_min_bytes is not None, auto_chunksize)
+        self.pool = pool
+        self.work_payload = work_payload
+        self.job: Optional[int] = None
+        # Number of chunks fed, known once feeding has finished.
+        self.expected_chunks: Optional[int] = None
+
+    def start_workers(self) -> None:
+        """
+        Register the job with the pool, whose workers are already running,
+        and start feeding work.
+        """
+        self.job = self.pool._register_job(self, self.work_payload)
+        LOG.log(1, f"{self._l_prefix} Starting feeder thread of job "
+                   f"{self.job}")
+        self.feeder_thread.job = self.job
+        self.feeder_thread.daemon = self.daemon
+        self.feeder_thread.start()
+        self.has_started_workers = True
+
+    def clean_up(self) -> None:
+        """
+        Stop feeding work and unregister the job from the pool if we haven't
+        done so already. Pool workers are left running.
+        """
+        if self.has_started_workers and not self.has_cleaned_up:
+            l_prefix = self._l_prefix
+
+            LOG.log(1, f"{l_prefix} Stopping feeder thread")
+            self.feeder_thread.stop()
+            self.feeder_thread.master_stop()
+            self.feeder_thread.join()
+
+            assert self.job is not None
+            self.pool._unregister_job(self.job)
+            if self.uses_shared_memory:
+                LOG.log(1, f"{l_prefix} Releasing unconsumed shared memory")
+                self._release_queued_shared(self.results_queue)
+
+            # Wake up a consumer waiting for results in another thread.
+            self.results_queue.put(_StopPacket())
+
+            self.has_cleaned_up = True
+
+    def _received_all(self) -> bool:
+        return (self.expected_chunks is not None and
+                self.received_chunks >= self.expected_chunks)
+
+    def _on_terminal(self, packet: _TerminalPacket) -> None:
+        self.expected_chunks = packet.n_chunks
+
+    def assert_queues_empty(self) -> None:
+        # The work queue of the pool is shared with other jobs.
+        assert self.results_queue.qsize() == 0, \
+            "Out queue not empty (%d)" % self.results_queue.qsize()
+
+
+def _stop_workers(
+    workers: Sequence[Union["_WorkerThread", "_WorkerProcess"]],
+    work_queue: Union[queue.Queue, multiprocessing.Queue]
+) -> None:
+    """
+    Stop and join workers, waking up those waiting for work with a stop
+    message each.
+
+    :param workers: Workers to stop.
+    :param work_queue: Queue the workers get work from.
+    """
+    for w in workers:
+        w.stop()
+    for _ in workers:
+        work_queue.put(_StopPacket())
+    for w in workers:
+        w.master_stop()
+        w.join()
+
+
 class _FeedQueueThread (threading.Thread):
     """
     Helper thread for putting data into the work queue
@@ -503,9 +1429,14 @@ class _FeedQueueThread (threading.Thread):
         arg_sequences: Sequence[Iterable],
         q: Union[queue.Queue, multiprocessing.Queue],
         num_terminal_packets: int,
-        heart_beat: float,
         do_fill: bool,
-        fill_value: Any
+        fill_value: Any,
+        max_chunks_in_flight: int,
+        shm_min_bytes: Optional[int] = None,
+        chunksize: int = 1,
+        results_q: Optional[queue.Queue] = None,
+        max_outstanding: Optional[int] = None,
+        metrics: Optional[ParallelMapMetrics] = None
     ):
         """
         :param name: Optional name for this feed queue thread.
@@ -517,14 +1448,28 @@ class _FeedQueueThread (threading.Thread):
         :param num_terminal_packets: Number of terminal packets to put into the
             work queue upon completion of submitting real work. This should be
             the same number of workers feeding off of `q`.
-        :param heart_beat: How long in seconds we wait for an individual put
-            attempt into `q` before momentarily giving up to allow a cycle of
-            the loop. This is important in allowing an external signal to
-            indicate we should stop feeding efforts (prevents hanging on
-            pushing values into `q`).
         :param do_fill: If we should fill in a certain value for the shorter
             input sequences along the same rules for `itertools.zip_longest`.
         :param fill_value: The value to fill with if `do_fill` is True.
+        :param max_chunks_in_flight: Maximum number of chunks put into `q`
+            whose results have not yet been received (see
+            ``chunk_received``). This bounds the size of the work and result
+            queues.
+        :param shm_min_bytes: If not None, transport numpy array arguments of
+            at least this many bytes through shared memory.
+        :param chunksize: Number of work argument sets to put into `q` as one
+            chunk. This may be changed while running.
+        :param results_q: If given, work is fed for a job of a
+            ``ParallelWorkerPool``: work packets are tagged with the ``job``
+            attribute, which must be set before starting, and instead of
+            putting terminal packets into `q` for workers to pass along, a
+            single terminal packet carrying the number of chunks fed, or an
+            exception packet, is put directly into this queue.
+        :param max_outstanding: If not None, the maximum number of chunks put
+            into `q` whose results have not yet been yielded (see
+            ``chunk_yielded``). This bounds the results held out of order by
+            an ordered results iterator.
+        :param metrics: Optional metrics of the job to record fed chunks in.
         """
         super().__init__(name=name)
         self._l_prefix: str = f"[FQT{(name and f'::{name}') or ''}]"
@@ -532,9 +1477,17 @@ class _FeedQueueThread (threading.Thread):
         self.arg_sequences = arg_sequences
         self.q = q
         self.num_terminal_packets = num_terminal_packets
-        self.heart_beat = heart_beat
         self.do_fill = do_fill
         self.fill_value = fill_value
+        self.shm_min_bytes = shm_min_bytes
+        self.chunksize = chunksize
+        self.chunk_slots = threading.Semaphore(max_chunks_in_flight)
+        self.outstanding_slots: Optional[threading.Semaphore] = None
+        if max_outstanding is not None:
+            self.outstanding_slots = threading.Semaphore(max_outstanding)
+        self.results_q = results_q
+        self.metrics = metrics
+        self.job: Optional[int] = None
 
         self._stop_event = threading.Event()
         # Event marking actual close of the thread.
@@ -544,6 +1497,10 @@ class _FeedQueueThread (threading.Thread):
 
     def stop(self) -> None:
         self._stop_event.set()
+        # Wake up if waiting for a chunk slot.
+        self.chunk_slots.release()
+        if self.outstanding_slots is not None:
+            self.outstanding_slots.release()
 
     def master_stop(self) -> None:
         """ Actually flag the thread for runtime completion. """
@@ -552,9 +1509,39 @@ class _FeedQueueThread (threading.Thread):
     def stopped(self) -> bool:
         return self._stop_event.is_set()
 
+    def chunk_received(self) -> None:
+        """
+        Mark the results of a chunk as received, allowing another chunk to be
+        fed.
+        """
+        self.chunk_slots.release()
+
+    def chunk_yielded(self) -> None:
+        """
+        Mark the results of a chunk as yielded, allowing another chunk to be
+        fed if ``max_outstanding`` was given.
+        """
+        if self.outstanding_slots is not None:
+            self.outstanding_slots.release()
+
+    def _acquire_chunk_slot(self) -> bool:
+        """
+        Wait until another chunk may be fed, or the stop signal was given.
+
+        :return: If another chunk may be fed.
+        """
+        if self.outstanding_slots is not None:
+            self.outstanding_slots.acquire()
+            if self.stopped():
+                return False
+        self.chunk_slots.acquire()
+        return not self.stopped()
+
     def run(self) -> None:
         l_prefix = self._l_prefix
         LOG.log(1, f"{l_prefix} Starting")
+        if self.metrics is not None:
+            self.metrics.start()
 
         if self.do_fill:
             _zip = zip_longest
@@ -568,23 +1555,50 @@ class _FeedQueueThread (threading.Thread):
 
         try:
             r = 0
-            for args in _zip(*self.arg_sequences, **_zip_kwds):
-                self.q_put((r, args))
+            args_iter = _zip(*self.arg_sequences, **_zip_kwds)
+            chunk = list(islice(args_iter, self.chunksize))
+            metrics = self.metrics
+            while chunk:
+                if metrics is None:
+                    if not self._acquire_chunk_slot():
+                        break
+                else:
+                    start = time.perf_counter()
+                    if not self._acquire_chunk_slot():
+                        break
+                    metrics.record_fed(len(chunk),
+                                       time.perf_counter() - start)
+                if self.shm_min_bytes is not None:
+                    chunk = _to_shared(chunk, self.shm_min_bytes)
+                if self.results_q is None:
+                    self.q.put((r, chunk))
+                else:
+                    self.q.put((self.job, r, chunk))
                 r += 1
 
                 # If we're told to stop, immediately quit out of processing
                 if self.stopped():
                     LOG.log(1, f"{l_prefix} Told to stop prematurely")
                     break
+                chunk = list(islice(args_iter, self.chunksize))
         # Transport back any exceptions raised
         except (Exception, KeyboardInterrupt) as ex:
             LOG.warning(f"{l_prefix} Caught exception {str(ex)}")
-            self.q_put((ex, traceback.format_exc()))
+            if self.results_q is None:
+                self.q.put((ex, traceback.format_exc()))
+            else:
+                self.results_q.put((ex, traceback.format_exc()))
             self.stop()
         else:
-            LOG.log(1, f"{l_prefix} Sending in-queue terminal packets")
-            for _ in range(self.num_terminal_packets):
-                self.q_put(_TerminalPacket())
+            if self.stopped():
+                pass
+            elif self.results_q is not None:
+                LOG.log(1, f"{l_prefix} Sending job terminal packet")
+                self.results_q.put(_TerminalPacket(r))
+            else:
+                LOG.log(1, f"{l_prefix} Sending in-queue terminal packets")
+                for _ in range(self.num_terminal_packets):
+                    self.q.put(_TerminalPacket())
         finally:
             # Explicitly stop any nested parallel maps
             for s in self.arg_sequences:
@@ -598,21 +1612,6 @@ class _FeedQueueThread (threading.Thread):
 
             LOG.log(1, f"{l_prefix} Closing")
 
-    def q_put(self, val: Any) -> None:
-        """
-        Try to put the given value into the output queue until it is inserted
-        (if it was previously full), or the stop signal was given.
-
-        :param val: value to put into the output queue.
-        """
-        put = False
-        while not put and not self.stopped():
-            try:
-                self.q.put(val, timeout=self.heart_beat)
-                put = True
-            except queue.Full:
-                pass
-
 
 class _Worker(metaclass=abc.ABCMeta):
 
@@ -620,10 +1619,11 @@ class _Worker(metaclass=abc.ABCMeta):
         self,
         name: Optional[str],
         i: int,
-        work_function: Callable,
+        work_function: Optional[Callable],
         in_q: Union[queue.Queue, multiprocessing.Queue],
         out_q: Union[queue.Queue, multiprocessing.Queue],
-        heart_beat: float
+        shm_min_bytes: Optional[int] = None,
+        control_q: Optional[Union[queue.Queue, multiprocessing.Queue]] = None
     ):
         """
         Individual worker agent.
@@ -632,15 +1632,18 @@ class _Worker(metaclass=abc.ABCMeta):
         :param i: The integer index, >= 0, of this worker among active workers
             for this parallel iteration task.
         :param work_function: Callable function to invoke which generates some
-            result value.
+            result value. This is None for persistent pool workers.
         :param in_q: Queue to draw work function input parameters from.
         :param out_q: Queue to output work results, or triggered exceptions,
             to.
-        :param heart_beat: How long in seconds we wait when polling for data on
-            the `in_q`, as well as for result put attempts into `out_q`, before
-            momentarily giving up to allow a cycle of the loop. This is
-            important in allowing an external signal to indicate we should stop
-            working (prevents hanging on queue interactions).
+        :param shm_min_bytes: If not None, input packets may contain shared
+            memory array handles, and numpy array results of at least this
+            many bytes are transported through shared memory.
+        :param control_q: If given, this worker is a persistent member of a
+            ``ParallelWorkerPool``, serving work of many jobs until stopped.
+            Work functions of jobs are received from this queue as
+            ``(job, function)`` pairs, where a ``None`` function marks the end
+            of a job. ``work_function`` is not used in this case.
         """
         self._l_prefix: str = f"[Worker{(name and f'::{name}') or ''}::#{int(i)}]"
 
@@ -648,7 +1651,8 @@ class _Worker(metaclass=abc.ABCMeta):
         self.work_function = work_function
         self.in_q = in_q
         self.out_q = out_q
-        self.heart_beat = heart_beat
+        self.shm_min_bytes = shm_min_bytes
+        self.control_q = control_q
         LOG.log(1, f"{self._l_prefix} Making process worker ({str(in_q)}, {str(out_q)})")
 
         self._stop_event = self._make_event()
@@ -680,27 +1684,47 @@ class _Worker(metaclass=abc.ABCMeta):
         """
         Perform work function on available data in the input queue.
         """
+        if self.control_q is not None:
+            self._run_persistent()
+            return
         l_prefix = self._l_prefix
+        work_function = self.work_function
+        assert work_function is not None
         try:
-            packet = self.q_get()
-            while not self.stopped():
-                if _is_terminal(packet):
+            while True:
+                # Blocks until work arrives or a stop packet wakes us up.
+                idle_start = time.perf_counter()
+                packet = self.in_q.get()
+                if _is_stop(packet) or self.stopped():
+                    if self.shm_min_bytes is not None and \
+                            isinstance(packet, tuple) and len(packet) == 2 \
+                            and isinstance(packet[1], list):
+                        _release_shared(packet[1])
+                    break
+                elif _is_terminal(packet):
                     LOG.log(1, f"{l_prefix} sending terminal")
-                    self.q_put(packet)
+                    self.out_q.put(packet)
                     self.stop()
+                    break
                 elif isinstance(packet[0], Exception):
                     # Pass exception along
-                    self.q_put(packet)
+                    self.out_q.put(packet)
                     self.stop()
-                else:
-                    i, args = packet
-                    result = self.work_function(*args)
-                    self.q_put((i, result))
-                    packet = self.q_get()
+                    break
+                i, chunk = packet
+                if self.shm_min_bytes is not None:
+                    chunk = _from_shared(chunk)
+                start = time.perf_counter()
+                results = [work_function(*args) for args in chunk]
+                work_seconds = time.perf_counter() - start
+                if self.shm_min_bytes is not None:
+                    results = _to_shared(results, self.shm_min_bytes)
+                self.out_q.put((i, results, work_seconds,
+                                start - idle_start, self.i))
         # Transport back any exceptions raised
         except (Exception, KeyboardInterrupt) as ex:
             LOG.warning(f"{l_prefix} Caught exception {type(ex)}")
-            self.q_put((ex, traceback.format_exc()))
+            self.out_q.put((ex, traceback.format_exc()))
             self.stop()
         except BaseException as ex:
             # Some exotic error occurred (can only be systemExit at this
@@ -713,34 +1737,89 @@ class _Worker(metaclass=abc.ABCMeta):
             self._master_stop_event.wait()
             LOG.log(1, f"{l_prefix} Closing")
 
-    def q_get(self) -> Any:
+    def _run_persistent(self) -> None:
         """
-        Try to get a value from the queue while keeping an eye out for an exit
-        request.
-
-        :return: next value on the input queue
+        Perform the work functions of pool jobs on available data in the input
+        queue until stopped.
+
+        Input packets are ``(job, index, chunk)`` triples and results are put
+        as ``(job, (index, results, work_seconds, idle_seconds, worker))``
+        pairs. Exceptions raised by a work function are put as
+        ``(job, (exception, traceback))`` pairs and do not stop this worker.
+        Packets of jobs that have ended are skipped.
         """
-        while not self.stopped():
+        l_prefix = self._l_prefix
+        control_q = self.control_q
+        assert control_q is not None
+        functions: Dict[int, Callable] = {}
+        # Highest job ID received on the control queue. Jobs are registered in
+        # increasing ID order, so a job at or below this without a function
+        # has ended.
+        max_job = -1
+
+        def read_control(block: bool) -> bool:
+            """ Read one control message, returning if one was read. """
+            nonlocal max_job
             try:
-                return self.in_q.get(timeout=self.heart_beat)
+                job, fn = control_q.get(block=block)
             except queue.Empty:
-                pass
-
-    def q_put(self, val: Any) -> None:
-        """
-        Try to put the given value into the output queue while keeping an eye
-        out for an exit request.
-
-        :param val: value to put into the output queue.
+                return False
+            if fn is None:
+                functions.pop(job, None)
+            else:
+                if isinstance(fn, bytes):
+                    # Pickled up-front by the pool for transport to processes.
+                    fn = pickle.loads(fn)
+                functions[job] = fn
+            max_job = max(max_job, job)
+            return True
 
-        """
-        put = False
-        while not put and not self.stopped():
-            try:
-                self.out_q.put(val, timeout=self.heart_beat)
-                put = True
-            except queue.Full:
-                pass
+        try:
+            while True:
+                # Blocks until work arrives or a stop packet wakes us up.
+                idle_start = time.perf_counter()
+                packet = self.in_q.get()
+                if _is_stop(packet) or self.stopped():
+                    if self.shm_min_bytes is not None and \
+                            isinstance(packet, tuple):
+                        _release_shared(packet[2])
+                    break
+                job, i, chunk = packet
+                # Pick up ended jobs so their queued work may be skipped.
+                while not control_q.empty() and read_control(False):
+                    pass
+                while job > max_job:
+                    read_control(True)
+                fn = functions.get(job)
+                if fn is None:
+                    LOG.log(1, f"{l_prefix} Skipping work of ended job {job}")
+                    if self.shm_min_bytes is not None:
+                        _release_shared(chunk)
+                    continue
+
+                try:
+                    if self.shm_min_bytes is not None:
+                        chunk = _from_shared(chunk)
+                    start = time.perf_counter()
+                    results = [fn(*args) for args in chunk]
+                    work_seconds = time.perf_counter() - start
+                    if self.shm_min_bytes is not None:
+                        results = _to_shared(results, self.shm_min_bytes)
+                except Exception as ex:
+                    LOG.warning(f"{l_prefix} Caught exception {type(ex)} "
+                                f"in job {job}")
+                    self.out_q.put((job, (ex, traceback.format_exc())))
+                    continue
+                self.out_q.put((job, (i, results, work_seconds,
+                                      start - idle_start, self.i)))
+        except BaseException as ex:
+            LOG.log(1, f"{l_prefix} Exotic error {type(ex)}: {ex}")
+            self.stop()
+            raise
+        finally:
+            LOG.log(1, f"{l_prefix} Waiting for master stop...")
+            self._master_stop_event.wait()
+            LOG.log(1, f"{l_prefix} Closing")
 
 
 class _WorkerProcess (_Worker, multiprocessing.Process):
@@ -749,10 +1828,11 @@ class _WorkerProcess (_Worker, multiprocessing.Process):
         self,
         name: Optional[str],
         i: int,
-        work_function: Callable,
+        work_function: Optional[Callable],
         in_q: Union[queue.Queue, multiprocessing.Queue],
         out_q: Union[queue.Queue, multiprocessing.Queue],
-        heart_beat: float
+        shm_min_bytes: Optional[int] = None,
+        control_q: Optional[Union[queue.Queue, multiprocessing.Queue]] = None
     ):
         """
         Constructor override to include multiprocessing.Process constructor
@@ -760,7 +1840,8 @@ class _WorkerProcess (_Worker, multiprocessing.Process):
         documentation.
         """
         multiprocessing.Process.__init__(self)
-        _Worker.__init__(self, name, i, work_function, in_q, out_q, heart_beat)
+        _Worker.__init__(self, name, i, work_function, in_q, out_q,
+                         shm_min_bytes, control_q)
 
     @classmethod
     def _make_event(cls) -> multiprocessing.synchronize.Event:
@@ -778,10 +1859,11 @@ class _WorkerThread (_Worker, threading.Thread):
         self,
         name: Optional[str],
         i: int,
-        work_function: Callable,
+        work_function: Optional[Callable],
         in_q: Union[queue.Queue, multiprocessing.Queue],
         out_q: Union[queue.Queue, multiprocessing.Queue],
-        heart_beat: float
+        shm_min_bytes: Optional[int] = None,
+        control_q: Optional[Union[queue.Queue, multiprocessing.Queue]] = None
     ):
         """
         Constructor override to include threading.Thread constructor super
@@ -789,7 +1871,8 @@ class _WorkerThread (_Worker, threading.Thread):
         documentation.
         """
         threading.Thread.__init__(self)
-        _Worker.__init__(self, name, i, work_function, in_q, out_q, heart_beat)
+        _Worker.__init__(self, name, i, work_function, in_q, out_q,
+                         shm_min_bytes, control_q)
 
     @classmethod
     def _make_event(cls) -> threading.Event:
@@ -0,0 +1,171 @@
+from collections import deque
+import logging
+import threading
+from types import TracebackType
+from typing import Deque, List, Optional, Sequence, Tuple, Type
+
+import numpy
+
+from smqtk_descriptors import DescriptorElement
+
+
+LOG = logging.getLogger(__name__)
+
+
+class WriteBehindVectorWriter (object):
+    """
+    Bounded background writer that stores batches of descriptor vectors via
+    :meth:`DescriptorElement.set_many_vectors` on a separate thread.
+
+    This allows the producer of vectors to continue working while previous
+    batches are being written to slow storage backends. Back-pressure is
+    applied by blocking ``submit`` while the total size of submitted but not
+    yet written vectors would exceed ``max_outstanding_bytes``. A single batch
+    larger than this limit is still accepted when nothing else is outstanding.
+
+    If writing a batch fails, queued batches are discarded and the exception
+    is raised from the next call to ``submit``, ``flush`` or ``close``.
+
+    Example::
+
+        with WriteBehindVectorWriter(64 * 2**20) as writer:
+            for descrs, vecs in batches:
+                writer.submit(descrs, vecs)
+
+    :param max_outstanding_bytes: Maximum number of vector bytes submitted but
+        not yet written.
+    :param name: Optional name for the writer thread.
+
+    :raises ValueError: ``max_outstanding_bytes`` was not positive.
+    """
+
+    def __init__(self, max_outstanding_bytes: int, name: Optional[str] = None):
+        if max_outstanding_bytes < 1:
+            raise ValueError("Maximum outstanding bytes must be a positive "
+                             "integer (given {}).".format(max_outstanding_bytes))
+        self.max_outstanding_bytes = max_outstanding_bytes
+
+        self._cond = threading.Condition()
+        self._queue: Deque[Tuple[List[DescriptorElement], List[numpy.ndarray], int]] = deque()
+        # Number of bytes queued or being written.
+        self._outstanding_bytes = 0
+        # Number of batches queued or being written.
+        self._outstanding_batches = 0
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name=name,
+                                        daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "WriteBehindVectorWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType]
+    ) -> None:
+        self.close()
+
+    @property
+    def outstanding_bytes(self) -> int:
+        """
+        :return: Number of vector bytes submitted but not yet written.
+        """
+        with self._cond:
+            return self._outstanding_bytes
+
+    def _run(self) -> None:
+        """
+        Writer thread loop.
+        """
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._queue and not self._closed:
+                    cond.wait()
+                if not self._queue:
+                    return
+                descrs, vecs, n_bytes = self._queue.popleft()
+            try:
+                DescriptorElement.set_many_vectors(descrs, vecs)
+            except BaseException as ex:
+                LOG.error("Failed to write {} vectors in the background: {}"
+                          .format(len(descrs), ex))
+                with cond:
+                    self._error = ex
+                    # Discard everything still queued since we will not be
+                    # writing it.
+                    for _, _, b in self._queue:
+                        self._outstanding_bytes -= b
+                        self._outstanding_batches -= 1
+                    self._queue.clear()
+            with cond:
+                self._outstanding_bytes -= n_bytes
+                self._outstanding_batches -= 1
+                cond.notify_all()
+
+    def _raise_error(self) -> None:
+        """
+        Raise the background write error, if there was one.
+        Must be called while holding the condition lock.
+        """
+        if self._error is not None:
+            raise self._error
+
+    def submit(
+        self,
+        descriptors: Sequence[DescriptorElement],
+        vectors: Sequence[numpy.ndarray]
+    ) -> None:
+        """
+        Queue vectors to be set to descriptors in the background, blocking
+        while the outstanding byte limit would be exceeded.
+
+        :param descriptors: Descriptors to set vectors of.
+        :param vectors: New vectors, parallel to ``descriptors``.
+
+        :raises RuntimeError: This writer has been closed.
+        :raises BaseException: A previous background write failed.
+        """
+        descrs = list(descriptors)
+        vecs = list(vectors)
+        n_bytes = sum(numpy.asarray(v).nbytes for v in vecs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed writer.")
+            while (self._error is None and self._outstanding_batches
+                   and self._outstanding_bytes + n_bytes
+                   > self.max_outstanding_bytes):
+                self._cond.wait()
+            self._raise_error()
+            self._queue.append((descrs, vecs, n_bytes))
+            self._outstanding_bytes += n_bytes
+            self._outstanding_batches += 1
+            self._cond.notify_all()
+
+    def flush(self) -> None:
+        """
+        Block until all submitted vectors have been written.
+
+        :raises BaseException: A background write failed.
+        """
+        with self._cond:
+            while self._outstanding_batches and self._error is None:
+                self._cond.wait()
+            self._raise_error()
+
+    def close(self) -> None:
+        """
+        Write all submitted vectors and stop the writer thread.
+
+        :raises BaseException: A background write failed.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            self._raise_error()
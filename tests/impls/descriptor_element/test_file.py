@@ -1,8 +1,11 @@
+import os
 import pickle
+import tempfile
 import unittest.mock as mock
 import unittest
 
 import numpy
+import pytest
 
 from smqtk_core.configuration import configuration_test_helper
 from smqtk_descriptors.impls.descriptor_element.file import DescriptorFileElement
@@ -14,11 +17,18 @@ class TestDescriptorFileElement (unittest.TestCase):
         """ Test instance standard configuration """
         inst = DescriptorFileElement('abcd',
                                      save_dir='/some/path/somewhere',
-                                     subdir_split=4)
+                                     subdir_split=4,
+                                     mmap_mode='r')
         for i in configuration_test_helper(inst, {'uuid'},
                                            ('abcd',)):
             assert i._save_dir == '/some/path/somewhere'
             assert i._subdir_split == 4
+            assert i._mmap_mode == 'r'
+
+    def test_invalid_mmap_mode(self) -> None:
+        """ Test that writable memory-map modes are rejected. """
+        with pytest.raises(ValueError, match="Invalid mmap_mode"):
+            DescriptorFileElement('abcd', '/base', mmap_mode='r+')
 
     def test_vec_filepath_generation(self) -> None:
         d = DescriptorFileElement('abcd', '/base', 4)
@@ -57,10 +67,15 @@ class TestDescriptorFileElement (unittest.TestCase):
         self.assertEqual(e1._save_dir, e2._save_dir)
         self.assertEqual(e1._subdir_split, e2._subdir_split)
         self.assertEqual(e1._vec_filepath, e2._vec_filepath)
+        self.assertEqual(e1._mmap_mode, e2._mmap_mode)
 
+    @mock.patch('smqtk_descriptors.impls.descriptor_element.file.os.replace')
+    @mock.patch('smqtk_descriptors.impls.descriptor_element.file.open',
+                create=True)
     @mock.patch('smqtk_descriptors.impls.descriptor_element.file.numpy.save')
     @mock.patch('smqtk_descriptors.impls.descriptor_element.file.safe_create_dir')
-    def test_vector_set(self, mock_scd: mock.MagicMock, mock_save: mock.MagicMock) -> None:
+    def test_vector_set(self, mock_scd: mock.MagicMock, mock_save: mock.MagicMock,
+                        mock_open: mock.MagicMock, mock_replace: mock.MagicMock) -> None:
         d = DescriptorFileElement(1234, '/base', 4)
         self.assertEqual(d._vec_filepath,
                          '/base/1/2/3/1234.vector.npy')
@@ -68,7 +83,14 @@ class TestDescriptorFileElement (unittest.TestCase):
         v = numpy.zeros(16)
         d.set_vector(v)
         mock_scd.assert_called_with('/base/1/2/3')
-        mock_save.assert_called_with('/base/1/2/3/1234.vector.npy', v)
+        # Saved to a temporary file that then replaces the vector file.
+        tmp_fp = mock_open.call_args[0][0]
+        assert tmp_fp.startswith('/base/1/2/3/1234.vector.npy.')
+        mock_save.assert_called_with(
+            mock_open.return_value.__enter__.return_value, v
+        )
+        mock_replace.assert_called_once_with(tmp_fp,
+                                             '/base/1/2/3/1234.vector.npy')
 
     @mock.patch('smqtk_descriptors.impls.descriptor_element.file.numpy.load')
     def test_vector_get(self, mock_load: mock.MagicMock) -> None:
@@ -82,3 +104,64 @@ class TestDescriptorFileElement (unittest.TestCase):
         v = numpy.zeros(16)
         mock_load.return_value = v
         numpy.testing.assert_equal(d.vector(), v)
+
+    @mock.patch('smqtk_descriptors.impls.descriptor_element.file.numpy.load')
+    def test_vector_get_mmap_mode(self, mock_load: mock.MagicMock) -> None:
+        d = DescriptorFileElement(1234, '/base', 4, mmap_mode='r')
+        # noinspection PyTypeHints
+        d.has_vector = mock.Mock(return_value=True)  # type: ignore
+        d.vector()
+        mock_load.assert_called_once_with('/base/1/2/3/1234.vector.npy',
+                                          mmap_mode='r')
+
+    def test_vector_mmap_round_trip(self) -> None:
+        """ Test that a memory-mapped vector read back is read-only and equal
+        to the vector set. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            d = DescriptorFileElement('abcd', tmp_dir, mmap_mode='r')
+            v = numpy.random.rand(32)
+            d.set_vector(v)
+            self.assertTrue(os.path.isfile(d._vec_filepath))
+            r = d.vector()
+            assert r is not None
+            self.assertIsInstance(r, numpy.memmap)
+            self.assertFalse(r.flags.writeable)
+            numpy.testing.assert_equal(r, v)
+
+    def test_vector_set_over_mmap(self) -> None:
+        """ Test that overwriting a vector leaves memory maps of the previous
+        vector valid, and leaves no temporary files behind. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            d = DescriptorFileElement('abcd', tmp_dir, mmap_mode='r')
+            v1 = numpy.random.rand(4096)
+            v2 = numpy.random.rand(4096)
+            d.set_vector(v1)
+            r1 = d.vector()
+            assert r1 is not None
+            d.set_vector(v2)
+            # Accessing a map of a truncated file would fault the process.
+            numpy.testing.assert_equal(r1, v1)
+            numpy.testing.assert_equal(d.vector(), v2)
+            self.assertEqual(os.listdir(tmp_dir), ['abcd.vector.npy'])
+
+    def test_has_many_vectors(self) -> None:
+        """ Test batched vector existence checking. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            elems = [DescriptorFileElement(str(i), tmp_dir, 1)
+                     for i in range(6)]
+            for e in elems[::2]:
+                e.set_vector(numpy.ones(2))
+            self.assertEqual(
+                DescriptorFileElement.has_many_vectors(elems),
+                [True, False, True, False, True, False]
+            )
+
+    def test_set_many_vectors(self) -> None:
+        """ Test batched vector setting. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            elems = [DescriptorFileElement(str(i), tmp_dir, 1)
+                     for i in range(4)]
+            vecs = numpy.random.rand(4, 3)
+            DescriptorFileElement.set_many_vectors(elems, vecs)
+            for e, v in zip(elems, vecs):
+                numpy.testing.assert_equal(e.vector(), v)
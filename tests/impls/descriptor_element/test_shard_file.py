@@ -0,0 +1,172 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy
+import pytest
+
+from smqtk_core.configuration import configuration_test_helper
+from smqtk_descriptors import DescriptorElement
+from smqtk_descriptors.impls.descriptor_element.shard_file import (
+    DescriptorShardFileElement,
+    ShardFileStore,
+    get_shard_store,
+)
+
+
+class TestDescriptorShardFileElement (unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self._tmp_dir.name
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_is_usable(self) -> None:
+        self.assertTrue(DescriptorShardFileElement.is_usable())
+
+    def test_configuration(self) -> None:
+        inst = DescriptorShardFileElement('abcd', root_dir=self.root,
+                                          dtype='float32',
+                                          records_per_shard=16,
+                                          use_mmap=False)
+        for i in configuration_test_helper(inst, {'uuid'}, ('abcd',)):
+            assert i._root_dir == self.root
+            assert i._dtype == 'float32'
+            assert i._records_per_shard == 16
+            assert i._use_mmap is False
+
+    def test_no_vector(self) -> None:
+        e = DescriptorShardFileElement('a', self.root)
+        self.assertFalse(e.has_vector())
+        self.assertIsNone(e.vector())
+
+    def test_set_get_vector(self) -> None:
+        v = numpy.random.rand(8)
+        e = DescriptorShardFileElement('a', self.root)
+        self.assertIs(e.set_vector(v), e)
+        self.assertTrue(e.has_vector())
+        numpy.testing.assert_equal(e.vector(), v)
+        # Another element with the same UUID and root sees the same vector.
+        numpy.testing.assert_equal(
+            DescriptorShardFileElement('a', self.root).vector(), v)
+        # Only shard, index and meta files, no file per descriptor.
+        self.assertEqual(sorted(os.listdir(self.root)),
+                         ['index.log', 'meta.json', 'shard_000000.bin'])
+
+    def test_mmap_vector_read_only(self) -> None:
+        e = DescriptorShardFileElement('a', self.root)
+        e.set_vector(numpy.ones(4))
+        v = e.vector()
+        assert v is not None
+        self.assertFalse(v.flags.writeable)
+
+    def test_overwrite_in_place(self) -> None:
+        e = DescriptorShardFileElement('a', self.root)
+        e.set_vector(numpy.ones(4))
+        e.set_vector(numpy.zeros(4))
+        numpy.testing.assert_equal(e.vector(), numpy.zeros(4))
+        shard_path = os.path.join(self.root, 'shard_000000.bin')
+        self.assertEqual(os.path.getsize(shard_path), 4 * 8)
+
+    def test_dimension_mismatch(self) -> None:
+        DescriptorShardFileElement('a', self.root).set_vector(numpy.ones(4))
+        with pytest.raises(ValueError, match="dimensionality"):
+            DescriptorShardFileElement('b', self.root).set_vector(numpy.ones(5))
+
+    def test_conflicting_parameters(self) -> None:
+        DescriptorShardFileElement('a', self.root).set_vector(numpy.ones(4))
+        with pytest.raises(ValueError, match="different parameters"):
+            DescriptorShardFileElement('b', self.root, dtype='float32').vector()
+        # A fresh store on the same directory checks stored meta-data.
+        with pytest.raises(ValueError, match="conflicts"):
+            ShardFileStore(self.root, records_per_shard=3)
+
+    def test_shard_rollover_and_get_many(self) -> None:
+        elems = [DescriptorShardFileElement(i, self.root, records_per_shard=3)
+                 for i in range(10)]
+        vecs = numpy.random.rand(10, 6)
+        for e, v in zip(elems, vecs):
+            e.set_vector(v)
+        self.assertEqual(
+            sorted(f for f in os.listdir(self.root) if f.startswith('shard')),
+            ['shard_{:06d}.bin'.format(i) for i in range(4)]
+        )
+        missing = DescriptorShardFileElement('missing', self.root,
+                                             records_per_shard=3)
+        query = [elems[7], missing, elems[0], elems[4], elems[9]]
+        ret = DescriptorElement.get_many_vectors(query)
+        self.assertIsNone(ret[1])
+        for i, r in zip([7, 0, 4, 9], [ret[0], ret[2], ret[3], ret[4]]):
+            numpy.testing.assert_equal(r, vecs[i])
+
+    def test_get_many_no_mmap(self) -> None:
+        elems = [DescriptorShardFileElement(i, self.root, records_per_shard=2,
+                                            use_mmap=False)
+                 for i in range(5)]
+        vecs = numpy.random.rand(5, 3)
+        for e, v in zip(elems, vecs):
+            e.set_vector(v)
+        ret = DescriptorElement.get_many_vectors(elems[::-1])
+        numpy.testing.assert_equal(numpy.array(ret), vecs[::-1])
+        numpy.testing.assert_equal(elems[3].vector(), vecs[3])
+
+    def test_reader_sees_other_writer(self) -> None:
+        # Separate store instances emulate a reader and writer in different
+        # processes.
+        writer = ShardFileStore(self.root)
+        reader = ShardFileStore(self.root)
+        writer.write([('a', numpy.ones(3))])
+        self.assertIsNone(ShardFileStore(self.root + '_none').locate('a'))
+        self.assertEqual(reader.locate('a'), (0, 0))
+        writer.write([('b', numpy.zeros(3)), ('c', numpy.ones(3) * 2)])
+        numpy.testing.assert_equal(reader.read('c'), numpy.ones(3) * 2)
+
+    def test_reload_from_disk(self) -> None:
+        ShardFileStore(self.root, records_per_shard=2).write(
+            (i, numpy.full(3, i)) for i in range(5)
+        )
+        store = ShardFileStore(self.root, records_per_shard=2)
+        self.assertEqual(store.locate(4), (2, 0))
+        numpy.testing.assert_equal(store.read(3), numpy.full(3, 3.))
+        # New records continue after the existing ones.
+        store.write([(5, numpy.zeros(3))])
+        self.assertEqual(store.locate(5), (2, 1))
+
+    def test_partial_index_tail_ignored(self) -> None:
+        store = ShardFileStore(self.root)
+        store.write([('a', numpy.ones(2))])
+        with open(os.path.join(self.root, 'index.log'), 'ab') as f:
+            f.write(pickle.dumps([('b', 0, 1)])[:-3])
+        reader = ShardFileStore(self.root)
+        self.assertIsNotNone(reader.locate('a'))
+        self.assertIsNone(reader.locate('b'))
+
+    def test_get_shard_store_shared(self) -> None:
+        self.assertIs(get_shard_store(self.root), get_shard_store(self.root))
+
+    def test_pickle(self) -> None:
+        e = DescriptorShardFileElement('a', self.root)
+        e.set_vector(numpy.ones(2))
+        e2 = pickle.loads(pickle.dumps(e))
+        numpy.testing.assert_equal(e2.vector(), numpy.ones(2))
+
+    def test_has_many_vectors(self) -> None:
+        elems = [DescriptorShardFileElement(i, self.root) for i in range(5)]
+        elems[1].set_vector(numpy.ones(2))
+        elems[3].set_vector(numpy.ones(2))
+        self.assertEqual(DescriptorElement.has_many_vectors(elems),
+                         [False, True, False, True, False])
+
+    def test_set_many_vectors(self) -> None:
+        elems = [DescriptorShardFileElement(i, self.root, records_per_shard=2)
+                 for i in range(5)]
+        vecs = numpy.random.rand(5, 3)
+        DescriptorElement.set_many_vectors(elems, vecs)
+        numpy.testing.assert_equal(
+            numpy.array(DescriptorElement.get_many_vectors(elems)), vecs)
+        # One index record for the whole batch.
+        with open(os.path.join(self.root, 'index.log'), 'rb') as f:
+            self.assertEqual(len(pickle.load(f)), 5)
@@ -1,6 +1,7 @@
 import unittest
 
 import unittest.mock as mock
+import numpy
 import pytest
 
 from smqtk_core.configuration import configuration_test_helper
@@ -30,3 +31,38 @@ class TestDescriptorSolrElement (unittest.TestCase):
             assert i.solr_timeout == 101
             assert i.solr_persistent_connection is True
             assert i.solr_commit_on_set is False
+
+    @mock.patch("solr.Solr")
+    def test_has_many_vectors(self, mock_solr: mock.MagicMock) -> None:
+        elems = [
+            SolrDescriptorElement(
+                i, solr_conn_addr=self.TEST_URL, uuid_field='uuid_s',
+                vector_field='vector_fs', timestamp_field='timestamp_f',
+            )
+            for i in range(3)
+        ]
+        mock_solr().select.return_value.results = [{'uuid_s': '1'}]
+        self.assertEqual(SolrDescriptorElement.has_many_vectors(elems),
+                         [False, True, False])
+        mock_solr().select.assert_called_once_with(
+            'id:("0" OR "1" OR "2")', fields=['uuid_s'], rows=3
+        )
+
+    @mock.patch("solr.Solr")
+    def test_set_many_vectors(self, mock_solr: mock.MagicMock) -> None:
+        elems = [
+            SolrDescriptorElement(
+                i, solr_conn_addr=self.TEST_URL, uuid_field='uuid_s',
+                vector_field='vector_fs', timestamp_field='timestamp_f',
+                commit_on_set=False,
+            )
+            for i in range(2)
+        ]
+        SolrDescriptorElement.set_many_vectors(
+            elems, numpy.array([[1., 2.], [3., 4.]]))
+        mock_solr().add.assert_not_called()
+        mock_solr().add_many.assert_called_once()
+        docs = mock_solr().add_many.call_args[0][0]
+        self.assertEqual([d['uuid_s'] for d in docs], ['0', '1'])
+        self.assertEqual([d['vector_fs'] for d in docs], [[1., 2.], [3., 4.]])
+        self.assertFalse(mock_solr().add_many.call_args[1]['commit'])
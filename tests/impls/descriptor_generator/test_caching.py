@@ -0,0 +1,196 @@
+import itertools
+from typing import Any, Dict, Iterable, List, Set
+import unittest
+import unittest.mock as mock
+
+import numpy as np
+import pytest
+
+from smqtk_core.configuration import configuration_test_helper
+from smqtk_dataprovider import DataElement
+from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement
+
+from smqtk_descriptors import DescriptorGenerator
+from smqtk_descriptors.impls.descriptor_generator.caching import (
+    CachingDescriptorGenerator,
+)
+from smqtk_descriptors.impls.descriptor_set.memory import MemoryDescriptorSet
+
+
+class StubDescriptorGenerator (DescriptorGenerator):
+    """
+    Generator of the byte sum of data as descriptor, recording the content
+    of the data it computes.
+    """
+
+    def __init__(self, scale: int = 1) -> None:
+        super().__init__()
+        self.scale = scale
+        self.computed: List[bytes] = []
+
+    def get_config(self) -> Dict[str, Any]:
+        return {'scale': self.scale}
+
+    def valid_content_types(self) -> Set[str]:
+        return {'text/plain'}
+
+    def _generate_arrays(self, data_iter: Iterable[DataElement]) -> Iterable[np.ndarray]:
+        for d in data_iter:
+            b = d.get_bytes()
+            self.computed.append(b)
+            yield np.array([sum(b) * self.scale])
+
+
+class StubBatchDescriptorGenerator (StubDescriptorGenerator):
+    """
+    Stub generator pulling a batch of input before computing any of it, like
+    generators running networks on batches do.
+    """
+
+    def __init__(self, scale: int = 1, batch: int = 3) -> None:
+        super().__init__(scale)
+        self.batch = batch
+
+    def get_config(self) -> Dict[str, Any]:
+        return {'scale': self.scale, 'batch': self.batch}
+
+    def _generate_arrays(self, data_iter: Iterable[DataElement]) -> Iterable[np.ndarray]:
+        data_iter = iter(data_iter)
+        while True:
+            batch = list(itertools.islice(data_iter, self.batch))
+            if not batch:
+                break
+            yield from super()._generate_arrays(batch)
+
+
+def _elems(contents: Iterable[bytes]) -> List[DataElement]:
+    return [DataMemoryElement(c, 'text/plain') for c in contents]
+
+
+class TestCachingDescriptorGenerator (unittest.TestCase):
+
+    def test_configuration(self) -> None:
+        inst = CachingDescriptorGenerator(StubDescriptorGenerator(scale=3),
+                                          MemoryDescriptorSet(),
+                                          hash_algorithm='md5',
+                                          batch_size=7)
+        for inst_i in configuration_test_helper(inst):  # type: CachingDescriptorGenerator
+            assert isinstance(inst_i.generator, StubDescriptorGenerator)
+            assert inst_i.generator.scale == 3
+            assert isinstance(inst_i.descriptor_set, MemoryDescriptorSet)
+            assert inst_i.hash_algorithm == 'md5'
+            assert inst_i.batch_size == 7
+            assert inst_i.generator_hash == inst.generator_hash
+
+    def test_invalid_args(self) -> None:
+        with pytest.raises(ValueError, match="hash algorithm"):
+            CachingDescriptorGenerator(StubDescriptorGenerator(),
+                                       MemoryDescriptorSet(),
+                                       hash_algorithm='crc32')
+        with pytest.raises(ValueError, match="Batch size"):
+            CachingDescriptorGenerator(StubDescriptorGenerator(),
+                                       MemoryDescriptorSet(), batch_size=0)
+
+    def test_content_types(self) -> None:
+        inst = CachingDescriptorGenerator(StubDescriptorGenerator(),
+                                          MemoryDescriptorSet())
+        assert inst.valid_content_types() == {'text/plain'}
+        with pytest.raises(ValueError):
+            list(inst.generate_arrays([DataMemoryElement(b'a', 'image/png')]))
+
+    def test_generate_arrays(self) -> None:
+        """ Test that repeated content is computed once, within and across
+        calls, with results in input order and hits counted. """
+        gen = StubDescriptorGenerator()
+        dset = MemoryDescriptorSet()
+        inst = CachingDescriptorGenerator(gen, dset, batch_size=2)
+
+        contents = [b'a', b'b', b'a', b'c', b'a', b'b']
+        actual = list(inst.generate_arrays(_elems(contents)))
+        assert [v[0] for v in actual] == [sum(c) for c in contents]
+        assert gen.computed == [b'a', b'b', b'c']
+        assert (inst.hits, inst.misses) == (3, 3)
+        assert dset.count() == 3
+        assert set(dset.keys()) == {inst.cache_key(e)
+                                    for e in _elems([b'a', b'b', b'c'])}
+
+        actual = list(inst.generate_arrays(_elems([b'c', b'd', b'a'])))
+        assert [v[0] for v in actual] == [sum(b'c'), sum(b'd'), sum(b'a')]
+        assert gen.computed == [b'a', b'b', b'c', b'd']
+        assert (inst.hits, inst.misses) == (5, 4)
+        assert inst.hit_rate == 5 / 9
+
+    def test_generate_arrays_config_keyed(self) -> None:
+        """ Test that generators of different configurations do not share
+        cached descriptors. """
+        dset = MemoryDescriptorSet()
+        inst1 = CachingDescriptorGenerator(StubDescriptorGenerator(1), dset)
+        inst2 = CachingDescriptorGenerator(StubDescriptorGenerator(2), dset)
+        v1 = list(inst1.generate_arrays(_elems([b'a'])))
+        v2 = list(inst2.generate_arrays(_elems([b'a'])))
+        assert v2[0][0] == 2 * v1[0][0]
+        assert dset.count() == 2
+        assert inst2.hits == 0
+
+    def test_generate_arrays_all_cached(self) -> None:
+        gen = StubDescriptorGenerator()
+        inst = CachingDescriptorGenerator(gen, MemoryDescriptorSet())
+        list(inst.generate_arrays(_elems([b'a', b'b'])))
+        actual = list(inst.generate_arrays(_elems([b'b', b'a', b'b'])))
+        assert [v[0] for v in actual] == [sum(b'b'), sum(b'a'), sum(b'b')]
+        assert len(gen.computed) == 2
+        assert inst.hit_rate == 0.6
+
+    def test_generate_arrays_under_produced(self) -> None:
+        gen = StubDescriptorGenerator()
+        inst = CachingDescriptorGenerator(gen, MemoryDescriptorSet())
+        with mock.patch.object(gen, '_generate_arrays',
+                               side_effect=lambda it: iter([np.array([0])]
+                                                           if list(it) else [])):
+            with pytest.raises(IndexError, match="under-produced"):
+                list(inst.generate_arrays(_elems([b'a', b'b'])))
+
+    def test_generate_arrays_flush_straddled(self) -> None:
+        """ Test that content repeated after its first occurrence was added
+        to the cache, while a window including both is iterated, is taken
+        from the cache instead of being computed again. """
+        for batch_size, gen_batch in [(1, 2), (2, 3)]:
+            # The wrapped generator pulls ``b'c'`` and the repeated
+            # ``b'a'`` in one window while ``b'a'`` is in flight, and
+            # computes ``b'c'`` after ``b'a'`` was added to the cache.
+            gen = StubBatchDescriptorGenerator(batch=gen_batch)
+            dset = MemoryDescriptorSet()
+            inst = CachingDescriptorGenerator(gen, dset,
+                                              batch_size=batch_size)
+            contents = [b'a', b'b', b'c', b'a', b'd']
+            actual = list(inst.generate_arrays(_elems(contents)))
+            assert [v[0] for v in actual] == [sum(c) for c in contents]
+            assert gen.computed == [b'a', b'b', b'c', b'd']
+            assert (inst.hits, inst.misses) == (1, 4)
+            assert dset.count() == 4
+
+    def test_generate_arrays_batched_lookup(self) -> None:
+        """ Test that the cache is checked once per window of input. """
+        dset = MemoryDescriptorSet()
+        inst = CachingDescriptorGenerator(StubDescriptorGenerator(), dset,
+                                          batch_size=2)
+        with mock.patch.object(dset, 'has_many_descriptors',
+                               wraps=dset.has_many_descriptors) as m_hmd:
+            list(inst.generate_arrays(_elems([b'a', b'b', b'a', b'c'])))
+        assert [c[0][0] for c in m_hmd.call_args_list] == [
+            [inst.cache_key(e) for e in _elems(window)]
+            for window in [[b'a', b'b'], [b'a', b'c']]
+        ]
+
+    def test_generate_layer_arrays(self) -> None:
+        """ Test that multi-layer generation is forwarded to the wrapped
+        generator. """
+        gen = StubDescriptorGenerator()
+        inst = CachingDescriptorGenerator(gen, MemoryDescriptorSet())
+        elems = _elems([b'a', b'b'])
+        with mock.patch.object(gen, 'generate_layer_arrays',
+                               return_value=iter([{'x': 1}, {'x': 2}])) as m_gla:
+            actual = list(inst.generate_layer_arrays(elems, ['x']))
+        assert actual == [{'x': 1}, {'x': 2}]
+        assert list(m_gla.call_args[0][0]) == elems
+        assert m_gla.call_args[0][1] == ['x']
@@ -1,3 +1,4 @@
+import gc
 import os
 import pickle
 from typing import cast, Any, Dict
@@ -21,6 +22,7 @@ from smqtk_descriptors.impls.descriptor_generator.caffe1 import (
     # Testing protected helper function
     _process_load_img_array,
 )
+from smqtk_descriptors.utils import ParallelWorkerPool
 
 from tests import TEST_DATA_DIR
 
@@ -111,6 +113,7 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
             'pixel_rescale': (.2, .8),
             'input_scale': 1.5,
             'threads': 14,
+            'persistent_workers': True,
         }
         # make sure that we're considering all constructor parameter
         # options
@@ -147,7 +150,8 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
                                       load_truncated_images=True,
                                       pixel_rescale=(0.2, 0.3),
                                       input_scale=8.9,
-                                      threads=7)
+                                      threads=7,
+                                      persistent_workers=True)
         for inst in configuration_test_helper(g1):  # type: CaffeDescriptorGenerator
             assert inst.network_prototxt == self.dummy_net_topo_elem
             assert inst.network_model == self.dummy_caffe_model_elem
@@ -162,6 +166,7 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
             assert inst.pixel_rescale == (0.2, 0.3)
             assert inst.input_scale == 8.9
             assert inst.threads == 7
+            assert inst.persistent_workers is True
 
     @mock.patch('smqtk_descriptors.impls.descriptor_generator.caffe1'
                 '.CaffeDescriptorGenerator._setup_network')
@@ -196,6 +201,7 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
             'pixel_rescale': None,
             'input_scale': None,
             'threads': None,
+            'persistent_workers': False,
         }
         assert g1_config == g2.get_config() == expected_config
 
@@ -233,6 +239,7 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
             'pixel_rescale': None,
             'input_scale': None,
             'threads': None,
+            'persistent_workers': False,
         }
         assert g1_config == g2.get_config() == expected_config
 
@@ -255,6 +262,7 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
             'pixel_rescale': (.2, .8),
             'input_scale': 1.5,
             'threads': 9,
+            'persistent_workers': True,
         }
         g = CaffeDescriptorGenerator(**expected_params)
         # Initialization sets up the network on construction.
@@ -269,6 +277,29 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
         self.assertIsInstance(g2, CaffeDescriptorGenerator)
         self.assertEqual(g.get_config(), g2.get_config())
 
+    @mock.patch('smqtk_descriptors.impls.descriptor_generator.caffe1'
+                '.CaffeDescriptorGenerator._setup_network')
+    def test_close_persistent_workers(self, _m_cdg_setupNetwork: mock.MagicMock) -> None:
+        """ Test that persistent worker pools are closed by ``close``, when
+        exiting a with block and when the generator is garbage collected. """
+        g = CaffeDescriptorGenerator(self.dummy_net_topo_elem,
+                                     self.dummy_caffe_model_elem,
+                                     persistent_workers=True)
+        pool = g._worker_pools['load_img'] = ParallelWorkerPool(cores=1)
+        g.close()
+        assert pool.closed
+        assert g._worker_pools == {}
+        for w in pool._workers:
+            w.join(timeout=5)
+            assert not w.is_alive()
+        with g:
+            pool = g._worker_pools['load_img'] = ParallelWorkerPool(cores=1)
+        assert pool.closed
+        pool = g._worker_pools['load_img'] = ParallelWorkerPool(cores=1)
+        del g
+        gc.collect()
+        assert pool.closed
+
     @mock.patch('smqtk_descriptors.impls.descriptor_generator.caffe1'
                 '.CaffeDescriptorGenerator._setup_network')
     def test_invalid_datatype(self, _m_cdg_setupNetwork: mock.MagicMock) -> None:
@@ -324,6 +355,25 @@ class TestCaffeDesctriptorGenerator (unittest.TestCase):
         d = d_list[0]
         self.assertAlmostEqual(d.sum(), 0., 12)
 
+    def test_generate_layer_arrays_dummy_model(self) -> None:
+        """ Test that several blobs are extracted into raveled vectors from
+        the same forward pass. """
+        g = CaffeDescriptorGenerator(self.dummy_net_topo_elem,
+                                     self.dummy_caffe_model_elem,
+                                     self.dummy_img_mean_elem,
+                                     return_layer='fc', use_gpu=False)
+        d_list = list(g._generate_layer_arrays(
+            [DataFileElement(self.hopper_image_fp, readonly=True)] * 2,
+            ['fc', 'pool']
+        ))
+        assert len(d_list) == 2
+        for d in d_list:
+            assert set(d) == {'fc', 'pool'}
+            assert d['pool'].ndim == 1
+            self.assertAlmostEqual(d['fc'].sum(), 0., 12)
+            numpy.testing.assert_equal(d['fc'], g.generate_one_array(
+                DataFileElement(self.hopper_image_fp, readonly=True)))
+
     def test_generate_arrays_no_data(self) -> None:
         """ Test that generation method correctly returns an empty iterable
         when no data is passed. """
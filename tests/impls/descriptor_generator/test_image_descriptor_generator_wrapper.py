@@ -1,7 +1,10 @@
+import gc
+import pickle
 from typing import Optional, Set, Dict, Iterable, Any
 import unittest
 from unittest import mock
 import numpy as np
+import pytest
 
 
 from smqtk_descriptors.impls.descriptor_generator.image_descriptor_generator_wrapper import (
@@ -13,7 +16,7 @@ from smqtk_image_io.bbox import AxisAlignedBoundingBox
 from smqtk_dataprovider import DataElement
 from smqtk_core.configuration import configuration_test_helper
 from smqtk_descriptors.utils.parallel import (
-    parallel_map, ParallelResultsIterator
+    parallel_map, ParallelResultsIterator, ParallelWorkerPool
 )
 
 
@@ -53,10 +56,12 @@ class TestImageDescriptorGeneratorWrapper (unittest.TestCase):
 
         inst = ImageDescriptorGeneratorWrapper(dummy_image_reader,
                                                dummy_image_dg,
-                                               image_load_threads=3)
+                                               image_load_threads=3,
+                                               persistent_workers=True)
 
         for inst_i in configuration_test_helper(inst):
             assert inst_i._image_load_threads == 3
+            assert inst_i._persistent_workers is True
             assert isinstance(inst_i._image_reader, StubImageReader)
             assert isinstance(inst_i._image_descr_generator, StubImageDG)
 
@@ -159,3 +164,86 @@ class TestImageDescriptorGeneratorWrapper (unittest.TestCase):
         m_pmap.assert_called_once_with(m_img_reader.load_as_matrix,  # type: ignore
                                        ['b', 'a'],
                                        cores=3)
+
+    def test_generate_layer_arrays(self) -> None:
+        """ Test that multi-layer generation is forwarded to the image
+        descriptor generator with loaded image matrices. """
+        m_img_reader = mock.Mock(spec=ImageReader)
+        m_img_reader.load_as_matrix.side_effect = lambda e: "matrix!"+e
+
+        m_img_dg = mock.Mock(spec=ImageDescriptorGenerator)
+        m_img_dg.generate_layer_arrays_from_images.side_effect = \
+            lambda it, layers: ({layer: layer+'!'+v for layer in layers}
+                                for v in it)
+
+        inst = ImageDescriptorGeneratorWrapper(m_img_reader, m_img_dg)
+        # noinspection PyTypeChecker
+        ret = list(inst._generate_layer_arrays(['a', 'b'], ['x', 'y']))  # type: ignore
+        assert ret == [{'x': 'x!matrix!a', 'y': 'y!matrix!a'},
+                       {'x': 'x!matrix!b', 'y': 'y!matrix!b'}]
+
+    def test_generate_layer_arrays_unsupported(self) -> None:
+        """ Test that image descriptor generators do not support multi-layer
+        generation by default. """
+        inst = ImageDescriptorGeneratorWrapper(StubImageReader(),
+                                               StubImageDG())
+        with pytest.raises(NotImplementedError, match="multi-layer"):
+            # noinspection PyTypeChecker
+            list(inst._generate_layer_arrays(['a'], ['x']))  # type: ignore
+
+    def test_generate_arrays_persistent_workers(self) -> None:
+        """ Test that the image loading worker pool is reused between
+        generation calls when persistent workers are enabled. """
+        m_img_reader = mock.Mock(spec=ImageReader)
+        m_img_reader.load_as_matrix.side_effect = lambda e: "matrix!"+e
+
+        m_img_dg = mock.Mock(spec=ImageDescriptorGenerator)
+        m_img_dg.generate_arrays_from_images.side_effect = \
+            lambda it: ('descriptor!'+v for v in it)
+
+        inst = ImageDescriptorGeneratorWrapper(m_img_reader, m_img_dg,
+                                               image_load_threads=3,
+                                               persistent_workers=True)
+        # noinspection PyTypeChecker
+        ret = list(inst._generate_arrays(['b', 'a']))  # type: ignore
+        assert ret == ['descriptor!matrix!b', 'descriptor!matrix!a']
+        pool = inst._worker_pools['image_load']
+        assert pool.cores == 3
+        # noinspection PyTypeChecker
+        ret = list(inst._generate_arrays(['c']))  # type: ignore
+        assert ret == ['descriptor!matrix!c']
+        assert inst._worker_pools['image_load'] is pool
+
+        # Closing stops the workers of the pool, which is started again on
+        # demand and closed when exiting a with block or when the generator
+        # is garbage collected.
+        inst.close()
+        assert pool.closed
+        assert inst._worker_pools == {}
+        for w in pool._workers:
+            w.join(timeout=5)
+            assert not w.is_alive()
+        with inst:
+            # noinspection PyTypeChecker
+            list(inst._generate_arrays(['d']))  # type: ignore
+            pool = inst._worker_pools['image_load']
+        assert pool.closed
+        # noinspection PyTypeChecker
+        list(inst._generate_arrays(['e']))  # type: ignore
+        pool = inst._worker_pools['image_load']
+        del inst
+        gc.collect()
+        assert pool.closed
+
+    def test_pickle_persistent_workers(self) -> None:
+        """ Test that a started worker pool is not carried over into copies,
+        which start their own when needed. """
+        inst = ImageDescriptorGeneratorWrapper(StubImageReader(),
+                                               StubImageDG(),
+                                               image_load_threads=2,
+                                               persistent_workers=True)
+        with ParallelWorkerPool(cores=2) as pool:
+            inst._worker_pools['image_load'] = pool
+            inst2 = pickle.loads(pickle.dumps(inst))
+        assert inst2._worker_pools == {}
+        assert inst2._persistent_workers is True
@@ -0,0 +1,143 @@
+import os
+import pickle
+import tempfile
+from typing import Any, Dict
+import unittest
+
+import unittest.mock as mock
+import numpy as np
+import pytest
+
+from smqtk_core.configuration import configuration_test_helper, make_default_config
+from smqtk_dataprovider import DataElement
+from smqtk_dataprovider.impls.data_element.file import DataFileElement
+from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement
+from smqtk_image_io import ImageReader
+from smqtk_image_io.impls.image_reader.pil_io import PilImageReader
+
+from smqtk_descriptors import DescriptorGenerator
+from smqtk_descriptors.impls.descriptor_generator.onnx import (
+    PIL,
+    ImageTransform,
+    OnnxDescriptorGenerator,
+)
+from smqtk_descriptors.impls.descriptor_generator.pytorch import (
+    Resnet50SequentialTorchDescriptorGenerator,
+)
+
+from tests import TEST_DATA_DIR
+
+
+@unittest.skipUnless(PIL is not None, reason="PIL is not available.")
+class TestImageTransform (unittest.TestCase):
+
+    def test_transform(self) -> None:
+        img = np.full((10, 20, 3), 255, dtype=np.uint8)
+        a = ImageTransform((4, 6), (0.5, 0.5, 0.5), (0.25, 0.5, 1.))(img)
+        assert a.shape == (3, 4, 6)
+        assert a.dtype == np.float32
+        np.testing.assert_allclose(a[:, 0, 0], [2., 1., 0.5])
+
+    def test_transform_grayscale_no_resize(self) -> None:
+        img = np.zeros((10, 20), dtype=np.uint8)
+        a = ImageTransform(None, (0., 0., 0.), (1., 1., 1.))(img)
+        assert a.shape == (3, 10, 20)
+        np.testing.assert_allclose(a, 0.)
+
+
+@unittest.skipUnless(OnnxDescriptorGenerator.is_usable(),
+                     reason="OnnxDescriptorGenerator is not usable in"
+                            "current environment.")
+class TestOnnxDescriptorGenerator (unittest.TestCase):
+
+    hopper_image_fp = os.path.join(TEST_DATA_DIR, 'grace_hopper.png')
+
+    dummy_image_reader = PilImageReader()
+
+    dummy_model = DataMemoryElement(b'model bytes')
+
+    def test_impl_findable(self) -> None:
+        self.assertIn(OnnxDescriptorGenerator,
+                      DescriptorGenerator.get_impls())
+
+    def test_get_config(self) -> None:
+        expected_params: Dict[str, Any] = {
+            'model': make_default_config(DataElement.get_impls()),
+            'image_reader': make_default_config(ImageReader.get_impls()),
+            'image_load_threads': 1,
+            'image_tform_threads': 1,
+            'batch_size': 32,
+            'image_size': (224, 224),
+            'pixel_mean': (0.485, 0.456, 0.406),
+            'pixel_std': (0.229, 0.224, 0.225),
+            'normalize': None,
+            'input_name': None,
+            'output_name': None,
+            'intra_op_threads': None,
+            'inter_op_threads': None,
+            'graph_optimization_level': 'all',
+            'providers': None,
+        }
+        self.assertEqual(OnnxDescriptorGenerator.get_default_config(),
+                         expected_params)
+
+    @mock.patch('smqtk_descriptors.impls.descriptor_generator.onnx'
+                '.OnnxDescriptorGenerator._ensure_session')
+    def test_config_cycle(self, _m_ensure_session: mock.MagicMock) -> None:
+        g = OnnxDescriptorGenerator(self.dummy_model, self.dummy_image_reader,
+                                    image_load_threads=2,
+                                    image_tform_threads=3,
+                                    batch_size=4,
+                                    image_size=(32, 64),
+                                    normalize=2,
+                                    input_name='in',
+                                    output_name='out',
+                                    intra_op_threads=5,
+                                    inter_op_threads=6,
+                                    graph_optimization_level='basic',
+                                    providers=['CPUExecutionProvider'])
+        for inst in configuration_test_helper(g):  # type: OnnxDescriptorGenerator
+            assert inst.model.get_bytes() == b'model bytes'
+            assert isinstance(inst.image_reader, PilImageReader)
+            assert inst.image_load_threads == 2
+            assert inst.image_tform_threads == 3
+            assert inst.batch_size == 4
+            assert tuple(inst.image_size) == (32, 64)
+            assert inst.normalize == 2
+            assert inst.input_name == 'in'
+            assert inst.output_name == 'out'
+            assert inst.intra_op_threads == 5
+            assert inst.inter_op_threads == 6
+            assert inst.graph_optimization_level == 'basic'
+            assert inst.providers == ['CPUExecutionProvider']
+
+    @mock.patch('smqtk_descriptors.impls.descriptor_generator.onnx'
+                '.OnnxDescriptorGenerator._ensure_session')
+    def test_invalid_graph_optimization_level(self, _m_ensure_session: mock.MagicMock) -> None:
+        with pytest.raises(ValueError, match="graph optimization level"):
+            OnnxDescriptorGenerator(self.dummy_model, self.dummy_image_reader,
+                                    graph_optimization_level='max')
+
+    @unittest.skipUnless(Resnet50SequentialTorchDescriptorGenerator.is_usable(),
+                         reason="Torch is not usable in current environment.")
+    def test_generate_arrays_exported(self) -> None:
+        """ Test that a model exported from a torch generator produces the
+        same descriptors through ONNX Runtime, also after pickling. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        normalize=2)
+        d1 = list(g1._generate_arrays(elems))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_fp = os.path.join(tmp_dir, 'model.onnx')
+            g1.export_onnx(model_fp)
+            g2 = OnnxDescriptorGenerator(DataFileElement(model_fp, readonly=True),
+                                         self.dummy_image_reader,
+                                         batch_size=2,
+                                         normalize=2,
+                                         intra_op_threads=2)
+            d2 = list(g2._generate_arrays(elems))
+            np.testing.assert_allclose(d1, d2, atol=1e-3)
+            g3 = pickle.loads(pickle.dumps(g2))
+            d3 = list(g3._generate_arrays(elems))
+            np.testing.assert_allclose(d1, d3, atol=1e-3)
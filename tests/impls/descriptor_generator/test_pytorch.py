@@ -1,27 +1,59 @@
+import gc
+import io
 import os
 import pickle
-from typing import Any, Dict
+import tempfile
+from typing import Any, Dict, List
 import unittest
 
 import unittest.mock as mock
 import numpy as np
+import PIL.Image
+import pytest
 
 from smqtk_core.configuration import configuration_test_helper, make_default_config
 from smqtk_dataprovider.impls.data_element.file import DataFileElement
+from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement
 from smqtk_image_io import ImageReader
 from smqtk_image_io.impls.image_reader.pil_io import PilImageReader
 
-from smqtk_descriptors import DescriptorGenerator
+from smqtk_descriptors import DescriptorElement, DescriptorGenerator
 # noinspection PyProtectedMember
 from smqtk_descriptors.impls.descriptor_generator.pytorch import (
     TorchModuleDescriptorGenerator,
     Resnet50SequentialTorchDescriptorGenerator,
     AlignedReIDResNet50TorchDescriptorGenerator,
+    cosine_drift,
+    normalize_vectors,
 )
 
 from tests import TEST_DATA_DIR
 
 
+class TestNormalizeVectors (unittest.TestCase):
+
+    def test_normalize_half_precision(self) -> None:
+        """ Test that half precision vectors whose squared norm overflows
+        half precision are normalized, keeping their type. """
+        v = np.full((2, 4), 300., dtype=np.float16)
+        n = normalize_vectors(v, 2)
+        assert n.dtype == np.float16
+        np.testing.assert_allclose(n, 0.5)
+
+    def test_normalize_off(self) -> None:
+        v = np.arange(4.)
+        assert normalize_vectors(v) is v
+
+
+class TestCosineDrift (unittest.TestCase):
+
+    def test_cosine_drift(self) -> None:
+        ref = np.array([[1., 0.], [0., 2.], [1., 1.], [0., 0.]])
+        other = np.array([[3., 0.], [2., 0.], [-1., -1.], [0., 0.]])
+        np.testing.assert_allclose(cosine_drift(ref, other),
+                                   [0., 1., 2., 1.])
+
+
 @unittest.skipUnless(TorchModuleDescriptorGenerator.is_usable(),
                      reason="TorchModuleDescriptorGenerator is not usable in"
                             "current environment.")
@@ -49,7 +81,17 @@ class TestTorchDescriptorGenerator (unittest.TestCase):
             'cuda_device': None,
             'normalize': None,
             'iter_runtime': False,
-            'global_average_pool': False
+            'global_average_pool': False,
+            'persistent_workers': False,
+            'batch_max_wait': None,
+            'image_tform_processes': False,
+            'streaming_dataloader': False,
+            'fused_load_transform': False,
+            'compile_mode': None,
+            'compile_cache_dir': None,
+            'quantize': None,
+            'cpu_autocast': False,
+            'descriptor_dtype': 'float32'
         }
         # make sure that we're considering all constructor parameter
         # options
@@ -74,7 +116,17 @@ class TestTorchDescriptorGenerator (unittest.TestCase):
                                                         cuda_device=1,
                                                         normalize=1.0,
                                                         iter_runtime=True,
-                                                        global_average_pool=True)
+                                                        global_average_pool=True,
+                                                        persistent_workers=True,
+                                                        batch_max_wait=0.5,
+                                                        image_tform_processes=True,
+                                                        streaming_dataloader=True,
+                                                        fused_load_transform=True,
+                                                        compile_mode='trace',
+                                                        compile_cache_dir='cache_dir',
+                                                        quantize='dynamic',
+                                                        cpu_autocast=True,
+                                                        descriptor_dtype='float16')
         for inst_g1 in configuration_test_helper(g1):
             assert isinstance(inst_g1.image_reader, type(self.dummy_image_reader))
             assert inst_g1.image_load_threads == 2
@@ -86,6 +138,16 @@ class TestTorchDescriptorGenerator (unittest.TestCase):
             assert inst_g1.normalize == 1.0
             assert inst_g1.iter_runtime is True
             assert inst_g1.global_average_pool is True
+            assert inst_g1.persistent_workers is True
+            assert inst_g1.batch_max_wait == 0.5
+            assert inst_g1.image_tform_processes is True
+            assert inst_g1.streaming_dataloader is True
+            assert inst_g1.fused_load_transform is True
+            assert inst_g1.compile_mode == 'trace'
+            assert inst_g1.compile_cache_dir == 'cache_dir'
+            assert inst_g1.quantize == 'dynamic'
+            assert inst_g1.cpu_autocast is True
+            assert inst_g1.descriptor_dtype == 'float16'
 
         # Repeat for AlignedReIDResNet50
         g2 = AlignedReIDResNet50TorchDescriptorGenerator(self.dummy_image_reader,
@@ -97,7 +159,17 @@ class TestTorchDescriptorGenerator (unittest.TestCase):
                                                          cuda_device=1,
                                                          normalize=1.0,
                                                          iter_runtime=True,
-                                                         global_average_pool=True)
+                                                         global_average_pool=True,
+                                                         persistent_workers=True,
+                                                         batch_max_wait=0.5,
+                                                         image_tform_processes=True,
+                                                         streaming_dataloader=True,
+                                                         fused_load_transform=True,
+                                                         compile_mode='trace',
+                                                         compile_cache_dir='cache_dir',
+                                                         quantize='dynamic',
+                                                         cpu_autocast=True,
+                                                         descriptor_dtype='float16')
         for inst_g2 in configuration_test_helper(g2):
             assert isinstance(inst_g2.image_reader, type(self.dummy_image_reader))
             assert inst_g2.image_load_threads == 2
@@ -109,6 +181,16 @@ class TestTorchDescriptorGenerator (unittest.TestCase):
             assert inst_g2.normalize == 1.0
             assert inst_g2.iter_runtime is True
             assert inst_g2.global_average_pool is True
+            assert inst_g2.persistent_workers is True
+            assert inst_g2.batch_max_wait == 0.5
+            assert inst_g2.image_tform_processes is True
+            assert inst_g2.streaming_dataloader is True
+            assert inst_g2.fused_load_transform is True
+            assert inst_g2.compile_mode == 'trace'
+            assert inst_g2.compile_cache_dir == 'cache_dir'
+            assert inst_g2.quantize == 'dynamic'
+            assert inst_g2.cpu_autocast is True
+            assert inst_g2.descriptor_dtype == 'float16'
 
     @mock.patch('smqtk_descriptors.impls.descriptor_generator.pytorch'
                 '.TorchModuleDescriptorGenerator._ensure_module')
@@ -123,7 +205,17 @@ class TestTorchDescriptorGenerator (unittest.TestCase):
             'cuda_device': None,
             'normalize': None,
             'iter_runtime': False,
-            'global_average_pool': False
+            'global_average_pool': False,
+            'persistent_workers': False,
+            'batch_max_wait': None,
+            'image_tform_processes': False,
+            'streaming_dataloader': False,
+            'fused_load_transform': False,
+            'compile_mode': None,
+            'compile_cache_dir': None,
+            'quantize': None,
+            'cpu_autocast': False,
+            'descriptor_dtype': 'float32'
         }
         g = Resnet50SequentialTorchDescriptorGenerator(**expected_params)
         # Initialization sets up the network on construction.
@@ -180,3 +272,296 @@ class TestTorchDescriptorGenerator (unittest.TestCase):
         g2 = AlignedReIDResNet50TorchDescriptorGenerator(self.dummy_image_reader)
         r2 = list(g2._generate_arrays([]))
         assert r2 == []
+
+    def test_generate_arrays_persistent_workers(self) -> None:
+        """ Test that worker pools are kept between generation calls when
+        persistent workers are enabled. """
+        g = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                       image_load_threads=2,
+                                                       image_tform_threads=2,
+                                                       iter_runtime=True,
+                                                       persistent_workers=True)
+        elem = DataFileElement(self.hopper_image_fp, readonly=True)
+        d1 = list(g._generate_arrays([elem]))
+        pools = dict(g._worker_pools)
+        assert set(pools) == {'img_load', 'tform_img'}
+        d2 = list(g._generate_arrays([elem]))
+        assert g._worker_pools == pools
+        np.testing.assert_allclose(d1[0], d2[0])
+        # Pools are not carried over into copies.
+        assert pickle.loads(pickle.dumps(g))._worker_pools == {}
+
+        # Closing stops the workers of the pools.
+        workers = [w for p in pools.values() for w in p._workers]
+        g.close()
+        assert g._worker_pools == {}
+        assert all(p.closed for p in pools.values())
+        for w in workers:
+            w.join(timeout=5)
+            assert not w.is_alive()
+        # Pools are started again on demand, and closed when exiting a with
+        # block or when the generator is garbage collected.
+        with g:
+            list(g._generate_arrays([elem]))
+            pools = dict(g._worker_pools)
+        assert all(p.closed for p in pools.values())
+        list(g._generate_arrays([elem]))
+        pools = dict(g._worker_pools)
+        del g
+        gc.collect()
+        assert all(p.closed for p in pools.values())
+
+    def test_generate_arrays_batch_max_wait(self) -> None:
+        """ Test that deadline batch assembly produces the same descriptors
+        as full batches. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        iter_runtime=True)
+        g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        iter_runtime=True,
+                                                        batch_max_wait=0.)
+        d1 = list(g1._generate_arrays(elems))
+        d2 = list(g2._generate_arrays(elems))
+        assert len(d2) == 3
+        np.testing.assert_allclose(d1, d2, 1e-4)
+
+    @mock.patch('smqtk_descriptors.impls.descriptor_generator.pytorch'
+                '.TorchModuleDescriptorGenerator._ensure_module')
+    def test_iter_batch_tensors(self, _m_ensure_module: mock.MagicMock) -> None:
+        """ Test that batches are stacked into a single reused buffer. """
+        import torch
+        g = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                       batch_size=2)
+        items = [torch.full((3, 4), float(i)) for i in range(5)]
+        batches = []
+        ptrs = []
+        for b in g._iter_batch_tensors(items):
+            batches.append(b.clone())
+            ptrs.append(b.data_ptr())
+        assert [b.shape[0] for b in batches] == [2, 2, 1]
+        for i, item in enumerate(items):
+            assert torch.equal(batches[i // 2][i % 2], item)
+        # The same buffer is used for all batches, including the partial one.
+        assert ptrs[0] == ptrs[1] == ptrs[2]
+
+    def test_generate_arrays_tform_processes(self) -> None:
+        """ Test that transforming in worker processes produces the same
+        descriptors as in the main thread. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        iter_runtime=True)
+        g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        image_tform_threads=2,
+                                                        iter_runtime=True,
+                                                        image_tform_processes=True)
+        d1 = list(g1._generate_arrays(elems))
+        d2 = list(g2._generate_arrays(elems))
+        np.testing.assert_allclose(d1, d2, 1e-4)
+
+    def test_generate_arrays_streaming_dataloader(self) -> None:
+        """ Test that the streaming DataLoader mode produces descriptors in
+        input order, like the default mode. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 5
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2)
+        g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        image_tform_threads=2,
+                                                        streaming_dataloader=True)
+        d1 = list(g1._generate_arrays(elems))
+        d2 = list(g2._generate_arrays(iter(elems)))
+        assert len(d2) == 5
+        np.testing.assert_allclose(d1, d2, 1e-4)
+        assert list(g2._generate_arrays([])) == []
+
+    def test_generate_elements_streaming_dataloader(self) -> None:
+        """ Test that the streaming DataLoader mode consumes the stateful
+        input generator of ``generate_elements`` in this process, skipping
+        input that already has a descriptor. """
+        elems = []
+        for i in range(5):
+            buf = io.BytesIO()
+            PIL.Image.fromarray(np.full((32, 32, 3), i * 50, dtype=np.uint8)) \
+                .save(buf, format='png')
+            elems.append(DataMemoryElement(buf.getvalue(), 'image/png'))
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2)
+        g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        image_tform_threads=2,
+                                                        streaming_dataloader=True)
+        expected = list(g1._generate_arrays(elems))
+
+        # The second input already has a descriptor.
+        def m_has_many(descrs: List[DescriptorElement]) -> List[bool]:
+            return [d.uuid() == elems[1].uuid() for d in descrs]
+
+        with mock.patch.object(DescriptorElement, 'has_many_vectors',
+                               side_effect=m_has_many):
+            actual = list(g2.generate_elements(elems))
+        assert [d.uuid() for d in actual] == [e.uuid() for e in elems]
+        assert not actual[1].has_vector()
+        for i in (0, 2, 3, 4):
+            np.testing.assert_allclose(actual[i].vector(), expected[i], 1e-4)
+
+    def test_generate_arrays_fused_load_transform(self) -> None:
+        """ Test that loading and transforming in one stage produces the same
+        descriptors as separate stages, with threads and processes. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        iter_runtime=True)
+        d1 = list(g1._generate_arrays(elems))
+        for processes in (False, True):
+            g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                            batch_size=2,
+                                                            image_tform_threads=2,
+                                                            iter_runtime=True,
+                                                            image_tform_processes=processes,
+                                                            fused_load_transform=True,
+                                                            persistent_workers=True)
+            d2 = list(g2._generate_arrays(elems))
+            np.testing.assert_allclose(d1, d2, 1e-4)
+            assert set(g2._worker_pools) == {'load_tform_img'}
+
+    @mock.patch('smqtk_descriptors.impls.descriptor_generator.pytorch'
+                '.TorchModuleDescriptorGenerator._ensure_module')
+    def test_invalid_compile_mode(self, _m_ensure_module: mock.MagicMock) -> None:
+        with pytest.raises(ValueError, match="compile mode"):
+            Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                       compile_mode="jit")
+
+    @mock.patch('smqtk_descriptors.impls.descriptor_generator.pytorch'
+                '.TorchModuleDescriptorGenerator._ensure_module')
+    def test_invalid_quantize(self, _m_ensure_module: mock.MagicMock) -> None:
+        with pytest.raises(ValueError, match="quantize mode"):
+            Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                       quantize="int4")
+        with pytest.raises(ValueError, match="only supported on the CPU"):
+            Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                       use_gpu=True,
+                                                       quantize="static")
+
+    @mock.patch('smqtk_descriptors.impls.descriptor_generator.pytorch'
+                '.TorchModuleDescriptorGenerator._ensure_module')
+    def test_invalid_descriptor_dtype(self, _m_ensure_module: mock.MagicMock) -> None:
+        with pytest.raises(ValueError, match="descriptor dtype"):
+            Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                       descriptor_dtype="int8")
+
+    def test_generate_arrays_reduced_precision(self) -> None:
+        """ Test that CPU autocast, or its float32 fallback, and float16
+        descriptors stay close to float32 descriptors. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        normalize=2)
+        d1 = np.array(list(g1._generate_arrays(elems)))
+        g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2,
+                                                        normalize=2,
+                                                        cpu_autocast=True,
+                                                        descriptor_dtype='float16')
+        d2 = np.array(list(g2._generate_arrays(elems)))
+        assert d2.dtype == np.float16
+        assert cosine_drift(d1, d2).max() < 0.01
+
+    def test_cpu_autocast_fallback(self) -> None:
+        """ Test that a failing autocast forward pass falls back to
+        float32. """
+        g = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                       cpu_autocast=True)
+        g._cpu_autocast_supported = True
+        m_module = mock.MagicMock(side_effect=[RuntimeError("no bf16"), 'out'])
+        assert g._run_module(m_module, mock.Mock()) == 'out'
+        assert g._cpu_autocast_supported is False
+        assert m_module.call_count == 2
+
+    def test_generate_layer_arrays(self) -> None:
+        """ Test that several layers are extracted in one pass through the
+        pipeline modes, matching single-layer descriptors. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        for iter_runtime in (False, True):
+            g = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                           batch_size=2,
+                                                           iter_runtime=iter_runtime,
+                                                           global_average_pool=True)
+            d = list(g._generate_arrays(elems))
+            d_layers = list(g.generate_layer_arrays(elems, ['7', '8']))
+            assert len(d_layers) == 3
+            for v, v_layers in zip(d, d_layers):
+                assert set(v_layers) == {'7', '8'}
+                # Pooling the last residual stage is the average pool layer.
+                np.testing.assert_allclose(v_layers['7'], v, 1e-4)
+                np.testing.assert_allclose(v_layers['8'], v, 1e-4)
+
+    def test_generate_arrays_quantized(self) -> None:
+        """ Test that quantized modules produce descriptors close to
+        unquantized ones, reporting their drift. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2)
+        d1 = np.array(list(g1._generate_arrays(elems)))
+        for mode in ('dynamic', 'static'):
+            g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                            batch_size=2,
+                                                            quantize=mode)
+            d2 = np.array(list(g2._generate_arrays(elems)))
+            assert d2.shape == d1.shape
+            assert g2.quantization_drift is not None
+            assert g2.quantization_drift['num_samples'] == 2
+            assert g2.quantization_drift['max_cosine_drift'] < 0.1
+            assert cosine_drift(d1, d2).max() < 0.1
+
+    def test_generate_arrays_compiled(self) -> None:
+        """ Test that compiled modules produce the same descriptors as eager
+        ones, and are cached on disk for later start-ups. """
+        import torch
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                        batch_size=2)
+        d1 = list(g1._generate_arrays(elems))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            g2 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                            batch_size=2,
+                                                            compile_mode='trace',
+                                                            compile_cache_dir=cache_dir)
+            d2 = list(g2._generate_arrays(elems))
+            np.testing.assert_allclose(d1, d2, 1e-4)
+            assert len(os.listdir(cache_dir)) == 1
+
+            g3 = pickle.loads(pickle.dumps(g2))
+            with mock.patch.object(torch.jit, 'trace') as m_trace:
+                d3 = list(g3._generate_arrays(elems))
+            m_trace.assert_not_called()
+            np.testing.assert_allclose(d1, d3, 1e-4)
+
+    def test_generate_arrays_compiled_quantized_cached(self) -> None:
+        """ Test that a cached compiled quantized module is run without
+        quantizing the loaded module again, reporting the drift of the cached
+        module. """
+        elems = [DataFileElement(self.hopper_image_fp, readonly=True)] * 3
+        with tempfile.TemporaryDirectory() as cache_dir:
+            g1 = Resnet50SequentialTorchDescriptorGenerator(self.dummy_image_reader,
+                                                            batch_size=2,
+                                                            compile_mode='trace',
+                                                            compile_cache_dir=cache_dir,
+                                                            quantize='dynamic')
+            d1 = list(g1._generate_arrays(elems))
+            assert g1.quantization_drift is not None
+
+            g2 = pickle.loads(pickle.dumps(g1))
+            with mock.patch.object(g2, '_quantize_module') as m_quantize, \
+                    mock.patch.object(g2, 'measure_quantization_drift',
+                                      wraps=g2.measure_quantization_drift) as m_drift:
+                d2 = list(g2._generate_arrays(elems))
+            m_quantize.assert_not_called()
+            assert g2._quantized_module is None
+            # Drift was measured on the module loaded from the cache.
+            m_drift.assert_called_once()
+            assert g2.quantization_drift == pytest.approx(g1.quantization_drift)
+            np.testing.assert_allclose(d1, d2, 1e-4)
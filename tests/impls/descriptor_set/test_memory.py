@@ -1,7 +1,10 @@
+import os
 import pickle
+import tempfile
 import unittest
 
 import numpy
+import pytest
 
 from smqtk_core.dict import merge_dict
 from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement, BYTES_CONFIG_ENCODING
@@ -330,3 +333,86 @@ class TestMemoryDescriptorSet (unittest.TestCase):
         i.add_many_descriptors(descrs)
         self.assertEqual(set(i.items()),
                          set((d.uuid(), d) for d in descrs))
+
+    def test_journal_requires_cache_element(self) -> None:
+        with pytest.raises(ValueError, match="cache element is required"):
+            MemoryDescriptorSet(journal_filepath='/some/journal.log')
+
+    def test_journal_bad_threshold(self) -> None:
+        with pytest.raises(ValueError, match="compaction threshold"):
+            MemoryDescriptorSet(DataMemoryElement(readonly=False),
+                                journal_filepath='/some/journal.log',
+                                journal_compact_threshold=0)
+
+    def test_journal_appends_and_replays(self) -> None:
+        """ Test that modifications are journaled instead of re-writing the
+        cache snapshot, and that a new instance replays the journal. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            journal_fp = os.path.join(tmp_dir, 'journal.log')
+            cache_elem = DataMemoryElement(readonly=False)
+            i = MemoryDescriptorSet(cache_elem, journal_filepath=journal_fp)
+
+            descrs = [random_descriptor() for _ in range(5)]
+            i.add_many_descriptors(descrs[:3])
+            i.add_descriptor(descrs[3])
+            i.remove_descriptor(descrs[0].uuid())
+            # Snapshot should not have been written yet.
+            self.assertTrue(cache_elem.is_empty())
+            self.assertEqual(i._journal_records, 3)
+
+            # A KeyError part-way through a multi-remove should journal what
+            # was removed before the error.
+            with pytest.raises(KeyError):
+                i.remove_many_descriptors([descrs[1].uuid(), 'not-present'])
+            self.assertEqual(i._journal_records, 4)
+
+            i2 = MemoryDescriptorSet(cache_elem, journal_filepath=journal_fp)
+            self.assertEqual(i2._table, i._table)
+            self.assertEqual(set(i2.keys()),
+                             {descrs[2].uuid(), descrs[3].uuid()})
+
+            # Clearing is journaled as well.
+            i2.clear()
+            i3 = MemoryDescriptorSet(cache_elem, journal_filepath=journal_fp)
+            self.assertEqual(i3._table, {})
+
+    def test_journal_compaction(self) -> None:
+        """ Test that the journal is compacted into the cache snapshot when
+        the threshold is reached. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            journal_fp = os.path.join(tmp_dir, 'journal.log')
+            cache_elem = DataMemoryElement(readonly=False)
+            i = MemoryDescriptorSet(cache_elem, journal_filepath=journal_fp,
+                                    journal_compact_threshold=2)
+            descrs = [random_descriptor() for _ in range(3)]
+            i.add_descriptor(descrs[0])
+            self.assertTrue(cache_elem.is_empty())
+            i.add_descriptor(descrs[1])
+            # Threshold reached: snapshot written, journal truncated.
+            self.assertEqual(pickle.loads(cache_elem.get_bytes()),
+                             {descrs[0].uuid(): descrs[0],
+                              descrs[1].uuid(): descrs[1]})
+            self.assertEqual(os.path.getsize(journal_fp), 0)
+            self.assertEqual(i._journal_records, 0)
+
+            i.add_descriptor(descrs[2])
+            i2 = MemoryDescriptorSet(cache_elem, journal_filepath=journal_fp)
+            self.assertEqual(i2._table, i._table)
+
+    def test_journal_truncated_record(self) -> None:
+        """ Test that a partially written trailing journal record is discarded
+        on load. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            journal_fp = os.path.join(tmp_dir, 'journal.log')
+            cache_elem = DataMemoryElement(readonly=False)
+            i = MemoryDescriptorSet(cache_elem, journal_filepath=journal_fp)
+            d = random_descriptor()
+            i.add_descriptor(d)
+            good_size = os.path.getsize(journal_fp)
+            i.add_descriptor(random_descriptor())
+            with open(journal_fp, 'r+b') as f:
+                f.truncate(good_size + 10)
+
+            i2 = MemoryDescriptorSet(cache_elem, journal_filepath=journal_fp)
+            self.assertEqual(i2._table, {d.uuid(): d})
+            self.assertEqual(os.path.getsize(journal_fp), good_size)
@@ -0,0 +1,164 @@
+import pickle
+import unittest
+
+import numpy
+import pytest
+
+from smqtk_core.configuration import configuration_test_helper
+from smqtk_dataprovider.impls.data_element.memory import DataMemoryElement
+from smqtk_descriptors.impls.descriptor_element.memory import DescriptorMemoryElement
+from smqtk_descriptors.impls.descriptor_set.memory_matrix import MatrixMemoryDescriptorSet
+
+
+RAND_UUID = 0
+
+
+def random_descriptor() -> DescriptorMemoryElement:
+    global RAND_UUID
+    d = DescriptorMemoryElement(RAND_UUID)
+    d.set_vector(numpy.random.rand(64))
+    RAND_UUID += 1
+    return d
+
+
+class TestMatrixMemoryDescriptorSet (unittest.TestCase):
+
+    def test_is_usable(self) -> None:
+        # Always usable because no dependencies.
+        self.assertEqual(MatrixMemoryDescriptorSet.is_usable(), True)
+
+    def test_default_config(self) -> None:
+        # Default should be valid for constructing a new instance.
+        c = MatrixMemoryDescriptorSet.get_default_config()
+        self.assertEqual(MatrixMemoryDescriptorSet.from_config(c).get_config(), c)
+
+    def test_configuration(self) -> None:
+        inst = MatrixMemoryDescriptorSet(DataMemoryElement(), dtype='float32',
+                                         initial_capacity=8)
+        for i in configuration_test_helper(inst):  # type: MatrixMemoryDescriptorSet
+            assert isinstance(i.cache_element, DataMemoryElement)
+            assert i.dtype == 'float32'
+            assert i.initial_capacity == 8
+
+    def test_init_bad_capacity(self) -> None:
+        with pytest.raises(ValueError, match="Initial capacity"):
+            MatrixMemoryDescriptorSet(initial_capacity=0)
+
+    def test_add_many_and_get_vectors(self) -> None:
+        descrs = [random_descriptor() for _ in range(10)]
+        inst = MatrixMemoryDescriptorSet(initial_capacity=2)
+        inst.add_many_descriptors(descrs)
+        self.assertEqual(inst.count(), 10)
+        # Capacity should have grown to fit everything.
+        assert inst._matrix is not None
+        self.assertGreaterEqual(inst._matrix.shape[0], 10)
+
+        q_uuids = [descrs[7].uuid(), descrs[2].uuid(), descrs[7].uuid()]
+        vecs = inst.get_many_vectors(q_uuids)
+        self.assertEqual(len(vecs), 3)
+        numpy.testing.assert_equal(vecs[0], descrs[7].vector())
+        numpy.testing.assert_equal(vecs[1], descrs[2].vector())
+        numpy.testing.assert_equal(vecs[2], descrs[7].vector())
+
+        with pytest.raises(KeyError):
+            inst.get_many_vectors(['not-a-uuid'])
+
+    def test_get_vector_matrix(self) -> None:
+        inst = MatrixMemoryDescriptorSet()
+        self.assertEqual(inst.get_vector_matrix().shape, (0, 0))
+
+        descrs = [random_descriptor() for _ in range(5)]
+        inst.add_many_descriptors(descrs)
+        m = inst.get_vector_matrix()
+        self.assertEqual(m.shape, (5, 64))
+        # Rows align with key order.
+        for uid, row in zip(inst.keys(), m):
+            numpy.testing.assert_equal(row, inst.get_descriptor(uid).vector())
+        # Returned matrix is a copy.
+        m[:] = 0
+        self.assertNotEqual(inst.get_vector_matrix().sum(), 0)
+
+    def test_add_overwrite(self) -> None:
+        d = random_descriptor()
+        inst = MatrixMemoryDescriptorSet()
+        inst.add_descriptor(d)
+        d2 = DescriptorMemoryElement(d.uuid()).set_vector(numpy.ones(64))
+        inst.add_descriptor(d2)
+        self.assertEqual(inst.count(), 1)
+        numpy.testing.assert_equal(inst[d.uuid()].vector(), numpy.ones(64))
+
+    def test_add_dimension_mismatch(self) -> None:
+        inst = MatrixMemoryDescriptorSet()
+        inst.add_descriptor(random_descriptor())
+        d = DescriptorMemoryElement('other').set_vector(numpy.ones(8))
+        with pytest.raises(ValueError, match="dimensionality"):
+            inst.add_descriptor(d)
+        self.assertEqual(inst.count(), 1)
+
+    def test_add_no_vector(self) -> None:
+        inst = MatrixMemoryDescriptorSet()
+        with pytest.raises(ValueError, match="has no vector"):
+            inst.add_descriptor(DescriptorMemoryElement('empty'))
+        self.assertEqual(inst.count(), 0)
+
+    def test_remove(self) -> None:
+        inst = MatrixMemoryDescriptorSet()
+        descrs = [random_descriptor() for _ in range(100)]
+        inst.add_many_descriptors(descrs)
+
+        inst.remove_descriptor(descrs[0].uuid())
+        self.assertEqual(len(inst), 99)
+        self.assertEqual(set(inst.descriptors()), set(descrs[1:]))
+
+        rm_d = descrs[slice(45, 80, 3)]
+        inst.remove_many_descriptors(d.uuid() for d in rm_d)
+        self.assertEqual(len(inst), 99 - len(rm_d))
+        expected = set(descrs[1:]).difference(rm_d)
+        self.assertEqual(set(inst.descriptors()), expected)
+        # Remaining rows are still associated with the correct vectors.
+        for d in expected:
+            numpy.testing.assert_equal(inst[d.uuid()].vector(), d.vector())
+
+        with pytest.raises(KeyError):
+            inst.remove_descriptor(descrs[0].uuid())
+
+    def test_clear(self) -> None:
+        inst = MatrixMemoryDescriptorSet()
+        inst.add_many_descriptors(random_descriptor() for _ in range(10))
+        inst.clear()
+        self.assertEqual(len(inst), 0)
+        self.assertIsNone(inst._matrix)
+        # Dimensionality may change after clearing.
+        inst.add_descriptor(DescriptorMemoryElement(0).set_vector(numpy.ones(3)))
+        self.assertEqual(inst.get_vector_matrix().shape, (1, 3))
+
+    def test_keys_items_has(self) -> None:
+        inst = MatrixMemoryDescriptorSet()
+        descrs = [random_descriptor() for _ in range(20)]
+        inst.add_many_descriptors(descrs)
+        self.assertEqual(set(inst.keys()), set(d.uuid() for d in descrs))
+        self.assertEqual(set(inst.items()), set((d.uuid(), d) for d in descrs))
+        self.assertEqual(set(inst), set(descrs))
+        self.assertTrue(inst.has_descriptor(descrs[4].uuid()))
+        self.assertFalse(inst.has_descriptor('not_an_int'))
+        self.assertIn(descrs[4], inst)
+
+    def test_cache_round_trip(self) -> None:
+        cache_elem = DataMemoryElement(readonly=False)
+        descrs = [random_descriptor() for _ in range(5)]
+        inst = MatrixMemoryDescriptorSet(cache_elem)
+        self.assertTrue(cache_elem.is_empty())
+        inst.add_many_descriptors(descrs)
+        self.assertFalse(cache_elem.is_empty())
+        inst.remove_descriptor(descrs[1].uuid())
+
+        cache = pickle.loads(cache_elem.get_bytes())
+        self.assertEqual(len(cache['uuids']), 4)
+        self.assertEqual(cache['matrix'].shape, (4, 64))
+
+        inst2 = MatrixMemoryDescriptorSet(cache_elem)
+        self.assertEqual(set(inst2.keys()), set(inst.keys()))
+        numpy.testing.assert_equal(
+            inst2.get_many_vectors([descrs[3].uuid()])[0],
+            descrs[3].vector()
+        )
@@ -3,6 +3,7 @@ import unittest.mock as mock
 import unittest
 
 import numpy
+import pytest
 
 from smqtk_descriptors import DescriptorElement
 
@@ -94,6 +95,69 @@ class TestDescriptorElementAbstract (unittest.TestCase):
         for retrieved, expected in zip(retrieved_vectors, [v1, v2]):
             numpy.testing.assert_array_equal(retrieved, expected)
 
+    def test_has_many_vectors(self) -> None:
+        d1 = DummyDescriptorElement('a')
+        d2 = DummyDescriptorElement('b')
+        # Duplicate UUIDs are reported for every position they appear in.
+        d3 = DummyDescriptorElement('a')
+        # noinspection PyTypeHints
+        d1.has_vector = d3.has_vector = mock.Mock(return_value=True)  # type: ignore
+        # noinspection PyTypeHints
+        d2.has_vector = mock.Mock(return_value=False)  # type: ignore
+
+        self.assertEqual(
+            DescriptorElement.has_many_vectors([d1, d2, d3]),
+            [True, False, True]
+        )
+        self.assertEqual(DescriptorElement.has_many_vectors([]), [])
+
+    def test_has_many_vectors_omitted(self) -> None:
+        # Descriptors omitted by an implementation are considered to not have
+        # a vector.
+        d1 = DummyDescriptorElement('a')
+        d2 = DummyDescriptorElement('b')
+        with mock.patch.object(DummyDescriptorElement, '_has_many_vectors',
+                               return_value=iter([('b', True)])) as m:
+            self.assertEqual(
+                DescriptorElement.has_many_vectors([d1, d2]),
+                [False, True]
+            )
+        m.assert_called_once_with([d1, d2])
+
+    def test_has_many_vectors_non_subclass(self) -> None:
+        # Objects that only look like descriptor elements are checked
+        # one at a time.
+        m_elems = [mock.Mock(spec=DescriptorElement) for _ in range(3)]
+        for i, m in enumerate(m_elems):
+            m.uuid.return_value = i
+            m.has_vector.return_value = bool(i % 2)
+        self.assertEqual(DescriptorElement.has_many_vectors(m_elems),
+                         [False, True, False])
+        for m in m_elems:
+            m.has_vector.assert_called_once_with()
+
+    def test_set_many_vectors(self) -> None:
+        d1 = DummyDescriptorElement('a')
+        d2 = DummyDescriptorElement('b')
+        m_elem = mock.Mock(spec=DescriptorElement)
+        v1, v2, v3 = numpy.random.rand(3, 4)
+        with mock.patch.object(DummyDescriptorElement,
+                               '_set_many_vectors') as m_set_many:
+            DescriptorElement.set_many_vectors([d1, m_elem, d2],
+                                               [v1, v2, v3])
+        # Grouped by type, with non-subclasses being set individually.
+        m_set_many.assert_called_once_with([(d1, v1), (d2, v3)])
+        m_elem.set_vector.assert_called_once_with(v2)
+
+    def test_set_many_vectors_mismatched_length(self) -> None:
+        d = mock.Mock(spec=DescriptorElement)
+        with pytest.raises(ValueError, match="not of equal length"):
+            DescriptorElement.set_many_vectors([d, d], [numpy.ones(2)])
+        with pytest.raises(ValueError, match="not of equal length"):
+            DescriptorElement.set_many_vectors([d], [numpy.ones(2)] * 2)
+        # Nothing is set when lengths do not match.
+        d.set_vector.assert_not_called()
+
     def test_hash(self) -> None:
         # Hash of a descriptor element is solely based on the UUID value of
         # that element.
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Generator, Iterable, List, Set
+from typing import Any, Dict, Generator, Iterable, List, Sequence, Set
 import unittest
 import unittest.mock as mock
 
@@ -7,6 +7,7 @@ import pytest
 
 from smqtk_dataprovider import DataElement
 from smqtk_descriptors import DescriptorGenerator, DescriptorElement, DescriptorElementFactory
+from smqtk_descriptors.impls.descriptor_element.memory import DescriptorMemoryElement
 
 
 class DummyDescriptorGenerator (DescriptorGenerator):
@@ -34,6 +35,12 @@ class DummyDescriptorGenerator (DescriptorGenerator):
             yield [i]
         self._post_iterator_check()
 
+    def _generate_layer_arrays(self, data_iter: Iterable[DataElement],
+                               layers: Sequence[str]) -> Iterable[Dict[str, numpy.ndarray]]:
+        # Yield "arrays" of each layer's index for the input index.
+        for i, d in enumerate(data_iter):
+            yield {layer: [i, j] for j, layer in enumerate(layers)}
+
     def _generate_too_many_arrays(self, data_iter: Iterable[DataElement]) -> Generator:
         """
         Swap-in generator to test error checking on over generation.
@@ -411,3 +418,258 @@ class TestDescriptorGeneratorAbstract (unittest.TestCase):
 
         # Complete iteration should cause post-yield method to be called.
         self.inst._post_iterator_check.assert_called_once()
+
+    def test_generate_elements_check_batches(self) -> None:
+        """ Test that existing vectors are checked in windows of the given
+        batch size and that results are still yielded in input order. """
+        data_iter = []
+        for i in range(7):
+            data = mock.Mock(spec=DataElement)
+            data.uuid.return_value = i
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+
+        # Elements with odd UUIDs report as already having a vector.
+        def m_has_many(descrs: List[DescriptorElement]) -> List[bool]:
+            return [bool(d.uuid() % 2) for d in descrs]
+
+        with mock.patch.object(DescriptorElement, 'has_many_vectors',
+                               side_effect=m_has_many) as m_has_many_vectors:
+            actual = list(self.inst.generate_elements(data_iter,
+                                                      check_batch_size=3))
+        assert [len(c[0][0]) for c in m_has_many_vectors.call_args_list] \
+            == [3, 3, 1]
+        assert [e.uuid() for e in actual] == list(range(7))
+        # Only even-UUID elements were computed, in order.
+        for i, e in enumerate(actual):
+            if i % 2:
+                assert not e.has_vector()
+            else:
+                numpy.testing.assert_equal(e.vector(), [i // 2])
+
+    def test_generate_elements_bad_check_batch_size(self) -> None:
+        with pytest.raises(ValueError, match="Check batch size"):
+            list(self.inst.generate_elements([], check_batch_size=0))
+
+    def test_generate_elements_set_batches(self) -> None:
+        """ Test that computed vectors are stored in batches of the given size
+        and that elements are yielded in input order only after their vectors
+        have been stored. """
+        data_iter = []
+        for i in range(7):
+            data = mock.Mock(spec=DataElement)
+            data.uuid.return_value = i
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+
+        # Elements with UUIDs 1 and 4 report as already having a vector.
+        def m_has_many(descrs: List[DescriptorElement]) -> List[bool]:
+            return [d.uuid() in (1, 4) for d in descrs]
+
+        set_batches = []
+
+        def m_set_many(descrs: List[DescriptorElement],
+                       vecs: List[numpy.ndarray]) -> None:
+            set_batches.append([d.uuid() for d in descrs])
+            for d, v in zip(descrs, vecs):
+                d.set_vector(v)
+
+        with mock.patch.object(DescriptorElement, 'has_many_vectors',
+                               side_effect=m_has_many), \
+                mock.patch.object(DescriptorElement, 'set_many_vectors',
+                                  side_effect=m_set_many):
+            actual = []
+            for e in self.inst.generate_elements(data_iter,
+                                                 set_batch_size=2):
+                # Computed elements always have their vector when yielded.
+                assert e.uuid() in (1, 4) or e.has_vector()
+                actual.append(e.uuid())
+        assert actual == list(range(7))
+        assert set_batches == [[0, 2], [3, 5], [6]]
+
+    def test_generate_elements_set_batches_failure(self) -> None:
+        """ Test that vectors computed before generation fails part way
+        through a batch are still stored. """
+        data_iter = []
+        for i in range(3):
+            data = mock.Mock(spec=DataElement)
+            data.uuid.return_value = i
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+
+        def failing(data_iter: Iterable[DataElement]) -> Generator:
+            for i, _ in enumerate(list(data_iter)[:-1]):
+                yield [i]
+            raise RuntimeError("model failure")
+        self.inst._generate_arrays = failing  # type: ignore
+
+        with mock.patch.object(DescriptorElement,
+                               'set_many_vectors') as m_set_many:
+            with pytest.raises(RuntimeError, match="model failure"):
+                list(self.inst.generate_elements(data_iter, set_batch_size=4))
+        m_set_many.assert_called_once()
+        assert [d.uuid() for d in m_set_many.call_args[0][0]] == [0, 1]
+
+    def test_generate_elements_bad_set_batch_size(self) -> None:
+        with pytest.raises(ValueError, match="Set batch size"):
+            list(self.inst.generate_elements([], set_batch_size=0))
+
+    def test_generate_elements_write_behind(self) -> None:
+        """ Test that computed vectors are all stored by the time write-behind
+        generation completes. """
+        data_iter = []
+        for i in range(5):
+            data = mock.Mock(spec=DataElement)
+            data.uuid.return_value = i
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+        actual = list(self.inst.generate_elements(data_iter, set_batch_size=2,
+                                                  write_behind_bytes=1))
+        assert [e.uuid() for e in actual] == list(range(5))
+        for i, e in enumerate(actual):
+            numpy.testing.assert_equal(e.vector(), [i])
+
+    def test_generate_elements_write_behind_error(self) -> None:
+        """ Test that a background storage error is raised from generation. """
+        data = mock.Mock(spec=DataElement)
+        data.uuid.return_value = 0
+        data.content_type.return_value = 'image/png'
+        with mock.patch.object(DescriptorElement, 'set_many_vectors',
+                               side_effect=OSError("cannot write")):
+            with pytest.raises(OSError, match="cannot write"):
+                list(self.inst.generate_elements([data],
+                                                 write_behind_bytes=1024))
+
+    def test_generate_elements_bad_write_behind_bytes(self) -> None:
+        with pytest.raises(ValueError, match="Write-behind bytes"):
+            list(self.inst.generate_elements([], write_behind_bytes=0))
+
+    def test_generate_layer_arrays_unsupported(self) -> None:
+        """ Test that multi-layer generation is not supported by default. """
+        with pytest.raises(NotImplementedError, match="multi-layer"):
+            DescriptorGenerator._generate_layer_arrays(self.inst, [], ['a'])
+
+    def test_generate_layer_arrays(self) -> None:
+        data_iter = []
+        for i in range(3):
+            data = mock.Mock(spec=DataElement)
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+        actual = list(self.inst.generate_layer_arrays(data_iter, ['a', 'b']))
+        assert actual == [{'a': [i, 0], 'b': [i, 1]} for i in range(3)]
+
+    def test_generate_layer_arrays_no_layers(self) -> None:
+        with pytest.raises(ValueError, match="At least one layer"):
+            self.inst.generate_layer_arrays([], [])
+
+    def test_generate_layer_elements(self) -> None:
+        """ Test that the descriptor elements of each layer come from their
+        own factory, that inputs are computed once if any layer is missing a
+        vector, that only missing vectors are stored and that results are
+        yielded in input order. """
+        data_iter = []
+        for i in range(6):
+            data = mock.Mock(spec=DataElement)
+            data.uuid.return_value = i
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+        # Layer "a" elements with UUIDs 1 and 2, and layer "b" elements with
+        # UUIDs 1 and 3 already have a vector.
+        layer_elems: Dict[str, List[DescriptorElement]] = {}
+        layer_facts: Dict[str, DescriptorElementFactory] = {}
+        for layer, has in (('a', (1, 2)), ('b', (1, 3))):
+            layer_elems[layer] = [DescriptorMemoryElement(i) for i in range(6)]
+            for i in has:
+                layer_elems[layer][i].set_vector(numpy.array([-1]))
+            layer_facts[layer] = mock.MagicMock(spec=DescriptorElementFactory)
+            layer_facts[layer].new_descriptor.side_effect = \
+                layer_elems[layer].__getitem__
+
+        set_batches = []
+
+        def m_set_many(descrs: List[DescriptorElement],
+                       vecs: List[numpy.ndarray]) -> None:
+            set_batches.append([d.uuid() for d in descrs])
+            for d, v in zip(descrs, vecs):
+                d.set_vector(v)
+
+        with mock.patch.object(DescriptorElement, 'set_many_vectors',
+                               side_effect=m_set_many):
+            actual = list(self.inst.generate_layer_elements(
+                data_iter, layer_facts, set_batch_size=2, check_batch_size=4
+            ))
+        assert actual == [{'a': layer_elems['a'][i], 'b': layer_elems['b'][i]}
+                          for i in range(6)]
+        # Inputs 0, 2, 3, 4, 5 were computed, with only missing vectors
+        # stored, in batches of two inputs.
+        assert set_batches == [[0], [0, 2], [3, 4], [4], [5], [5]]
+        numpy.testing.assert_equal(layer_elems['a'][3].vector(), [2, 0])
+        numpy.testing.assert_equal(layer_elems['b'][2].vector(), [1, 1])
+        for layer, i in (('a', 1), ('a', 2), ('b', 1), ('b', 3)):
+            numpy.testing.assert_equal(layer_elems[layer][i].vector(), [-1])
+
+    def test_generate_layer_elements_overwrite(self) -> None:
+        data = mock.Mock(spec=DataElement)
+        data.uuid.return_value = 0
+        data.content_type.return_value = 'image/png'
+        fact = mock.MagicMock(spec=DescriptorElementFactory)
+        m_de = fact.new_descriptor.return_value
+        with mock.patch.object(DescriptorElement,
+                               'has_many_vectors') as m_has_many:
+            actual = list(self.inst.generate_layer_elements(
+                [data], {'a': fact}, overwrite=True
+            ))
+        m_has_many.assert_not_called()
+        assert actual == [{'a': m_de}]
+        m_de.set_vector.assert_called_once_with([0, 0])
+
+    def test_generate_layer_elements_write_behind(self) -> None:
+        """ Test that computed vectors of all layers are stored by the time
+        write-behind generation completes. """
+        data_iter = []
+        for i in range(3):
+            data = mock.Mock(spec=DataElement)
+            data.uuid.return_value = i
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+        fact = DescriptorElementFactory(DescriptorMemoryElement, {})
+        actual = list(self.inst.generate_layer_elements(
+            data_iter, {'a': fact, 'b': fact}, set_batch_size=2,
+            write_behind_bytes=1
+        ))
+        assert [e['a'].uuid() for e in actual] == list(range(3))
+        for i, e in enumerate(actual):
+            numpy.testing.assert_equal(e['a'].vector(), [i, 0])
+            numpy.testing.assert_equal(e['b'].vector(), [i, 1])
+
+    def test_generate_layer_elements_under_produced(self) -> None:
+        data_iter = []
+        for i in range(3):
+            data = mock.Mock(spec=DataElement)
+            data.uuid.return_value = i
+            data.content_type.return_value = 'image/png'
+            data_iter.append(data)
+
+        def too_few(data_iter: Iterable[DataElement],
+                    layers: Sequence[str]) -> Generator:
+            for i, _ in enumerate(list(data_iter)[:-1]):
+                yield {layer: [i] for layer in layers}
+        self.inst._generate_layer_arrays = too_few  # type: ignore
+        with pytest.raises(IndexError, match="under-produced"):
+            list(self.inst.generate_layer_elements(
+                data_iter, {'a': DescriptorElementFactory.from_config({
+                    'type': 'smqtk_descriptors.impls.descriptor_element.memory.DescriptorMemoryElement',
+                    'smqtk_descriptors.impls.descriptor_element.memory.DescriptorMemoryElement': {}
+                })}
+            ))
+
+    def test_generate_layer_elements_bad_args(self) -> None:
+        fact = mock.MagicMock(spec=DescriptorElementFactory)
+        with pytest.raises(ValueError, match="At least one layer factory"):
+            list(self.inst.generate_layer_elements([], {}))
+        with pytest.raises(ValueError, match="Check batch size"):
+            list(self.inst.generate_layer_elements([], {'a': fact},
+                                                   check_batch_size=0))
+        with pytest.raises(ValueError, match="Set batch size"):
+            list(self.inst.generate_layer_elements([], {'a': fact},
+                                                   set_batch_size=0))
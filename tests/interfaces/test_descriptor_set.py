@@ -85,3 +85,12 @@ class TestDescriptorSetAbstract (unittest.TestCase):
         r = inst.get_many_vectors([])
         assert r == []
         m_de_gmv.assert_called_once_with([])
+
+    def test_has_many_descriptors(self) -> None:
+        """ Test that the default implementation checks UUIDs one at a time,
+        in the order given. """
+        inst = DummyDescriptorSet()
+        # noinspection PyTypeHints
+        inst.has_descriptor = mock.Mock(side_effect=lambda u: u % 2 == 0)  # type: ignore
+        assert inst.has_many_descriptors(iter([2, 3, 4])) == [True, False, True]
+        assert inst.has_many_descriptors([]) == []
@@ -0,0 +1,161 @@
+import asyncio
+import concurrent.futures
+import random
+from typing import Any, AsyncIterator, Awaitable, List
+import unittest
+
+import pytest
+
+from smqtk_descriptors.utils.async_parallel import async_parallel_map
+
+
+def _run(coro: Awaitable) -> Any:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def _collect(it: AsyncIterator) -> List:
+    return [r async for r in it]
+
+
+def _square(x: int) -> int:
+    return x * x
+
+
+class TestAsyncParallelMap (unittest.TestCase):
+
+    def test_coroutine_ordered(self) -> None:
+        async def work(x: int) -> int:
+            await asyncio.sleep(random.random() * 0.01)
+            return x * x
+
+        r = _run(_collect(async_parallel_map(work, range(100), cores=8)))
+        assert r == [x * x for x in range(100)]
+
+    def test_coroutine_unordered(self) -> None:
+        async def work(x: int) -> int:
+            await asyncio.sleep(random.random() * 0.01)
+            return x * x
+
+        r = _run(_collect(async_parallel_map(work, range(100), cores=8,
+                                             ordered=False)))
+        assert sorted(r) == [x * x for x in range(100)]
+
+    def test_coroutine_concurrency_limit(self) -> None:
+        running = 0
+        max_running = 0
+
+        async def work(x: int) -> int:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.005)
+            running -= 1
+            return x
+
+        r = _run(_collect(async_parallel_map(work, range(50), cores=3)))
+        assert r == list(range(50))
+        assert max_running == 3
+
+    def test_threaded(self) -> None:
+        r = _run(_collect(async_parallel_map(_square, range(100), cores=4)))
+        assert r == [x * x for x in range(100)]
+
+    def test_multiprocess(self) -> None:
+        r = _run(_collect(async_parallel_map(_square, range(100), cores=2,
+                                             use_multiprocessing=True)))
+        assert r == [x * x for x in range(100)]
+
+    def test_given_executor(self) -> None:
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            r = _run(_collect(async_parallel_map(_square, range(10),
+                                                 executor=executor)))
+            assert r == [x * x for x in range(10)]
+            # Not shut down by the map.
+            assert executor.submit(_square, 3).result() == 9
+
+    def test_async_and_fill_void(self) -> None:
+        async def agen() -> AsyncIterator[int]:
+            for i in range(5):
+                yield i
+
+        def add(a: int, b: int) -> int:
+            return a + b
+
+        r = _run(_collect(async_parallel_map(add, agen(), range(3))))
+        assert r == [0, 2, 4]
+        r = _run(_collect(async_parallel_map(add, agen(), range(3),
+                                             fill_void=10)))
+        assert r == [0, 2, 4, 13, 14]
+
+    def test_buffered_input_limited(self) -> None:
+        pulled: List[int] = []
+
+        def gen() -> Any:
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+
+        async def work(x: int) -> int:
+            return x
+
+        async def take_one() -> int:
+            it = async_parallel_map(work, gen(), cores=1, buffer_factor=1)
+            r = await it.__anext__()
+            await it.aclose()
+            return r
+
+        assert _run(take_one()) == 0
+        # 2 * floor(1 * 1) + 1 items in flight.
+        assert len(pulled) == 3
+
+    def test_exception(self) -> None:
+        async def work(x: int) -> int:
+            if x == 5:
+                raise RuntimeError("bad item")
+            return x
+
+        with pytest.raises(RuntimeError, match="bad item"):
+            _run(_collect(async_parallel_map(work, range(20))))
+        with pytest.raises(RuntimeError, match="bad item"):
+            _run(_collect(async_parallel_map(work, range(20),
+                                             ordered=False)))
+
+    def test_cancel_while_waiting(self) -> None:
+        """ Test that work is canceled when the consumer is canceled while
+        waiting for the next result, in both modes. """
+        for ordered in (True, False):
+            started = 0
+            canceled = 0
+
+            async def work(x: int) -> int:
+                nonlocal started, canceled
+                started += 1
+                try:
+                    await asyncio.Event().wait()
+                except asyncio.CancelledError:
+                    canceled += 1
+                    raise
+                return x
+
+            async def cancel_next() -> None:
+                it = async_parallel_map(work, range(4), cores=2,
+                                        ordered=ordered)
+                task = asyncio.ensure_future(it.__anext__())
+                await asyncio.sleep(0.01)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                # Let canceled work observe its cancellation.
+                await asyncio.sleep(0.01)
+
+            _run(cancel_next())
+            assert started == 2
+            assert canceled == 2
+
+    def test_invalid_buffer_factor(self) -> None:
+        with pytest.raises(ValueError, match="buffer_factor"):
+            async_parallel_map(_square, [1], buffer_factor=0)
@@ -0,0 +1,103 @@
+import threading
+import time
+from typing import Iterator, List
+import unittest
+
+import pytest
+
+from smqtk_descriptors.utils.batching import iter_batches
+from smqtk_descriptors.utils.parallel import parallel_map
+
+
+class TestIterBatches (unittest.TestCase):
+
+    def test_full_batches(self) -> None:
+        assert list(iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+        assert list(iter_batches([], 3)) == []
+
+    def test_deadline_full_batches(self) -> None:
+        """ Test that plentiful input still makes full batches. """
+        r = list(iter_batches(range(100), 10, max_wait=1.))
+        assert r == [list(range(i, i + 10)) for i in range(0, 100, 10)]
+        assert list(iter_batches([], 3, max_wait=0.)) == []
+
+    def test_deadline_partial_batch(self) -> None:
+        """ Test that a trickling input yields a partial batch after the
+        deadline instead of waiting for the batch to fill. """
+        release = threading.Event()
+
+        def trickle() -> Iterator[int]:
+            yield 0
+            yield 1
+            release.wait()
+            yield 2
+
+        it = iter_batches(trickle(), 3, max_wait=0.05)
+        start = time.monotonic()
+        assert next(it) == [0, 1]
+        assert time.monotonic() - start < 1.
+        release.set()
+        assert list(it) == [[2]]
+
+    def test_deadline_slow_consumer(self) -> None:
+        """ Test that the deadline of a batch runs from when its first item
+        was pulled, so that items pulled while the consumer processed the
+        previous batch do not wait ``max_wait`` again. """
+        release = threading.Event()
+        end = threading.Event()
+
+        def trickle() -> Iterator[int]:
+            yield 0
+            yield 1
+            release.wait()
+            yield 2
+            end.wait()
+
+        it = iter_batches(trickle(), 3, max_wait=0.3)
+        assert next(it) == [0, 1]
+        # A slow consumer, during which item 2 is pulled.
+        release.set()
+        time.sleep(0.5)
+        start = time.monotonic()
+        assert next(it) == [2]
+        assert time.monotonic() - start < 0.15
+        end.set()
+        assert list(it) == []
+
+    def test_deadline_bounded_read_ahead(self) -> None:
+        pulled: List[int] = []
+
+        def gen() -> Iterator[int]:
+            for i in range(100):
+                pulled.append(i)
+                yield i
+
+        it = iter_batches(gen(), 4, max_wait=0.)
+        next(it)
+        time.sleep(0.1)
+        # One batch yielded, one buffered.
+        assert len(pulled) <= 8
+        it.close()
+
+    def test_deadline_error(self) -> None:
+        def gen() -> Iterator[int]:
+            yield 0
+            raise RuntimeError("bad input")
+
+        it = iter_batches(gen(), 4, max_wait=0.01)
+        assert next(it) == [0]
+        with pytest.raises(RuntimeError, match="bad input"):
+            next(it)
+
+    def test_deadline_stops_parallel_map(self) -> None:
+        pm = parallel_map(abs, range(1000), cores=2)
+        it = iter_batches(pm, 4, max_wait=0.01)
+        next(it)
+        it.close()
+        assert pm.stopped()
+
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError, match="batch_size"):
+            iter_batches([], 0)
+        with pytest.raises(ValueError, match="max_wait"):
+            iter_batches([], 1, max_wait=-1)
@@ -1,8 +1,26 @@
+import gc
+import math
+import os
+import pickle
 import random
-from typing import Any, Callable, List
+import threading
+import time
+from typing import Any, Callable, List, Set
 import unittest
+import weakref
 
-from smqtk_descriptors.utils.parallel import parallel_map
+import numpy
+import pytest
+
+from smqtk_descriptors.utils.parallel import (
+    _from_shared,
+    _SharedArrayHandle,
+    _to_shared,
+    close_worker_pools,
+    parallel_map,
+    ParallelWorkerPool,
+    shared_memory,
+)
 
 
 class TestParallelMap (unittest.TestCase):
@@ -62,6 +80,140 @@ class TestParallelMap (unittest.TestCase):
             parallel_map(raise_ex, [1], use_multiprocessing=True)
         )
 
+    def test_chunked_ordered_threaded(self) -> None:
+        r = list(parallel_map(self.test_func, self.test_string,
+                              ordered=True, use_multiprocessing=False,
+                              chunksize=7))
+        self.assertEqual(r, self.expected)
+
+    def test_chunked_ordered_multiprocess(self) -> None:
+        r = list(parallel_map(self.test_func, self.test_string,
+                              ordered=True, use_multiprocessing=True,
+                              chunksize=7))
+        self.assertEqual(r, self.expected)
+
+    def test_chunked_unordered_multiprocess(self) -> None:
+        r = list(parallel_map(self.test_func, self.test_string,
+                              ordered=False, use_multiprocessing=True,
+                              chunksize=7))
+        self.assertEqual(sorted(r), sorted(self.expected))
+
+    def test_chunked_auto(self) -> None:
+        for use_mp in (False, True):
+            it = parallel_map(self.test_func, self.test_string,
+                              ordered=True, use_multiprocessing=use_mp,
+                              chunksize='auto')
+            r = list(it)
+            self.assertEqual(r, self.expected)
+            # Cheap work grows chunks beyond single items.
+            self.assertGreater(it.feeder_thread.chunksize, 1)
+
+    def test_chunked_exception(self) -> None:
+        def raise_ex(x: int) -> int:
+            if x == 13:
+                raise RuntimeError("Expected exception")
+            return x
+
+        with pytest.raises(RuntimeError, match="Expected exception"):
+            list(parallel_map(raise_ex, range(100),
+                              use_multiprocessing=False, chunksize=4))
+
+    def test_invalid_chunksize(self) -> None:
+        for bad in (0, -1, 1.5, 'fast'):
+            with pytest.raises(ValueError, match="chunksize"):
+                parallel_map(ord, 'abc', chunksize=bad)
+
+    def test_max_outstanding_ordered(self) -> None:
+        """ Test that a late head-of-line item stops the feeding of more input
+        once the outstanding limit is reached. """
+        head_release = threading.Event()
+        pulled: List[int] = []
+
+        def work(x: int) -> int:
+            if x == 0:
+                head_release.wait()
+            return x
+
+        def gen() -> Any:
+            for i in range(100):
+                pulled.append(i)
+                yield i
+
+        it = parallel_map(work, gen(), cores=4, ordered=True,
+                          max_outstanding=5)
+        it.start_workers()
+        time.sleep(0.2)
+        # Outstanding items plus the one waiting to be fed.
+        assert len(pulled) <= 6
+        assert len(it.result_heap) <= 5
+        head_release.set()
+        assert list(it) == list(range(100))
+
+    def test_max_outstanding_unordered(self) -> None:
+        r = list(parallel_map(self.test_func, self.test_string,
+                              ordered=False, use_multiprocessing=True,
+                              max_outstanding=3))
+        self.assertEqual(sorted(r), sorted(self.expected))
+
+    def test_invalid_max_outstanding(self) -> None:
+        for bad in (0, -1, 2.5):
+            with pytest.raises(ValueError, match="max_outstanding"):
+                parallel_map(abs, [1], max_outstanding=bad)
+
+    def test_metrics_disabled(self) -> None:
+        it = parallel_map(abs, range(10))
+        assert list(it) == list(range(10))
+        assert it.metrics is None
+
+    def test_metrics(self) -> None:
+        for use_mp in (False, True):
+            it = parallel_map(self.test_func, self.test_string, cores=3,
+                              use_multiprocessing=use_mp, chunksize=10,
+                              collect_metrics=True)
+            assert it.metrics is not None
+            assert it.metrics.summary()['items_fed'] == 0
+            r = list(it)
+            self.assertEqual(r, self.expected)
+            summary = it.metrics.summary()
+            n = len(self.expected)
+            assert summary['items_fed'] == n
+            assert summary['items_completed'] == n
+            assert summary['chunks_completed'] == n // 10
+            assert summary['elapsed_seconds'] > 0
+            assert summary['items_per_second'] > 0
+            assert summary['reorder_heap_size'] == 0
+            assert len(summary['workers']) == 3
+            assert sum(w['items'] for w in summary['workers']) == n
+            assert all(w['idle_seconds'] >= 0 and w['work_seconds'] >= 0
+                       for w in summary['workers'])
+            histogram = summary['work_latency_histogram']
+            assert histogram[-1][0] == float('inf')
+            assert sum(c for _, c in histogram) == n
+            # Final summary does not change after iteration.
+            assert it.metrics.summary()['elapsed_seconds'] == \
+                summary['elapsed_seconds']
+
+    def test_metrics_blocking(self) -> None:
+        """ Test that a slow consumer shows as a blocked feeder and a slow
+        work function as a blocked consumer. """
+        def slow(x: int) -> int:
+            time.sleep(0.01)
+            return x
+
+        it = parallel_map(abs, range(100), cores=1, buffer_factor=1,
+                          collect_metrics=True)
+        for _ in it:
+            time.sleep(0.002)
+        assert it.metrics is not None
+        assert it.metrics.summary()['feeder_blocked_seconds'] > 0.05
+
+        it = parallel_map(slow, range(20), cores=1, collect_metrics=True)
+        assert list(it) == list(range(20))
+        assert it.metrics is not None
+        summary = it.metrics.summary()
+        assert summary['consumer_blocked_seconds'] > 0.1
+        assert summary['max_reorder_heap_size'] == 0
+
     def test_multisequence(self) -> None:
         def test_func(a: int, b: int, c: int) -> int:
             return a + b + c
@@ -157,3 +309,212 @@ class TestParallelMap (unittest.TestCase):
             list(g4),
             expected
         )
+
+
+def _double_array(a: numpy.ndarray) -> numpy.ndarray:
+    return a * 2
+
+
+def _shm_names() -> Set[str]:
+    return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+
+@pytest.mark.skipif(shared_memory is None,
+                    reason="Shared memory requires python 3.8+")
+class TestParallelMapSharedMemory (unittest.TestCase):
+
+    def test_handle_round_trip(self) -> None:
+        a = numpy.random.rand(16, 8).astype(numpy.float32)[:, ::2]
+        h = pickle.loads(pickle.dumps(_SharedArrayHandle(a)))
+        numpy.testing.assert_equal(h.take(), a)
+
+    def test_to_from_shared(self) -> None:
+        big = numpy.random.rand(128)
+        small = numpy.ones(2)
+        packed = _to_shared((big, [small, big], 'x'), 64)
+        assert isinstance(packed[0], _SharedArrayHandle)
+        assert packed[1][0] is small
+        assert isinstance(packed[1][1], _SharedArrayHandle)
+        unpacked = _from_shared(packed)
+        numpy.testing.assert_equal(unpacked[0], big)
+        numpy.testing.assert_equal(unpacked[1][1], big)
+        assert unpacked[2] == 'x'
+
+    def test_multiprocess_arrays(self) -> None:
+        before = _shm_names()
+        arrays = [numpy.random.rand(64, 64) for _ in range(20)]
+        r = list(parallel_map(_double_array, arrays,
+                              use_multiprocessing=True, cores=2,
+                              shared_memory_min_bytes=1024))
+        for a, b in zip(arrays, r):
+            numpy.testing.assert_equal(b, a * 2)
+        # All shared memory blocks have been freed.
+        assert _shm_names() == before
+
+    def test_multiprocess_early_stop_frees(self) -> None:
+        before = _shm_names()
+        arrays = (numpy.random.rand(64, 64) for _ in range(100))
+        it = parallel_map(_double_array, arrays,
+                          use_multiprocessing=True, cores=2,
+                          shared_memory_min_bytes=1024)
+        next(it)
+        it.stop()
+        assert _shm_names() == before
+
+    def test_threaded_ignored(self) -> None:
+        a = numpy.ones(1024)
+        r = list(parallel_map(lambda x: x, [a], use_multiprocessing=False,
+                              shared_memory_min_bytes=1))
+        # Threads share memory, so the very same object is returned.
+        assert r[0] is a
+
+
+class TestParallelWorkerPool (unittest.TestCase):
+
+    def _check_reuse(self, use_multiprocessing: bool) -> None:
+        expected = [math.factorial(i) for i in range(50)]
+        with ParallelWorkerPool(cores=2,
+                                use_multiprocessing=use_multiprocessing) \
+                as pool:
+            workers = list(pool._workers)
+            for _ in range(3):
+                r = list(parallel_map(math.factorial, range(50), pool=pool))
+                assert r == expected
+            r = list(pool.map(math.factorial, range(50), ordered=False,
+                              chunksize='auto'))
+            assert sorted(r) == expected
+            # The same workers served every call.
+            assert pool._workers == workers
+            assert all(w.is_alive() for w in workers)
+        assert not any(w.is_alive() for w in workers)
+
+    def test_reuse_threaded(self) -> None:
+        self._check_reuse(False)
+
+    def test_reuse_multiprocess(self) -> None:
+        self._check_reuse(True)
+
+    def test_chained_jobs(self) -> None:
+        # Concurrent jobs on the same pool, one consuming the other.
+        for use_mp in (False, True):
+            with ParallelWorkerPool(cores=2,
+                                    use_multiprocessing=use_mp) as pool:
+                g1 = pool.map(abs, range(-300, 0))
+                g2 = pool.map(math.factorial, g1, chunksize=5)
+                assert list(g2) == [math.factorial(i)
+                                    for i in range(300, 0, -1)]
+
+    def test_exception_keeps_workers(self) -> None:
+        for use_mp in (False, True):
+            with ParallelWorkerPool(cores=2,
+                                    use_multiprocessing=use_mp) as pool:
+                with pytest.raises(ValueError, match="negative"):
+                    list(pool.map(math.factorial, [1, 2, -1] * 10))
+                assert list(pool.map(abs, [-1, -2])) == [1, 2]
+
+    def test_early_stop(self) -> None:
+        with ParallelWorkerPool(cores=2) as pool:
+            it = pool.map(abs, range(-10000, 0))
+            assert next(it) == 10000
+            it.stop()
+            assert list(pool.map(abs, [-3])) == [3]
+
+    def test_chunks_in_flight_limited(self) -> None:
+        pulled = []
+
+        def gen() -> Any:
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+
+        with ParallelWorkerPool(cores=1, buffer_factor=1) as pool:
+            assert pool.max_chunks_in_flight == 3
+            it = pool.map(abs, gen())
+            assert next(it) == 0
+            time.sleep(0.1)
+            # Fed chunks plus the one waiting to be fed.
+            assert len(pulled) <= pool.max_chunks_in_flight + 2
+            assert list(it) == list(range(1, 1000))
+
+    def test_max_outstanding(self) -> None:
+        with ParallelWorkerPool(cores=2) as pool:
+            r = list(pool.map(abs, range(-50, 0), max_outstanding=2))
+        assert r == list(range(50, 0, -1))
+
+    def test_metrics(self) -> None:
+        with ParallelWorkerPool(cores=2) as pool:
+            it = pool.map(abs, range(50), collect_metrics=True)
+            assert list(it) == list(range(50))
+            assert it.metrics is not None
+            summary = it.metrics.summary()
+            assert summary['items_completed'] == 50
+            assert len(summary['workers']) == 2
+
+    def test_invalid_options(self) -> None:
+        with ParallelWorkerPool(cores=1) as pool:
+            with pytest.raises(ValueError, match="not supported"):
+                parallel_map(abs, [1], pool=pool, cores=2)
+            with pytest.raises(ValueError, match="chunksize"):
+                pool.map(abs, [1], chunksize=0)
+            with pytest.raises(ValueError, match="max_outstanding"):
+                pool.map(abs, [1], max_outstanding=0)
+
+    def test_unpicklable_function_multiprocess(self) -> None:
+        with ParallelWorkerPool(cores=1, use_multiprocessing=True) as pool:
+            with pytest.raises((pickle.PicklingError, AttributeError)):
+                pool.map(lambda x: x, [1])
+
+    def test_closed(self) -> None:
+        pool = ParallelWorkerPool(cores=1)
+        it = pool.map(abs, [-1])
+        pool.close()
+        pool.close()
+        assert pool.closed
+        with pytest.raises(RuntimeError, match="closed"):
+            pool.map(abs, [-1])
+        with pytest.raises(RuntimeError, match="closed"):
+            next(it)
+
+    def test_close_stops_running_job(self) -> None:
+        pool = ParallelWorkerPool(cores=2)
+        it = pool.map(abs, range(-10000, 0))
+        next(it)
+        pool.close()
+        assert it.stopped()
+
+    def test_close_worker_pools(self) -> None:
+        """ Test that pools are closed and removed, releasing their workers,
+        including from a finalizer of their owner. """
+        class Owner (object):
+            pass
+        owner = Owner()
+        pools = {'a': ParallelWorkerPool(cores=2),
+                 'b': ParallelWorkerPool(cores=1)}
+        workers = [w for p in pools.values() for w in p._workers]
+        all_pools = list(pools.values())
+        finalizer = weakref.finalize(owner, close_worker_pools, pools)
+        del owner
+        gc.collect()
+        assert not finalizer.alive
+        assert pools == {}
+        assert all(p.closed for p in all_pools)
+        for w in workers:
+            w.join(timeout=5)
+            assert not w.is_alive()
+        close_worker_pools(pools)
+
+    @pytest.mark.skipif(shared_memory is None,
+                        reason="Shared memory requires python 3.8+")
+    def test_shared_memory(self) -> None:
+        before = _shm_names()
+        arrays = [numpy.random.rand(32, 32) for _ in range(20)]
+        with ParallelWorkerPool(cores=2, use_multiprocessing=True,
+                                shared_memory_min_bytes=1024) as pool:
+            for _ in range(2):
+                r = list(pool.map(_double_array, arrays))
+                for a, b in zip(arrays, r):
+                    numpy.testing.assert_equal(b, a * 2)
+            it = pool.map(_double_array, iter(arrays))
+            next(it)
+            it.stop()
+        assert _shm_names() == before
@@ -0,0 +1,86 @@
+import threading
+import unittest
+import unittest.mock as mock
+
+import numpy
+import pytest
+
+from smqtk_descriptors import DescriptorElement
+from smqtk_descriptors.impls.descriptor_element.memory import DescriptorMemoryElement
+from smqtk_descriptors.utils.write_behind import WriteBehindVectorWriter
+
+
+class TestWriteBehindVectorWriter (unittest.TestCase):
+
+    def test_bad_max_bytes(self) -> None:
+        with pytest.raises(ValueError, match="positive integer"):
+            WriteBehindVectorWriter(0)
+
+    def test_writes(self) -> None:
+        elems = [DescriptorMemoryElement(i) for i in range(6)]
+        vecs = numpy.random.rand(6, 4)
+        with WriteBehindVectorWriter(1024) as writer:
+            writer.submit(elems[:3], vecs[:3])
+            writer.submit(elems[3:], vecs[3:])
+            writer.flush()
+            self.assertEqual(writer.outstanding_bytes, 0)
+        for e, v in zip(elems, vecs):
+            numpy.testing.assert_equal(e.vector(), v)
+
+    def test_close_writes_outstanding(self) -> None:
+        elems = [DescriptorMemoryElement(i) for i in range(3)]
+        writer = WriteBehindVectorWriter(1024)
+        writer.submit(elems, numpy.ones((3, 2)))
+        writer.close()
+        self.assertTrue(all(e.has_vector() for e in elems))
+        with pytest.raises(RuntimeError, match="closed writer"):
+            writer.submit(elems, numpy.ones((3, 2)))
+
+    def test_back_pressure(self) -> None:
+        """ Test that submission blocks while the outstanding byte limit would
+        be exceeded. """
+        release = threading.Event()
+        started = threading.Event()
+
+        def m_set_many(*_: object) -> None:
+            started.set()
+            release.wait()
+
+        e = DescriptorMemoryElement(0)
+        v = numpy.ones(4)  # 32 bytes
+        with mock.patch.object(DescriptorElement, 'set_many_vectors',
+                               side_effect=m_set_many):
+            writer = WriteBehindVectorWriter(48)
+            # A first batch is always accepted, even if over the limit.
+            writer.submit([e, e], [v, v])
+            started.wait()
+            self.assertEqual(writer.outstanding_bytes, 64)
+
+            second_submitted = threading.Event()
+
+            def submit_second() -> None:
+                writer.submit([e], [v])
+                second_submitted.set()
+
+            t = threading.Thread(target=submit_second)
+            t.start()
+            self.assertFalse(second_submitted.wait(0.1))
+            release.set()
+            self.assertTrue(second_submitted.wait(5))
+            t.join()
+            writer.close()
+        self.assertEqual(writer.outstanding_bytes, 0)
+
+    def test_error_propagation(self) -> None:
+        e = DescriptorMemoryElement(0)
+        with mock.patch.object(DescriptorElement, 'set_many_vectors',
+                               side_effect=OSError("disk full")) as m_set_many:
+            writer = WriteBehindVectorWriter(1024)
+            writer.submit([e], [numpy.ones(2)])
+            with pytest.raises(OSError, match="disk full"):
+                writer.flush()
+            with pytest.raises(OSError, match="disk full"):
+                writer.submit([e], [numpy.ones(2)])
+            with pytest.raises(OSError, match="disk full"):
+                writer.close()
+        m_set_many.assert_called_once()